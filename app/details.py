@@ -1,30 +1,19 @@
 import streamlit as st
-import pandas as pd
-from scripts.db_utils import get_db_connection
+from scripts import queries
+from app import shared
 
 def show():
     st.title("🔍 Detalles del Producto")
 
-    # Conectar a la base de datos
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # Búsqueda de producto sobre el índice de texto completo
+    producto = shared.selector_producto()
+    if producto is None:
+        st.info("Escribe parte del nombre, la categoría o el envase para buscar un producto.")
+        return
 
-    # Obtener los productos
-    cursor.execute("SELECT * FROM productos")
-    productos = cursor.fetchall()
+    # Mostrar detalles del producto seleccionado (búsqueda por clave primaria)
+    product_info = shared.consulta(queries.producto_por_id, producto["id"])
 
-    # Obtener los nombres de las columnas
-    columns = [description[0] for description in cursor.description]
-
-    # Convertir a DataFrame
-    df = pd.DataFrame(productos, columns=columns)
-    print(df.head())
-    # Selección de producto
-    selected_product = st.selectbox("Selecciona un producto:", df['nombre'].unique())
-
-    # Mostrar detalles del producto seleccionado
-    product_info = df[df['nombre'] == selected_product].iloc[0]
-    
     st.subheader(f"Producto: {product_info['nombre']}")
     st.write(f"**Categoría L1:** {product_info['categoria_L1']}")
     st.write(f"**Categoría L2:** {product_info['categoria_L2']}")
@@ -39,7 +28,4 @@ def show():
     st.write(f"**¿Es nuevo?:** {'Sí' if product_info['is_new'] == 1 else 'No'}")
     st.write(f"**¿Ha disminuido de precio?:** {'Sí' if product_info['price_decreased'] == 1 else 'No'}")
     st.write(f"**Disponible a partir de:** {product_info['unavailable_from'] if product_info['unavailable_from'] else 'Disponible'}")
-    st.write(f"**URL del producto:** [Ver producto]({product_info['url']})")
-
-    # Cerrar la conexión
-    conn.close()
\ No newline at end of file
+    st.write(f"**URL del producto:** [Ver producto]({product_info['url']})")
\ No newline at end of file
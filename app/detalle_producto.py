@@ -1,42 +1,15 @@
 # app/cambios_precios.py
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
-from scripts.db_utils import get_db_connection
+from scripts import price_changes, queries
+from app import shared
 
 def show():
     st.title("📊 Cambios de Precios")
 
-    # Conectar a la base de datos
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
     # Obtener la lista de productos con nombre y tamaño
-    cursor.execute("SELECT id, nombre, unit_size, size_format FROM productos")
-    productos = cursor.fetchall()
-
-    # Convertir a DataFrame
-    df_productos = pd.DataFrame(productos, columns=["id", "nombre", "unit_size", "size_format"])
-
-    # Combinar nombre y tamaño para mostrar en la tabla
-    df_productos["nombre_y_tamaño"] = (
-        df_productos["nombre"] + " (" + df_productos["unit_size"].astype(str) + " " + df_productos["size_format"] + ")"
-    )
-
-    # Obtener el histórico de precios de todos los productos
-    cursor.execute("""
-    SELECT producto_id, precio_con_descuento, fecha_actualizacion
-    FROM precios_historicos
-    ORDER BY producto_id, fecha_actualizacion
-    """)
-    historico = cursor.fetchall()
-
-    # Convertir a DataFrame
-    df_historico = pd.DataFrame(historico, columns=["producto_id", "Precio", "Fecha de actualización"])
-
-    # Convertir la columna "Fecha de actualización" a datetime
-    df_historico["Fecha de actualización"] = pd.to_datetime(df_historico["Fecha de actualización"])
+    df_productos = shared.productos(["id", "nombre", "unit_size", "size_format"])
 
     # Filtrar por período de tiempo
     st.sidebar.header("Filtros")
@@ -54,26 +27,10 @@ def show():
     elif periodo == "Último mes":
         fecha_inicio = hoy - timedelta(days=30)
 
-    # Filtrar el histórico por el período seleccionado
-    df_historico_filtrado = df_historico[df_historico["Fecha de actualización"] >= fecha_inicio]
-
-    # Calcular los cambios de precios
-    cambios_precios = []
-    for producto_id in df_historico_filtrado["producto_id"].unique():
-        df_producto = df_historico_filtrado[df_historico_filtrado["producto_id"] == producto_id]
-        if len(df_producto) > 1:
-            precio_inicial = df_producto.iloc[0]["Precio"]
-            precio_final = df_producto.iloc[-1]["Precio"]
-            cambio = precio_final - precio_inicial
-            cambios_precios.append({
-                "producto_id": producto_id,
-                "cambio": cambio,
-                "precio_inicial": precio_inicial,
-                "precio_final": precio_final
-            })
-
-    # Convertir a DataFrame
-    df_cambios = pd.DataFrame(cambios_precios)
+    # Calcular los cambios de precios (intervalos en caché y ventana calculada con NumPy)
+    intervalos = shared.consulta(queries.intervalos_precio, fecha_inicio.date().replace(day=1))
+    df_cambios = price_changes.cambios_ventana(intervalos, fecha_inicio.date(), hoy.date())
+    df_cambios = df_cambios[df_cambios["cambio"] != 0]
 
     # Manejar el caso de datos vacíos
     if df_cambios.empty:
@@ -82,12 +39,12 @@ def show():
         else:
             st.warning(f"⚠️ No se encontraron cambios de precios en el período seleccionado: {periodo}.")
     else:
-        # Combinar con los nombres de los productos
-        df_cambios = df_cambios.merge(df_productos, left_on="producto_id", right_on="id")
-
-        # Ordenar por cambio (ascendente y descendente)
-        df_top_subidas = df_cambios.sort_values(by="cambio", ascending=False).head(10)
-        df_top_bajadas = df_cambios.sort_values(by="cambio", ascending=True).head(10)
+        # Top 10 subidas y bajadas (ordenación parcial) y, solo para ellas, nombre y tamaño
+        df_top_subidas, df_top_bajadas = price_changes.subidas_y_bajadas(df_cambios, 10)
+        df_top_subidas = df_top_subidas.merge(df_productos, left_on="producto_id", right_on="id")
+        df_top_bajadas = df_top_bajadas.merge(df_productos, left_on="producto_id", right_on="id")
+        df_top_subidas["nombre_y_tamaño"] = shared.etiqueta_producto(df_top_subidas)
+        df_top_bajadas["nombre_y_tamaño"] = shared.etiqueta_producto(df_top_bajadas)
 
         # Mostrar top 10 subidas
         #st.header("Top 10 Subidas de Precios")
@@ -97,18 +54,22 @@ def show():
         #st.header("Top 10 Bajadas de Precios")
         #st.dataframe(df_top_bajadas[["nombre_y_tamaño", "cambio", "precio_inicial", "precio_final"]])
 
-    # Buscador de productos
+    # Buscador de productos (índice de texto completo)
     st.sidebar.header("Buscar Producto")
-    producto_buscado = st.sidebar.selectbox(
-        "Selecciona un producto para ver su evolución:",
-        df_productos["nombre_y_tamaño"]
-    )
+    producto = shared.selector_producto(st.sidebar)
+    if producto is None:
+        st.info("Busca un producto en la barra lateral para ver su evolución.")
+        return
 
     # Obtener el ID del producto seleccionado
-    producto_id = df_productos[df_productos["nombre_y_tamaño"] == producto_buscado]["id"].iloc[0]
+    producto_id = producto["id"]
+    producto_buscado = shared.etiqueta_producto(producto.to_frame().T).iloc[0]
 
     # Obtener el histórico de precios del producto seleccionado
-    df_producto_historico = df_historico[df_historico["producto_id"] == producto_id]
+    df_producto_historico = shared.consulta(queries.historico_producto, producto_id).rename(
+        columns={"precio_con_descuento": "Precio", "fecha_actualizacion": "Fecha de actualización"}
+    )
+    df_producto_historico["Fecha de actualización"] = pd.to_datetime(df_producto_historico["Fecha de actualización"])
 
     # Mostrar el cambio de precio en el período seleccionado
     if not df_producto_historico.empty:
@@ -121,7 +82,8 @@ def show():
         st.write(f"**Precio final ({df_producto_historico.iloc[-1]['Fecha de actualización'].strftime('%Y-%m-%d')}):** {precio_final} €")
         st.write(f"**Cambio:** {cambio:.2f} €")
 
-        # Gráfico de evolución de precios
+        # Gráfico de evolución de precios (matplotlib se importa al dibujar el primero)
+        import matplotlib.pyplot as plt
         fig, ax = plt.subplots(figsize=(10, 6))
         ax.plot(df_producto_historico["Fecha de actualización"], df_producto_historico["Precio"], marker='o', linestyle='-', color='b')
         ax.set_title(f"Evolución de Precios: {producto_buscado}")
@@ -130,7 +92,4 @@ def show():
         plt.xticks(rotation=45)
         st.pyplot(fig)
     else:
-        st.warning(f"No hay datos históricos para el producto: {producto_buscado}.")
-
-    # Cerrar la conexión
-    conn.close()
\ No newline at end of file
+        st.warning(f"No hay datos históricos para el producto: {producto_buscado}.")
\ No newline at end of file
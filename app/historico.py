@@ -2,7 +2,9 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-from scripts.db_utils import get_db_connection
+from scripts import price_changes, queries
+from app import shared
+from scripts.image_cache import imagen_local
 
 def calcular_porcentaje_cambio(precio_inicial, precio_final):
     """Calcula el porcentaje de cambio entre dos precios."""
@@ -33,44 +35,23 @@ def formatear_cambio(precio_inicial, precio_final):
 def show():
     st.title("📊 Cambios de Precios")
 
-    # Conectar a la base de datos
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
     # Obtener la lista de productos con nombre, tamaño y URL de imagen
-    cursor.execute("SELECT id, nombre, unit_size, size_format, imagen as url_imagen FROM productos")
-    productos = cursor.fetchall()
-
-    # Convertir a DataFrame
-    df_productos = pd.DataFrame(productos, columns=["id", "nombre", "unit_size", "size_format", "url_imagen"])
-
-    # Combinar nombre y tamaño para mostrar en la tabla
-    df_productos["nombre_y_tamaño"] = (
-        df_productos["nombre"] + " (" + df_productos["unit_size"].astype(str) + " " + df_productos["size_format"] + ")"
-    )
+    df_productos = shared.productos(["id", "nombre", "unit_size", "size_format", "imagen"])
+    df_productos = df_productos.rename(columns={"imagen": "url_imagen"})
 
-    # Obtener el histórico de precios de todos los productos
-    cursor.execute("""
-    SELECT producto_id, precio_con_descuento, fecha_actualizacion
-    FROM precios_historicos
-    ORDER BY producto_id, fecha_actualizacion
-    """)
-    historico = cursor.fetchall()
-
-    # Convertir a DataFrame
-    df_historico = pd.DataFrame(historico, columns=["producto_id", "Precio", "Fecha de actualización"])
-    df_historico["Fecha de actualización"] = pd.to_datetime(df_historico["Fecha de actualización"])
+    # Fechas con datos (el histórico se consulta después, solo para el período elegido)
+    fechas_unicas = [datetime.strptime(fecha, "%Y-%m-%d").date() for fecha in shared.consulta(queries.fechas_de_ingesta)]
+    if not fechas_unicas:
+        st.warning("Todavía no hay histórico de precios.")
+        return
 
     # Filtrar por período de tiempo
     st.sidebar.header("Filtros")
-    
+
     # Obtener el rango de fechas disponible
-    fecha_min = df_historico["Fecha de actualización"].min()
-    fecha_max = df_historico["Fecha de actualización"].max()
-    
-    # Obtener fechas únicas ordenadas
-    fechas_unicas = sorted(df_historico["Fecha de actualización"].dt.date.unique())
-    
+    fecha_min = fechas_unicas[0]
+    fecha_max = fechas_unicas[-1]
+
     # Opción para seleccionar tipo de filtro
     tipo_filtro = st.sidebar.radio(
         "Tipo de filtro:",
@@ -103,51 +84,39 @@ def show():
         st.sidebar.write("Selecciona el intervalo de fechas:")
         fecha_inicio = st.sidebar.date_input(
             "Fecha inicial",
-            min_value=fecha_min.date(),
-            max_value=fecha_max.date(),
-            value=fecha_min.date()
+            min_value=fecha_min,
+            max_value=fecha_max,
+            value=fecha_min
         )
         fecha_fin = st.sidebar.date_input(
             "Fecha final",
-            min_value=fecha_min.date(),
-            max_value=fecha_max.date(),
-            value=fecha_max.date()
+            min_value=fecha_min,
+            max_value=fecha_max,
+            value=fecha_max
         )
 
-    # Filtrar el histórico por el período seleccionado
-    df_historico_filtrado = df_historico[
-        (df_historico["Fecha de actualización"].dt.date >= fecha_inicio) & 
-        (df_historico["Fecha de actualización"].dt.date <= fecha_fin)
-    ]
-
-    # Calcular los cambios de precios
-    cambios_precios = []
-    for producto_id in df_historico_filtrado["producto_id"].unique():
-        df_producto = df_historico_filtrado[df_historico_filtrado["producto_id"] == producto_id]
-        if len(df_producto) > 1:
-            precio_inicial = df_producto.iloc[0]["Precio"]
-            precio_final = df_producto.iloc[-1]["Precio"]
-            cambio = precio_final - precio_inicial
-            cambios_precios.append({
-                "producto_id": producto_id,
-                "cambio": cambio,
-                "precio_inicial": precio_inicial,
-                "precio_final": precio_final
-            })
+    # Filtrar por producto (búsqueda en el índice de texto completo)
+    busqueda = st.sidebar.text_input("Filtrar por producto:", placeholder="p. ej. aceite oliva")
 
-    # Convertir a DataFrame
-    df_cambios = pd.DataFrame(cambios_precios)
+    # Calcular los cambios de precios: los intervalos desde el mes de la fecha inicial se
+    # cargan una vez (en caché hasta la siguiente ingesta) y cada ventana se calcula con NumPy
+    intervalos = shared.consulta(queries.intervalos_precio, fecha_inicio.replace(day=1))
+    df_cambios = price_changes.cambios_ventana(intervalos, fecha_inicio, fecha_fin)
+    df_cambios = df_cambios[df_cambios["cambio"] != 0]
+    if busqueda.strip():
+        encontrados = shared.consulta(queries.buscar_productos, busqueda, 500)
+        df_cambios = df_cambios[df_cambios["producto_id"].isin(encontrados["id"])]
 
     # Manejar el caso de datos vacíos
     if df_cambios.empty:
         st.warning(f"⚠️ No se encontraron cambios de precios en el período seleccionado.")
     else:
-        # Combinar con los nombres de los productos
-        df_cambios = df_cambios.merge(df_productos, left_on="producto_id", right_on="id")
-
-        # Ordenar por cambio (ascendente y descendente)
-        df_top_subidas = df_cambios.sort_values(by="cambio", ascending=False).head(10)
-        df_top_bajadas = df_cambios.sort_values(by="cambio", ascending=True).head(10)
+        # Top 10 subidas y bajadas (ordenación parcial) y, solo para ellas, nombre y tamaño
+        df_top_subidas, df_top_bajadas = price_changes.subidas_y_bajadas(df_cambios, 10)
+        df_top_subidas = df_top_subidas.merge(df_productos, left_on="producto_id", right_on="id")
+        df_top_bajadas = df_top_bajadas.merge(df_productos, left_on="producto_id", right_on="id")
+        df_top_subidas["nombre_y_tamaño"] = shared.etiqueta_producto(df_top_subidas)
+        df_top_bajadas["nombre_y_tamaño"] = shared.etiqueta_producto(df_top_bajadas)
 
         # Mostrar los cambios en formato de texto
         st.subheader("📈 Top 10 Subidas de Precios")
@@ -155,7 +124,7 @@ def show():
             col1, col2 = st.columns([1, 3])
             with col1:
                 if pd.notna(row["url_imagen"]):
-                    st.image(row["url_imagen"], width=150)
+                    st.image(imagen_local(row["url_imagen"]), width=150)
                 else:
                     st.write("Sin imagen")
             with col2:
@@ -170,7 +139,7 @@ def show():
             col1, col2 = st.columns([1, 3])
             with col1:
                 if pd.notna(row["url_imagen"]):
-                    st.image(row["url_imagen"], width=150)
+                    st.image(imagen_local(row["url_imagen"]), width=150)
                 else:
                     st.write("Sin imagen")
             with col2:
@@ -178,7 +147,4 @@ def show():
                 st.markdown(f"### {row['nombre_y_tamaño']}")
                 st.markdown(f"<h2 style='color: {color};'>{cambio_texto}</h2>", unsafe_allow_html=True)
                 st.markdown(f"<h3 style='color: gray;'>Precio inicial: {row['precio_inicial']:.2f}€ → Precio final: {row['precio_final']:.2f}€</h3>", unsafe_allow_html=True)
-            st.divider()
-
-    # Cerrar la conexión
-    conn.close()
\ No newline at end of file
+            st.divider()
\ No newline at end of file
@@ -1,16 +1,42 @@
 # app/home.py
 import streamlit as st
-import subprocess
-import sys
+from scripts import jobs
+from scripts.jobs import LAST_REFRESH_FILE  # Sin pasar por app.shared: Home no necesita pandas
+
+# Segundos entre consultas del progreso de una actualización en curso
+INTERVALO_PROGRESO = 2
+
+ETAPAS = {
+    "inicio": "Arrancando",
+    "esquema": "Actualizando el esquema de la base de datos",
+    "descarga": "Descargando y guardando productos",
+    "archivo": "Archivando el histórico antiguo",
+}
 
 def get_last_refresh_date():
     """Lee la fecha de la última actualización desde el archivo."""
     try:
-        with open("last_refresh.txt", "r") as f:
+        with open(LAST_REFRESH_FILE, "r") as f:
             return f.read()
     except FileNotFoundError:
         return "Nunca"
 
+@st.fragment(run_every=INTERVALO_PROGRESO)
+def progreso(trabajo_id):
+    """Progreso del trabajo; se refresca solo, sin recargar el resto de la página."""
+    trabajo = jobs.trabajo(trabajo_id)
+    if trabajo["estado"] not in jobs.ACTIVOS:
+        # Ha terminado: olvidar la comprobación en caché para que las páginas pasen
+        # ya a la versión nueva y recargar la página entera
+        from app import shared  # Aquí y no arriba: abrir Home no carga pandas
+        shared.actualizando.clear()
+        st.rerun()
+    st.info(f"⏳ Actualización en curso (trabajo {trabajo['id']}, desde {trabajo['creado']}): "
+            f"{ETAPAS.get(trabajo['etapa'], 'Esperando a que arranque')}…")
+    col1, col2 = st.columns(2)
+    col1.metric("Categorías descargadas", trabajo["categorias"])
+    col2.metric("Productos guardados", trabajo["productos"])
+
 def show():
     st.title("🏠 Página de Inicio")
 
@@ -18,17 +44,23 @@ def show():
     last_refresh = get_last_refresh_date()
     st.write(f"Última actualización: **{last_refresh}**")
 
+    # Actualización en segundo plano: la app sigue respondiendo mientras tanto
+    activo = jobs.trabajo_activo()
+    if activo is not None:
+        progreso(activo["id"])
+        return
+
+    # Resultado de la última actualización
+    ultimos = jobs.ultimos_trabajos(1)
+    if ultimos and ultimos[0]["estado"] == jobs.ERROR:
+        st.error(f"La última actualización falló: {ultimos[0]['mensaje']}")
+    elif ultimos and ultimos[0]["id"] == st.session_state.get("trabajo_lanzado"):
+        st.success(f"¡Datos actualizados correctamente! ({ultimos[0]['productos']} productos)")
+
     # Botón de actualización
     if st.button("🔄 Actualizar Datos"):
-        with st.spinner("Actualizando datos..."):
-            # Ejecutar main.py para actualizar los datos
-            try:
-                import sys
-                subprocess.run([sys.executable, "main.py"], check=True)
-
-                st.success("¡Datos actualizados correctamente!")
-                # Actualizar la fecha de la última actualización
-                last_refresh = get_last_refresh_date()
-                st.write(f"Última actualización: **{last_refresh}**")
-            except subprocess.CalledProcessError as e:
-                st.error(f"Error al actualizar los datos: {e}")
\ No newline at end of file
+        try:
+            st.session_state["trabajo_lanzado"] = jobs.lanzar_actualizacion()
+        except jobs.TrabajoEnCurso:
+            pass  # Otra sesión la acaba de lanzar: se muestra su progreso
+        st.rerun()
@@ -1,62 +1,83 @@
 import streamlit as st
-import pandas as pd
-import json
-import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
+from app import shared
+from scripts import queries
+from scripts.rollups import LIMITES_HISTOGRAMA
 
-@st.cache_data
-def load_data():
-    with open("products.json", "r") as f:
-        return json.load(f)
+# Etiquetas de los cubos del histograma precalculado ("0-1", ..., "50+")
+ETIQUETAS_HISTOGRAMA = [f"{a:g}-{b:g}" for a, b in zip(LIMITES_HISTOGRAMA, LIMITES_HISTOGRAMA[1:])] + \
+    [f"{LIMITES_HISTOGRAMA[-1]:g}+"]
 
 def show():
     st.title("📊 KPIs de Productos")
 
-    df = pd.DataFrame(load_data())
+    # Resumen del último día por categoría L2 (precalculado en la ingesta y compartido entre sesiones)
+    resumen = shared.consulta(queries.resumen_diario, "L2")
+    if resumen.empty:
+        st.info("Todavía no hay resúmenes diarios. Se generan en la próxima ingesta.")
+        return
 
     # Selección de categoría
-    selected_category_l1 = st.selectbox("Selecciona una categoría L1:", ["Todas"] + list(df['categoryL1'].unique()))
-    filtered_df = df if selected_category_l1 == "Todas" else df[df['categoryL1'] == selected_category_l1]
-    
-    if not filtered_df.empty:
-        selected_category_l2 = st.selectbox("Selecciona una categoría L2:", ["Todas"] + list(filtered_df['categoryL2'].unique()))
-        filtered_df = filtered_df if selected_category_l2 == "Todas" else filtered_df[filtered_df['categoryL2'] == selected_category_l2]
-    
+    categorias_l1 = sorted(resumen['categoria_L1'].unique())
+    selected_category_l1 = st.selectbox("Selecciona una categoría L1:", ["Todas"] + categorias_l1)
+    filtered = resumen if selected_category_l1 == "Todas" else resumen[resumen['categoria_L1'] == selected_category_l1]
+
+    selected_category_l2 = st.selectbox("Selecciona una categoría L2:", ["Todas"] + list(filtered['categoria_L2'].unique()))
+    if selected_category_l2 != "Todas":
+        filtered = filtered[filtered['categoria_L2'] == selected_category_l2]
+
+    # Indicadores de la selección: se combinan las filas de sus categorías L2
+    total = int(filtered['productos'].sum())
+    marca_blanca = int(filtered['marca_blanca'].sum())
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Productos", total)
+    col2.metric("Precio medio", f"{filtered['suma_precios'].sum() / total:.2f} €")
+    col3.metric("Hacendado", f"{marca_blanca / total:.1%}")
+
+    # Librerías de gráficos: diferidas hasta que hay algo que dibujar (son lo más pesado de importar)
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     # Número de productos por subcategoría
     st.subheader("Número de productos por subcategoría (L2)")
-    category_counts = filtered_df['categoryL2'].value_counts()
+    category_counts = filtered.groupby('categoria_L2')['productos'].sum().sort_values(ascending=False)
 
     # Graficar
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x=category_counts.index, y=category_counts.values, palette="muted")
-    plt.xticks(rotation=90)
-    plt.title(f"Productos en {selected_category_l1}")
-    plt.xlabel("Subcategoría L2")
-    plt.ylabel("Cantidad de productos")
-    st.pyplot(plt)
-
-    # Distribución de precios
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(x=category_counts.index, y=category_counts.values, hue=category_counts.index,
+                palette="muted", legend=False, ax=ax)
+    ax.tick_params(axis='x', rotation=90)
+    ax.set_title(f"Productos en {selected_category_l1}")
+    ax.set_xlabel("Subcategoría L2")
+    ax.set_ylabel("Cantidad de productos")
+    st.pyplot(fig)
+
+    # Distribución de precios: suma de los histogramas precalculados de cada L2
     st.subheader("Distribución de precios")
-    
-    filtered_df['price_numeric'] = filtered_df['price'].apply(lambda x: float(x.split(' ')[0].replace(',', '.')))
-
-    plt.figure(figsize=(10, 6))
-    sns.histplot(filtered_df['price_numeric'], bins=20, kde=True, color="blue")
-    plt.title(f"Distribución de precios en {selected_category_l1}")
-    plt.xlabel("Precio (€)")
-    plt.ylabel("Frecuencia")
-    st.pyplot(plt)
-    
-    # Comparación de productos con y sin "Hacendado" en el título
+    cubos = np.vstack(filtered['histograma'].to_numpy()).sum(axis=0)
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.bar(ETIQUETAS_HISTOGRAMA, cubos, color="blue", alpha=0.6)
+    ax.set_title(f"Distribución de precios en {selected_category_l1}")
+    ax.set_xlabel("Precio (€)")
+    ax.set_ylabel("Frecuencia")
+    st.pyplot(fig)
+
+    # Comparación de productos con y sin "Hacendado" en el nombre
     st.subheader("Comparación de productos con 'Hacendado'")
-    
-    filtered_df['is_hacendado'] = filtered_df['description'].str.contains("Hacendado", case=False, na=False)
-    hacendado_counts = filtered_df['is_hacendado'].value_counts()
 
-    # Asegurar que tenemos ambas categorías (True para Hacendado, False para Otros)
-    hacendado_counts = hacendado_counts.reindex([True, False], fill_value=0)
+    fig, ax = plt.subplots(figsize=(6, 4))
+    ax.pie([marca_blanca, total - marca_blanca], labels=["Hacendado", "Otros"], autopct='%1.1f%%',
+           colors=["green", "gray"], startangle=90)
+    ax.set_title("Productos con y sin 'Hacendado'")
+    st.pyplot(fig)
 
-    plt.figure(figsize=(6, 4))
-    plt.pie(hacendado_counts, labels=["Hacendado", "Otros"], autopct='%1.1f%%', colors=["green", "gray"], startangle=90)
-    plt.title("Productos con y sin 'Hacendado'")
-    st.pyplot(plt)
+    # Cuota de marca blanca por subcategoría
+    st.subheader("Cuota de Hacendado por subcategoría (L2)")
+    por_l2 = filtered.groupby(['categoria_L1', 'categoria_L2'])[['productos', 'marca_blanca']].sum()
+    por_l2['cuota'] = por_l2['marca_blanca'] / por_l2['productos']
+    st.dataframe(
+        por_l2.sort_values('cuota', ascending=False).reset_index(),
+        column_config={"cuota": st.column_config.ProgressColumn("Cuota Hacendado", format="%.2f", min_value=0, max_value=1)},
+        hide_index=True,
+    )
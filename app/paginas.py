@@ -0,0 +1,104 @@
+# app/paginas.py
+"""Registro de páginas de la app con importación perezosa.
+
+streamlit_app.py solo conoce el nombre de cada página y su módulo; el
+módulo se importa la primera vez que se elige (después queda en
+`sys.modules` para todas las sesiones), así que arrancar la app y abrir
+Home no carga pandas, NumPy ni matplotlib. Cada primera importación se
+mide (tiempo, módulos nuevos y crecimiento del pico de memoria) y se
+escribe en la salida del servidor.
+
+Para comparar el arranque en frío de cada página, cada una en un
+proceso limpio:
+
+    python -m app.paginas
+"""
+import importlib
+import json
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Etiqueta del menú -> módulo con la función show()
+PAGINAS = {
+    "Home": "app.home",
+    "Ver productos": "app.products",
+    "Detalles de producto": "app.detalle_producto",
+    "Cambios de Precios": "app.historico",
+    "KPIs": "app.kpis",
+    "IVA Dashboards": "app.iva",
+    # "Chat": "app.chat_v2",
+}
+
+# Módulo -> medida de su primera importación en este proceso
+_tiempos = {}
+
+
+def pico_rss_mb():
+    """Pico de memoria residente del proceso en MB (None si no se puede medir)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return pico / 1024 / 1024 if sys.platform == "darwin" else pico / 1024
+
+
+def importar(modulo):
+    """Importa `modulo` y devuelve (módulo, medida) con lo que ha costado.
+
+    La medida es un diccionario con `segundos`, `modulos` (módulos nuevos
+    en `sys.modules`) y `rss_mb` (crecimiento del pico de memoria; None
+    si no se puede medir). Si el módulo ya estaba cargado cuesta cero.
+    """
+    if modulo in sys.modules:
+        return sys.modules[modulo], {"segundos": 0.0, "modulos": 0, "rss_mb": 0.0}
+    cargados = len(sys.modules)
+    rss = pico_rss_mb()
+    inicio = time.perf_counter()
+    pagina = importlib.import_module(modulo)
+    medida = {
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "modulos": len(sys.modules) - cargados,
+        "rss_mb": round(pico_rss_mb() - rss, 1) if rss is not None else None,
+    }
+    return pagina, medida
+
+
+def cargar(nombre):
+    """Módulo de la página `nombre`, importándolo si es la primera vez que se pide."""
+    modulo = PAGINAS[nombre]
+    pagina, medida = importar(modulo)
+    if modulo not in _tiempos:
+        _tiempos[modulo] = medida
+        memoria = f", +{medida['rss_mb']} MB" if medida["rss_mb"] is not None else ""
+        print(f"Página «{nombre}» ({modulo}) importada en {medida['segundos']:.3f} s: "
+              f"{medida['modulos']} módulos nuevos{memoria}", flush=True)
+    return pagina
+
+
+def tiempos_carga():
+    """Medidas de las páginas importadas hasta ahora en este proceso, en orden de carga."""
+    return dict(_tiempos)
+
+
+def medir_arranque_en_frio(modulo):
+    """Importa `modulo` en un proceso nuevo (con Streamlit ya cargado) y devuelve su medida."""
+    codigo = ("import json, streamlit; from app.paginas import importar, pico_rss_mb; "
+              f"_, medida = importar({modulo!r}); medida['rss_total_mb'] = pico_rss_mb(); "
+              "print(json.dumps(medida))")
+    salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    for nombre, modulo in PAGINAS.items():
+        medida = medir_arranque_en_frio(modulo)
+        memoria = (f"+{medida['rss_mb']} MB (pico {medida['rss_total_mb']:.0f} MB)"
+                   if medida["rss_mb"] is not None else "memoria no disponible")
+        print(f"{nombre:<22} {modulo:<22} {medida['segundos'] * 1000:>7.0f} ms  "
+              f"{medida['modulos']:>5} módulos  {memoria}")
@@ -1,44 +1,88 @@
 import streamlit as st
-import pandas as pd
-from scripts.db_utils import get_db_connection  # Importar la conexión a la base de datos
+from app import shared  # Datos compartidos entre sesiones
+from scripts import queries
+
+# Columnas que se muestran de cada producto
+COLUMNAS = [
+    'nombre',                   # Nombre del producto
+    'precio_con_descuento',     # Precio con descuento
+    'categoria_L1',             # Categoría nivel 1
+    'categoria_L2',             # Categoría nivel 2
+    'categoria_L3',             # Categoría nivel 3
+    'url',                      # URL del producto
+    'imagen',                   # URL de la imagen
+    'iva',                      # IVA aplicado
+    'packaging',                # Tipo de empaque
+    'bulk_price',               # Precio al por mayor
+    'unit_size',                # Tamaño de la unidad
+    'size_format',              # Formato del tamaño
+    'selling_method',           # Método de venta
+    'is_pack',                  # ¿Es un pack?
+    'is_new',                   # ¿Es nuevo?
+    'price_decreased',          # ¿El precio ha disminuido?
+    'unavailable_from'          # Fecha de no disponibilidad
+]
+
+# Opciones de orden: etiqueta -> columna (queries.ORDEN_PRODUCTOS)
+ORDEN = {
+    "Nombre": "nombre",
+    "Precio": "precio_con_descuento",
+    "Precio por unidad de medida": "bulk_price",
+}
+
+TODAS = "Todas"
+
+
+def _filtro_categoria(etiqueta, categorias):
+    """Selector de una categoría (o todas); devuelve su id o None."""
+    nombres = dict(zip(categorias['nombre'], categorias['id']))
+    seleccion = st.sidebar.selectbox(etiqueta, [TODAS] + list(nombres))
+    return None if seleccion == TODAS else nombres[seleccion]
+
 
 def show():
     st.title("📦 Lista de Productos")
 
-    # Conectar a la base de datos
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Obtener todos los productos
-    cursor.execute("SELECT * FROM productos")
-    productos = cursor.fetchall()
-
-    # Obtener los nombres de las columnas
-    columns = [description[0] for description in cursor.description]
-
-    # Convertir los productos a un DataFrame
-    df = pd.DataFrame(productos, columns=columns)
-
-    # Mostrar tabla interactiva con las nuevas columnas
-    st.dataframe(df[[
-        'nombre',                   # Nombre del producto
-        'precio_con_descuento',     # Precio con descuento
-        'categoria_L1',             # Categoría nivel 1
-        'categoria_L2',             # Categoría nivel 2
-        'categoria_L3',             # Categoría nivel 3
-        'url',                      # URL del producto
-        'imagen',                   # URL de la imagen
-        'iva',                      # IVA aplicado
-        'packaging',                # Tipo de empaque
-        'bulk_price',               # Precio al por mayor
-        'unit_size',                # Tamaño de la unidad
-        'size_format',              # Formato del tamaño
-        'selling_method',           # Método de venta
-        'is_pack',                  # ¿Es un pack?
-        'is_new',                   # ¿Es nuevo?
-        'price_decreased',          # ¿El precio ha disminuido?
-        'unavailable_from'          # Fecha de no disponibilidad
-    ]])
-
-    # Cerrar la conexión a la base de datos
-    conn.close()
\ No newline at end of file
+    # --- Filtros (se aplican en SQL) ---
+    st.sidebar.header("Filtros")
+    filtros = {}
+    filtros['categoria_L1_id'] = _filtro_categoria("Categoría L1:", shared.consulta(queries.categorias, 1))
+    if filtros['categoria_L1_id'] is not None:
+        categorias_L2 = shared.consulta(queries.categorias, 2)
+        filtros['categoria_L2_id'] = _filtro_categoria(
+            "Categoría L2:", categorias_L2[categorias_L2['padre_id'] == filtros['categoria_L1_id']]
+        )
+    filtros['iva'] = st.sidebar.multiselect("IVA (%):", shared.consulta(queries.tipos_iva))
+    filtros['precio_min'] = st.sidebar.number_input("Precio mínimo (€):", min_value=0.0, value=None, step=0.5)
+    filtros['precio_max'] = st.sidebar.number_input("Precio máximo (€):", min_value=0.0, value=None, step=0.5)
+    if st.sidebar.checkbox("Solo novedades"):
+        filtros['is_new'] = 1
+    if st.sidebar.checkbox("Solo bajadas de precio"):
+        filtros['price_decreased'] = 1
+
+    # --- Orden y tamaño de página ---
+    st.sidebar.header("Orden")
+    orden = ORDEN[st.sidebar.selectbox("Ordenar por:", list(ORDEN))]
+    descendente = st.sidebar.checkbox("Descendente")
+    tamano = st.sidebar.selectbox("Productos por página:", [25, 50, 100], index=1)
+
+    # Cursores de las páginas visitadas; se reinician al cambiar filtros u orden
+    firma = repr((sorted(filtros.items()), orden, descendente, tamano))
+    if st.session_state.get('productos_firma') != firma:
+        st.session_state['productos_firma'] = firma
+        st.session_state['productos_cursores'] = [None]
+    cursores = st.session_state['productos_cursores']
+
+    # Solo se piden (y se envían al navegador) las filas de la página actual
+    df, siguiente = shared.consulta(
+        queries.pagina_productos, filtros, orden, descendente, cursores[-1], tamano, COLUMNAS
+    )
+    total = shared.consulta(queries.contar_productos, filtros)
+
+    st.dataframe(df, hide_index=True)
+
+    # --- Navegación ---
+    col1, col2, col3 = st.columns([1, 2, 1])
+    col1.button("◀ Anterior", disabled=len(cursores) == 1, on_click=cursores.pop)
+    col2.write(f"Página {len(cursores)} de {max(-(-total // tamano), 1)} · {total} productos")
+    col3.button("Siguiente ▶", disabled=siguiente is None, on_click=cursores.append, args=(siguiente,))
@@ -0,0 +1,116 @@
+# app/shared.py
+"""Recursos compartidos por todas las sesiones y páginas de la app.
+
+Una sola conexión SQLite de solo lectura por proceso y los resultados de
+las consultas de `scripts.queries` en memoria. Todo se indexa por la
+versión de los datos (fecha de modificación de la base de datos y
+contenido de `last_refresh.txt`): tras una ingesta nueva la siguiente
+recarga vuelve a leer de disco sin reiniciar la app. Mientras hay una
+actualización en curso (scripts/jobs.py) la versión no cambia, así que
+las páginas siguen sirviendo la caché en lugar de invalidarla con cada
+lote escrito; se invalida una vez, al terminar el trabajo.
+"""
+import os
+import sqlite3
+import threading
+import streamlit as st
+import scripts.db_utils as db_utils
+from scripts import jobs, queries
+from scripts.jobs import LAST_REFRESH_FILE
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Última versión leída sin ninguna actualización en curso (compartida por las sesiones)
+_version_estable = {}
+
+# Segundos que se reutiliza la comprobación de si hay una actualización en curso
+INTERVALO_TRABAJO = 5
+
+
+@st.cache_data(ttl=INTERVALO_TRABAJO, show_spinner=False)
+def actualizando():
+    """Si hay una actualización en curso; se consulta jobs.db como mucho cada INTERVALO_TRABAJO segundos."""
+    return jobs.trabajo_activo() is not None
+
+
+def version_datos():
+    """Identificador de la versión de los datos en disco (fija mientras se actualizan)."""
+    if _version_estable and actualizando():
+        return _version_estable["version"]
+    try:
+        with open(LAST_REFRESH_FILE, "r") as f:
+            last_refresh = f.read().strip()
+    except FileNotFoundError:
+        last_refresh = None
+    _version_estable["version"] = (_mtime(db_utils.DB_PATH), _mtime(db_utils.DB_PATH + "-wal"), last_refresh)
+    return _version_estable["version"]
+
+
+@st.cache_resource(max_entries=1)
+def _conexion(version):
+    """Conexión de solo lectura compartida por todos los hilos, con su cerrojo.
+
+    Se crea una nueva cuando cambia la versión, por si el fichero se ha
+    reemplazado (p. ej. con un `git pull`).
+    """
+    conn = sqlite3.connect(f"file:{db_utils.DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+    return conn, threading.Lock()
+
+
+def get_connection():
+    """Conexión compartida (no hay que cerrarla) y cerrojo para usarla."""
+    return _conexion(version_datos())
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _consulta(version, nombre, args, kwargs):
+    conn, lock = _conexion(version)
+    with lock:
+        return getattr(queries, nombre)(conn, *args, **dict(kwargs))
+
+
+def consulta(funcion, *args, **kwargs):
+    """Ejecuta `funcion(conn, *args, **kwargs)` de scripts.queries con el resultado en caché.
+
+    Las sesiones que piden lo mismo sobre la misma versión de los datos
+    reciben una copia del resultado en memoria sin tocar el disco.
+    """
+    return _consulta(version_datos(), funcion.__name__, args, tuple(sorted(kwargs.items())))
+
+
+def productos(columnas=None):
+    """Instantánea de `productos` (almacén por defecto), cargada una vez por versión."""
+    df = consulta(queries.productos)
+    return df[list(columnas)] if columnas else df
+
+
+def etiqueta_producto(df):
+    """Nombre y tamaño de cada producto del DataFrame ("Leche entera (1.0 L)")."""
+    return df["nombre"] + " (" + df["unit_size"].astype(str) + " " + df["size_format"].fillna("") + ")"
+
+
+def selector_producto(contenedor=st, clave="producto", limite=20):
+    """Buscador de productos: caja de texto y desplegable con los mejores resultados.
+
+    La búsqueda usa el índice de texto completo (queries.buscar_productos),
+    así que no hace falta cargar el catálogo entero en el desplegable.
+    Devuelve la fila (id, nombre, unit_size, size_format) del producto
+    elegido, o None si todavía no se ha buscado nada o no hay resultados.
+    """
+    texto = contenedor.text_input("Buscar producto:", key=f"{clave}_busqueda", placeholder="p. ej. aceite oliva")
+    if not texto.strip():
+        return None
+    resultados = consulta(queries.buscar_productos, texto, limite)
+    if resultados.empty:
+        contenedor.warning(f"No hay productos que coincidan con «{texto}».")
+        return None
+    etiquetas = etiqueta_producto(resultados).tolist()
+    posicion = contenedor.selectbox("Selecciona un producto:", range(len(resultados)),
+                                    format_func=lambda i: etiquetas[i], key=f"{clave}_seleccion")
+    return resultados.iloc[posicion]
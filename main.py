@@ -1,9 +1,18 @@
 # main.py
+import argparse
 import datetime
 import subprocess
 from scripts.db_utils import create_database, get_db_connection
-from scripts.api_utils import actualizar_datos
+from scripts.api_utils import (
+    actualizar_datos, configure_cache, configure_executor, resolve_warehouse, DEFAULT_CONCURRENCY
+)
+from scripts.http_cache import CACHE_MODES, CACHE_DIR, DEFAULT_MAX_AGE_DAYS, DEFAULT_MAX_SIZE_MB
+from scripts.rate_limit import DEFAULT_RATE, DEFAULT_MAX_RETRIES
+from scripts.price_archive import HORIZONTE_DIAS, compactar_base_de_datos
+from scripts.pipeline import ProgressSink
+from scripts import jobs
 import os
+import sys
 
 def git_push():
     """Sube los cambios a GitHub con autenticación usando GITHUB_TOKEN."""
@@ -28,16 +37,98 @@ def git_push():
 
 
 
-if __name__ == "__main__":
+def parse_args():
+    """Lee los argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Actualiza la base de datos de precios de Mercadona.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Número máximo de peticiones simultáneas a la API (1 = secuencial)")
+    parser.add_argument("--cache", choices=CACHE_MODES, default="off",
+                        help="Caché de respuestas en disco: off, revalidate (peticiones condicionales) "
+                             "o replay (todo desde disco, sin red)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Directorio de la caché de respuestas")
+    parser.add_argument("--cache-max-age", type=float, default=DEFAULT_MAX_AGE_DAYS,
+                        help="Días tras los que se expulsa una entrada de la caché")
+    parser.add_argument("--cache-max-size", type=float, default=DEFAULT_MAX_SIZE_MB,
+                        help="Tamaño máximo de la caché en MB")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help="Máximo de peticiones por segundo a la API (0 = sin límite)")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help="Reintentos ante 429, 5xx o errores de conexión antes de abortar")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Escribe solo las categorías y productos que han cambiado")
+    parser.add_argument("--warehouses", default="",
+                        help="Almacenes a recorrer, separados por comas (p. ej. mad1,bcn1). Sin esta "
+                             "opción ni --postcodes se recorre el almacén por defecto de la API; con ellas "
+                             "la lista lo sustituye (añade 'default' para recorrerlo también)")
+    parser.add_argument("--postcodes", default="",
+                        help="Códigos postales separados por comas; sus almacenes se añaden a --warehouses")
+    parser.add_argument("--enrich", action="store_true",
+                        help="Descarga el detalle (descripción, ingredientes...) de los productos "
+                             "nuevos o modificados a la tabla productos_detalle")
+    parser.add_argument("--images", action="store_true",
+                        help="Descarga a la caché local (data/img_cache) las miniaturas nuevas")
+    parser.add_argument("--no-parquet", action="store_true",
+                        help="No guarda la instantánea del día en el dataset Parquet (data/parquet)")
+    parser.add_argument("--archive-after", type=int, default=HORIZONTE_DIAS,
+                        help="Días de histórico de precios que se quedan en la base de datos; lo anterior "
+                             f"se archiva en data/price_archive (por defecto {HORIZONTE_DIAS}, 0 = no archivar)")
+    parser.add_argument("--job-id", type=int, default=None,
+                        help="Trabajo ya reservado en data/jobs.db (lo usa la app al lanzar la actualización)")
+    return parser.parse_args()
+
+
+def get_warehouses(args):
+    """Lista ordenada y sin duplicados de almacenes a partir de --warehouses y --postcodes."""
+    warehouses = [wh.strip() for wh in args.warehouses.split(",") if wh.strip()]
+    for postal_code in [pc.strip() for pc in args.postcodes.split(",") if pc.strip()]:
+        warehouse = resolve_warehouse(postal_code)
+        print(f"Código postal {postal_code} -> almacén {warehouse}")
+        warehouses.append(warehouse)
+    return list(dict.fromkeys(warehouses)) or None
+
+
+def actualizar(args, trabajo_id):
+    """Ingesta completa, anotando cada etapa en el trabajo."""
     # Crear las tablas si no existen
+    jobs.etapa(trabajo_id, "esquema")
     create_database()
 
     # Ejecutar la lógica principal para actualizar los datos
-    actualizar_datos()
+    jobs.etapa(trabajo_id, "descarga")
+    actualizar_datos(args.concurrency, args.incremental, get_warehouses(args), args.enrich, args.images,
+                     not args.no_parquet, [ProgressSink(trabajo_id)])
+
+    # Archivar el histórico antiguo para que la base de datos no crezca
+    if args.archive_after > 0:
+        jobs.etapa(trabajo_id, "archivo")
+        compactar_base_de_datos(args.archive_after)
 
     # Guardar la fecha y hora de la última actualización
-    with open("last_refresh.txt", "w") as f:
+    with open(jobs.LAST_REFRESH_FILE, "w") as f:
         f.write(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_cache(args.cache, args.cache_dir,
+                    max_age_days=args.cache_max_age, max_size_mb=args.cache_max_size)
+    configure_executor(args.concurrency, args.rate, max_retries=args.max_retries)
+
+    # Un solo escritor: la app reserva el trabajo antes de lanzarnos; si no, se reserva aquí
+    trabajo_id = args.job_id
+    if trabajo_id is None:
+        try:
+            trabajo_id = jobs.reservar("cli", os.getpid())
+        except jobs.TrabajoEnCurso as e:
+            print(e)
+            sys.exit(1)
+    jobs.empezar(trabajo_id, "inicio")
+    try:
+        actualizar(args, trabajo_id)
+    except BaseException as e:
+        jobs.terminar(trabajo_id, error=f"{type(e).__name__}: {e}")
+        raise
+    jobs.terminar(trabajo_id)
+
     # Subir los cambios a GitHub
-    #git_push()
\ No newline at end of file
+    #git_push()
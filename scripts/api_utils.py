@@ -1,135 +1,336 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
 import json
-from scripts.db_utils import get_db_connection, update_product_prices
+from scripts.db_utils import DEFAULT_WAREHOUSE
+from scripts.pipeline import (
+    run_pipeline, as_dict, as_dataframe, DatabaseSink, EnrichmentSink, ImageSink, ParquetSink, JSONSink,
+    CSVSink
+)
+from scripts.records import ProductRecord, intern_category
+from scripts.http_cache import ResponseCache, CACHE_DIR, CACHE_MODES
+from scripts.rate_limit import RequestExecutor, DEFAULT_RATE
 
 
 # Constantes
-CATEGORIES_URL = "https://tienda.mercadona.es/api/categories/"
+API_BASE_URL = os.environ.get("MERCADONA_API_URL", "https://tienda.mercadona.es/api")
+DEFAULT_CONCURRENCY = 4  # Peticiones simultáneas por defecto (1 = secuencial)
+REQUEST_TIMEOUT = 30     # Segundos
 
-def fetch_categories():
+# Sesión HTTP compartida (keep-alive) entre todas las peticiones del proceso
+_session = None
+_session_lock = threading.Lock()
+
+# Caché de respuestas en disco (None = sin caché)
+_response_cache = None
+
+# Límite de ritmo, concurrencia adaptativa y reintentos
+_executor = None
+
+def create_session(pool_size=DEFAULT_CONCURRENCY):
+    """Crea una sesión HTTP con un pool de conexiones reutilizables."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.pool_size = pool_size
+    return session
+
+def get_session(pool_size=DEFAULT_CONCURRENCY):
+    """Devuelve la sesión HTTP compartida, creándola si es necesario.
+
+    Si se pide un pool mayor que el de la sesión actual, se sustituye por
+    una nueva para que ningún hilo se quede esperando una conexión libre.
+    """
+    global _session
+    with _session_lock:
+        if _session is None or _session.pool_size < pool_size:
+            if _session is not None:
+                _session.close()
+            _session = create_session(pool_size)
+        return _session
+
+def configure_cache(mode="off", directory=None, **kwargs):
+    """Activa la caché de respuestas en disco ("revalidate" o "replay") o la desactiva ("off")."""
+    global _response_cache
+    if mode == "off":
+        _response_cache = None
+    else:
+        _response_cache = ResponseCache(directory or CACHE_DIR, mode=mode, **kwargs)
+    return _response_cache
+
+def configure_executor(max_concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, **kwargs):
+    """Configura el límite de ritmo (peticiones/s), la concurrencia máxima y los reintentos."""
+    global _executor
+    _executor = RequestExecutor(max_concurrency, rate=rate, **kwargs)
+    return _executor
+
+def get_executor(max_concurrency=None):
+    """Devuelve el ejecutor de peticiones, creándolo si es necesario.
+
+    Si se pide una concurrencia mayor que la configurada, se crea uno nuevo
+    conservando el límite de ritmo y los reintentos del actual.
+    """
+    if _executor is None:
+        configure_executor(max_concurrency or DEFAULT_CONCURRENCY)
+    elif max_concurrency and _executor.controller.max_limit < max_concurrency:
+        configure_executor(max_concurrency, _executor.bucket.rate,
+                           burst=_executor.bucket.capacity, max_retries=_executor.max_retries)
+    return _executor
+
+def http_get(url, session=None):
+    """Hace un GET a la API con límite de ritmo y reintentos.
+
+    Pasa por la caché de respuestas si está activa. Lanza
+    RequestFailedError si la petición sigue fallando tras los reintentos.
+    """
+    session = session or get_session()
+    if _response_cache is not None:
+        send = lambda: _response_cache.get(session, url, timeout=REQUEST_TIMEOUT)
+    else:
+        send = lambda: session.get(url, timeout=REQUEST_TIMEOUT)
+    return get_executor().execute(url, send)
+
+def warehouse_url(url, warehouse=None):
+    """Añade a una URL de la API el almacén (parámetro `wh`) si no es el de por defecto."""
+    if not warehouse or warehouse == DEFAULT_WAREHOUSE:
+        return url
+    return f"{url}?wh={warehouse}"
+
+def resolve_warehouse(postal_code, session=None):
+    """Devuelve el almacén que sirve a un código postal.
+
+    Es la misma petición que hacía el flujo de Selenium al introducir el
+    código postal en la web; la API responde con la cabecera
+    `x-customer-wh`.
+    """
+    # Sesión aparte: la respuesta fija una cookie de almacén que no debe
+    # afectar a las peticiones del contexto por defecto
+    session = session or requests.Session()
+    url = f"{API_BASE_URL}/postal-codes/actions/change-pc/"
+    response = get_executor().execute(url, lambda: session.put(
+        url, json={"new_postal_code": str(postal_code)}, timeout=REQUEST_TIMEOUT
+    ))
+    warehouse = response.headers.get("x-customer-wh")
+    if response.status_code not in (200, 204) or not warehouse:
+        raise ValueError(f"No se ha podido obtener el almacén del código postal {postal_code}")
+    return warehouse
+
+def fetch_categories(session=None, warehouse=None):
     """Obtiene las categorías de nivel 1 (L1) desde la API."""
-    response = requests.get(CATEGORIES_URL)
+    response = http_get(warehouse_url(f"{API_BASE_URL}/categories/", warehouse), session)
     if response.status_code == 200:
         return response.json().get("results", [])
+    print(f"Aviso: la API de categorías ha respondido HTTP {response.status_code}")
     return []
 
-def fetch_products(subcategory_id):
+def fetch_products(subcategory_id, session=None, warehouse=None):
     """Obtiene los productos de una subcategoría (L3) desde la API."""
-    products_url = f"https://tienda.mercadona.es/api/categories/{subcategory_id}"
-    response = requests.get(products_url)
+    products_url = warehouse_url(f"{API_BASE_URL}/categories/{subcategory_id}", warehouse)
+    response = http_get(products_url, session)
     if response.status_code == 200:
         return response.json().get("categories", [])
+    # Errores no transitorios (p. ej. 404): la subcategoría ya no existe
+    print(f"Aviso: la subcategoría {subcategory_id} ({warehouse or DEFAULT_WAREHOUSE}) "
+          f"ha respondido HTTP {response.status_code}")
     return []
 
-def parse_product(product, category_L1, category_L2, category_L3):
-    """Parsea un producto y devuelve un diccionario con sus datos."""
-    price_instructions = product.get("price_instructions", {})
-    previous_price = price_instructions.get("previous_unit_price")
-    
+def fetch_product_detail(product_id, warehouse=None, session=None):
+    """Obtiene el detalle de un producto y lo devuelve parseado (None si ya no existe)."""
+    url = warehouse_url(f"{API_BASE_URL}/products/{product_id}/", warehouse)
+    response = http_get(url, session)
+    if response.status_code == 200:
+        return parse_product_detail(response.json(), warehouse)
+    if response.status_code == 404:
+        return None
+    raise ValueError(f"El detalle del producto {product_id} ha respondido HTTP {response.status_code}")
+
+def parse_product_detail(detail, warehouse=DEFAULT_WAREHOUSE):
+    """Extrae del detalle de un producto los campos que guardamos en productos_detalle.
+
+    Son los datos que el antiguo ProductExtractor obtenía de la ficha del
+    producto con Selenium (descripción y atributos técnicos), más los que
+    la API da gratis (ingredientes, alérgenos, EAN...).
+    """
+    details = detail.get("details") or {}
+    nutrition = detail.get("nutrition_information") or {}
+    suppliers = details.get("suppliers") or []
     return {
-        "id": product["id"],
-        "nombre": product["display_name"],
-        "categoria_L1": category_L1,
-        "categoria_L2": category_L2,
-        "categoria_L3": category_L3,
-        "precio_con_descuento": float(price_instructions["unit_price"]),
-        "precio_sin_descuento": float(previous_price.strip()) 
-            if isinstance(previous_price, str) else None,
-        "packaging": product.get("packaging"),
-        "bulk_price": float(price_instructions["bulk_price"]) 
-            if price_instructions.get("bulk_price") else None,
-        "unit_size": price_instructions.get("unit_size"),
-        "size_format": price_instructions.get("size_format"),
-        "iva": price_instructions.get("iva"),
-        "selling_method": price_instructions.get("selling_method"),
-        "is_pack": price_instructions.get("is_pack"),
-        "is_new": price_instructions.get("is_new"),
-        "price_decreased": price_instructions.get("price_decreased"),
-        "unavailable_from": product.get("unavailable_from"),
-        "url": product["share_url"],
-        "imagen": product["thumbnail"]
+        "producto_id": str(detail["id"]),
+        "warehouse": warehouse or DEFAULT_WAREHOUSE,
+        "descripcion": details.get("description"),
+        "denominacion_legal": details.get("legal_name"),
+        "marca": details.get("brand") or detail.get("brand"),
+        "origen": details.get("origin") or detail.get("origin"),
+        "ean": detail.get("ean"),
+        "proveedores": ", ".join(s["name"] for s in suppliers if s.get("name")) or None,
+        "ingredientes": nutrition.get("ingredients"),
+        "alergenos": nutrition.get("allergens"),
+        "conservacion": details.get("storage_instructions"),
+        "modo_empleo": details.get("usage_instructions"),
     }
 
-def get_all_products():
-    """Obtiene todos los productos de Mercadona."""
-    productos = []
-    categories_L1 = fetch_categories()
-    
-    for category_L1 in categories_L1:
-        nombre_L1 = category_L1["name"]
-        
-        for category_L2 in category_L1.get("categories", []):
-            nombre_L2 = category_L2["name"]
-            subcategory_id = category_L2["id"]
-            
-            categories_L3 = fetch_products(subcategory_id)
-            for category_L3 in categories_L3:
-                nombre_L3 = category_L3["name"]
-                
-                for product in category_L3.get("products", []):
-                    productos.append(parse_product(product, nombre_L1, nombre_L2, nombre_L3))
-    
-    return productos
-
-def guardar_datos_en_db(productos):
-    """Guarda los datos obtenidos de la API en la base de datos."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    for producto in productos:
-        # Insertar o actualizar el producto en la base de datos
-        cursor.execute("""
-        INSERT OR REPLACE INTO productos (
-            id, nombre, categoria_L1, categoria_L2, categoria_L3,
-            precio_con_descuento, precio_sin_descuento, packaging,
-            bulk_price, unit_size, size_format, iva, selling_method,
-            is_pack, is_new, price_decreased, unavailable_from, url, imagen
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            producto["id"], producto["nombre"], producto["categoria_L1"],
-            producto["categoria_L2"], producto["categoria_L3"],
-            producto["precio_con_descuento"], producto["precio_sin_descuento"],
-            producto["packaging"], producto["bulk_price"], producto["unit_size"],
-            producto["size_format"], producto["iva"], producto["selling_method"],
-            producto["is_pack"], producto["is_new"], producto["price_decreased"],
-            producto["unavailable_from"], producto["url"], producto["imagen"]
-        ))
-
-    # Guardar los cambios y cerrar la conexión
-    conn.commit()
-    conn.close()
-
-def actualizar_datos():
-    """Obtiene datos de la API y los guarda en la base de datos."""
-    productos = get_all_products()
-    if productos:
-        guardar_datos_en_db(productos)
-        update_product_prices(productos)  # Actualizar el histórico de precios
-        print("Datos actualizados correctamente.")
+def parse_product(product, category_L1, category_L2, category_L3, warehouse=DEFAULT_WAREHOUSE):
+    """Parsea un producto y devuelve un diccionario con sus datos.
+
+    El descargador usa ProductRecord.from_api directamente; esto es su
+    forma de diccionario, para quien necesite un producto suelto.
+    """
+    categoria = intern_category(category_L1, category_L2, category_L3)
+    return ProductRecord.from_api(product, categoria, warehouse).as_dict()
+
+def imap_ordered(func, items, concurrency):
+    """Aplica `func` a `items` con un pool de hilos y devuelve los resultados en orden.
+
+    Como mucho hay `2 * concurrency` peticiones en vuelo o pendientes de
+    consumir, de modo que la memoria no depende del número de elementos.
+    """
+    if concurrency <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * concurrency:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_subcategories(concurrency=DEFAULT_CONCURRENCY, warehouses=None):
+    """Recorre las subcategorías L2 en orden L1/L2 y devuelve sus categorías L3.
+
+    Genera tuplas (warehouse, nombre_L1, nombre_L2, categories_L3). Las
+    descargas de las L2 se solapan entre sí (`concurrency` peticiones
+    simultáneas sobre una misma sesión), pero el orden es idéntico al de
+    una ejecución secuencial. Con varios almacenes se descarga el árbol de
+    categorías de cada uno (el surtido cambia entre almacenes) y las L2 de
+    todos ellos comparten el pool, de modo que el tiempo total crece menos
+    que linealmente.
+    """
+    warehouses = warehouses or [DEFAULT_WAREHOUSE]
+    concurrency = max(1, concurrency)
+    session = get_session(concurrency)
+    get_executor(concurrency)
+    arboles = imap_ordered(lambda warehouse: fetch_categories(session, warehouse), warehouses, concurrency)
+
+    # Lista ordenada de (warehouse, nombre_L1, nombre_L2, id_L2) a descargar
+    subcategorias = [
+        (warehouse, category_L1["name"], category_L2["name"], category_L2["id"])
+        for warehouse, categories_L1 in zip(warehouses, arboles)
+        for category_L1 in categories_L1
+        for category_L2 in category_L1.get("categories", [])
+    ]
+    resultados = imap_ordered(
+        lambda subcategoria: fetch_products(subcategoria[3], session, subcategoria[0]),
+        subcategorias, concurrency
+    )
+    for (warehouse, nombre_L1, nombre_L2, _), categories_L3 in zip(subcategorias, resultados):
+        yield warehouse, nombre_L1, nombre_L2, categories_L3
+
+def iter_product_batches(concurrency=DEFAULT_CONCURRENCY, warehouses=None):
+    """Genera, en orden, un lote de ProductRecord por cada almacén y categoría L3."""
+    for warehouse, nombre_L1, nombre_L2, categories_L3 in iter_subcategories(concurrency, warehouses):
+        for category_L3 in categories_L3:
+            categoria = intern_category(nombre_L1, nombre_L2, category_L3["name"])
+            batch = [
+                ProductRecord.from_api(product, categoria, warehouse)
+                for product in category_L3.get("products", [])
+            ]
+            if batch:
+                yield batch
+
+def get_all_products(concurrency=DEFAULT_CONCURRENCY, warehouses=None):
+    """Obtiene todos los productos de Mercadona en una lista de ProductRecord."""
+    return [producto for batch in iter_product_batches(concurrency, warehouses) for producto in batch]
+
+def finalizar_cache():
+    """Imprime las estadísticas de la API y aplica la política de expulsión de la caché."""
+    if _executor is not None and _executor.stats.data:
+        print(_executor.stats.summary())
+    if _response_cache is not None:
+        eliminadas = _response_cache.evict()
+        print(f"Caché HTTP: {_response_cache.summary()}, expulsadas={eliminadas}")
+
+def actualizar_datos(concurrency=DEFAULT_CONCURRENCY, incremental=False, warehouses=None, enrich=False,
+                     images=False, parquet=True, extra_sinks=()):
+    """Obtiene datos de la API y los guarda en la base de datos.
+
+    Cada categoría L3 se escribe en cuanto llega, mientras se siguen
+    descargando las siguientes. Con `incremental` solo se escriben las
+    categorías y productos que han cambiado desde la última ejecución.
+    Con `enrich` se descarga además el detalle de los productos nuevos o
+    modificados a `productos_detalle`, y con `images` las miniaturas que
+    aún no estén en la caché local de imágenes. Con `parquet` la
+    instantánea completa del día se guarda también en el dataset Parquet.
+    `extra_sinks` se añaden al final (p. ej. ProgressSink).
+    """
+    sinks = [DatabaseSink(incremental)]
+    if parquet:
+        sinks.append(ParquetSink())
+    if enrich:
+        sinks.append(EnrichmentSink(fetch_product_detail, concurrency))
+    if images:
+        sinks.append(ImageSink(concurrency))
+    sinks.extend(extra_sinks)
+    total = run_pipeline(iter_product_batches(concurrency, warehouses), sinks)
+    finalizar_cache()
+    if total:
+        print(f"Datos actualizados correctamente ({total} productos).")
     else:
         print("No se pudieron obtener datos de la API.")
 
 def save_to_json(data, filename):
     """Guarda los datos en un archivo JSON."""
     with open(filename, "w", encoding="utf-8") as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
+        json.dump([as_dict(producto) for producto in data], file, ensure_ascii=False, indent=4)
 
 def save_to_csv(data, filename):
     """Guarda los datos en un archivo CSV."""
-    df = pd.DataFrame(data)
+    df = as_dataframe(data)
     df.to_csv(filename, index=False)
 
-def main():
+# Formatos de exportación de main()
+EXPORT_FORMATS = ("parquet", "json", "csv")
+
+def main(concurrency=DEFAULT_CONCURRENCY, warehouses=None, formats=("parquet",)):
     """Función principal para ejecutar el script."""
-    productos = get_all_products()
-    
-    # Guardar los datos
-    save_to_json(productos, "data/productos.json")
-    save_to_csv(productos, "data/productos.csv")
-    
-    print(f"Total de productos extraídos: {len(productos)}")
+    sinks = {
+        "parquet": lambda: ParquetSink(),
+        "json": lambda: JSONSink("data/productos.json"),
+        "csv": lambda: CSVSink("data/productos.csv"),
+    }
+    # Guardar los datos a medida que se descargan
+    total = run_pipeline(iter_product_batches(concurrency, warehouses), [sinks[f]() for f in formats])
+    finalizar_cache()
+
+    print(f"Total de productos extraídos: {total}")
     #print(pd.DataFrame(productos).head())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Descarga el catálogo de Mercadona a Parquet, JSON o CSV.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Número máximo de peticiones simultáneas a la API")
+    parser.add_argument("--cache", choices=CACHE_MODES, default="off",
+                        help="Caché de respuestas en disco: off, revalidate o replay (offline)")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help="Máximo de peticiones por segundo a la API (0 = sin límite)")
+    parser.add_argument("--warehouses", default="",
+                        help="Almacenes separados por comas (p. ej. mad1,bcn1). Sustituyen al almacén "
+                             "por defecto: añade 'default' a la lista para recorrerlo también")
+    parser.add_argument("--formats", default="parquet",
+                        help="Formatos separados por comas: parquet (data/parquet), json y csv (data/productos.*)")
+    args = parser.parse_args()
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    for f in formats:
+        if f not in EXPORT_FORMATS:
+            parser.error(f"Formato desconocido: {f}")
+    configure_cache(args.cache)
+    configure_executor(args.concurrency, args.rate)
+    main(args.concurrency, [wh for wh in args.warehouses.split(",") if wh] or None, formats)
\ No newline at end of file
@@ -0,0 +1,114 @@
+# scripts/benchmark.py
+"""Benchmark de extremo a extremo del scraper contra la API falsa.
+
+Arranca scripts/fake_api.py en un subproceso con un catálogo sintético,
+ejecuta actualizar_datos() sobre una base de datos temporal y muestra
+productos/segundo, pico de memoria (RSS), número de peticiones HTTP y
+tiempo de escritura en SQLite:
+
+    python -m scripts.benchmark --l1 10 --l2 10 --l3 5 --products 20 --latency 50 --jitter 20
+    python -m scripts.benchmark --output bench.json   # Guardar el resultado como referencia
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import scripts.api_utils as api_utils
+import scripts.db_utils as db_utils
+from scripts.pipeline import DatabaseSink, run_pipeline
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso en MB (None si no se puede medir)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def start_fake_api(args):
+    """Arranca la API falsa en un subproceso y devuelve (proceso, base_url)."""
+    command = [
+        sys.executable, "-m", "scripts.fake_api", "--port", "0",
+        "--l1", str(args.l1), "--l2", str(args.l2), "--l3", str(args.l3),
+        "--products", str(args.products), "--latency", str(args.latency),
+        "--jitter", str(args.jitter), "--error-rate", str(args.error_rate),
+        "--throttle-rate", str(args.throttle_rate), "--retry-after", "0",
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        process.kill()
+        raise RuntimeError("No se ha podido arrancar la API falsa")
+    return process, line.strip().rsplit(" ", 1)[1]
+
+
+def run_benchmark(args):
+    """Ejecuta una ingesta completa y devuelve las métricas en un diccionario."""
+    process, base_url = start_fake_api(args)
+    tmp_dir = tempfile.mkdtemp(prefix="mercadona-bench-")
+    try:
+        api_utils.API_BASE_URL = base_url
+        api_utils.configure_executor(args.concurrency, args.rate)
+        db_utils.DB_PATH = os.path.join(tmp_dir, "productos.db")
+        db_utils.create_database()
+
+        sink = DatabaseSink()
+        inicio = time.perf_counter()
+        total = run_pipeline(api_utils.iter_product_batches(args.concurrency), [sink])
+        segundos = time.perf_counter() - inicio
+    finally:
+        process.terminate()
+        process.wait()
+
+    peticiones = sum(stats["requests"] for stats in api_utils.get_executor().stats.data.values())
+    errores = sum(stats["errors"] for stats in api_utils.get_executor().stats.data.values())
+    return {
+        "productos": total,
+        "segundos": round(segundos, 3),
+        "productos_por_segundo": round(total / segundos, 1) if segundos else None,
+        "peticiones_http": peticiones,
+        "errores_http": errores,
+        "segundos_escritura_sqlite": sink.stats["segundos_escritura"],
+        "filas_por_segundo_sqlite": sink.stats["filas_por_segundo"],
+        "pico_rss_mb": round(peak_rss_mb(), 1) if resource is not None else None,
+        "tamano_db_mb": round(os.path.getsize(db_utils.DB_PATH) / 1024 / 1024, 2),
+        "parametros": {key: value for key, value in vars(args).items() if key != "output"},
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark del scraper contra la API falsa.")
+    parser.add_argument("--l1", type=int, default=10, help="Categorías L1")
+    parser.add_argument("--l2", type=int, default=10, help="Categorías L2 por cada L1")
+    parser.add_argument("--l3", type=int, default=5, help="Categorías L3 por cada L2")
+    parser.add_argument("--products", type=int, default=10, help="Productos por cada L3")
+    parser.add_argument("--latency", type=float, default=50, help="Latencia de la API falsa (ms)")
+    parser.add_argument("--jitter", type=float, default=20, help="Jitter de la API falsa (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 500/503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fracción de respuestas 429")
+    parser.add_argument("--concurrency", type=int, default=api_utils.DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=0, help="Peticiones/s (0 = sin límite)")
+    parser.add_argument("--output", help="Fichero JSON donde guardar el resultado")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    resultado = run_benchmark(args)
+    for key, value in resultado.items():
+        if key != "parametros":
+            print(f"{key}: {value}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=4)
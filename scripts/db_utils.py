@@ -1,24 +1,27 @@
 # scripts/db_utils.py
+import os
 import sqlite3
-import json
 from datetime import datetime
 
+# Ruta de la base de datos (se puede cambiar, p. ej. para benchmarks)
+DB_PATH = os.environ.get("MERCADONA_DB_PATH", "data/productos.db")
+
 def get_db_connection():
     """Conecta a la base de datos SQLite."""
-    conn = sqlite3.connect("data/productos.db")
+    conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row  # Para acceder a las columnas por nombre
     return conn
 
-# scripts/db_utils.py
-def create_database():
-    """Crea las tablas en la base de datos si no existen."""
-    conn = sqlite3.connect("data/productos.db")
-    cursor = conn.cursor()
+# Almacén (warehouse) usado cuando no se indica ninguno: el contexto por defecto de la API
+DEFAULT_WAREHOUSE = "default"
 
-    # Crear la tabla productos si no existe
-    cursor.execute("""
+# Tablas del esquema inicial (migración 1). Los cambios posteriores van
+# en su propia migración de MIGRACIONES, no aquí.
+SCHEMA = {
+    "productos": """
     CREATE TABLE IF NOT EXISTS productos (
-        id TEXT PRIMARY KEY,
+        id TEXT,
+        warehouse TEXT NOT NULL DEFAULT 'default',
         nombre TEXT,
         categoria_L1 TEXT,
         categoria_L2 TEXT,
@@ -37,76 +40,823 @@ def create_database():
         unavailable_from TEXT,
         url TEXT,
         imagen TEXT,
-        last_updated TEXT
+        last_updated TEXT,
+        PRIMARY KEY (id, warehouse)
     )
-    """)
-
-    # Crear la tabla precios_historicos si no existe
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS precios_historicos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
+    """,
+    # Histórico de precios por intervalos de validez: una fila por cada
+    # precio distinto, vigente desde `valid_from` (incluida) hasta
+    # `valid_to` (excluida; NULL mientras siga vigente)
+    "precios_intervalos": """
+    CREATE TABLE IF NOT EXISTS precios_intervalos (
         producto_id TEXT,
+        warehouse TEXT NOT NULL DEFAULT 'default',
         precio_con_descuento REAL,
-        fecha_actualizacion TEXT,
-        UNIQUE(producto_id, fecha_actualizacion)  -- Restricción única
+        valid_from TEXT,
+        valid_to TEXT,
+        PRIMARY KEY (producto_id, warehouse, valid_from)
+    )
+    """,
+    # Fechas en las que se ha hecho una ingesta de cada almacén
+    "fechas_ingesta": """
+    CREATE TABLE IF NOT EXISTS fechas_ingesta (
+        warehouse TEXT NOT NULL DEFAULT 'default',
+        fecha TEXT,
+        PRIMARY KEY (warehouse, fecha)
+    )
+    """,
+    # Resúmenes diarios por categoría e IVA (scripts/rollups.py)
+    "resumen_diario": """
+    CREATE TABLE IF NOT EXISTS resumen_diario (
+        fecha TEXT,
+        warehouse TEXT NOT NULL DEFAULT 'default',
+        nivel TEXT,
+        categoria_L1 TEXT NOT NULL DEFAULT '',
+        categoria_L2 TEXT NOT NULL DEFAULT '',
+        iva INTEGER NOT NULL DEFAULT -1,
+        productos INTEGER,
+        precio_medio REAL,
+        precio_mediana REAL,
+        precio_min REAL,
+        precio_max REAL,
+        suma_precios REAL,
+        histograma TEXT,
+        subidas INTEGER,
+        bajadas INTEGER,
+        PRIMARY KEY (warehouse, nivel, fecha, categoria_L1, categoria_L2, iva)
+    )
+    """,
+    # Huellas de contenido para la actualización incremental
+    "huellas_categorias": """
+    CREATE TABLE IF NOT EXISTS huellas_categorias (
+        warehouse TEXT NOT NULL DEFAULT 'default',
+        categoria_L1 TEXT,
+        categoria_L2 TEXT,
+        categoria_L3 TEXT,
+        huella TEXT,
+        PRIMARY KEY (warehouse, categoria_L1, categoria_L2, categoria_L3)
+    )
+    """,
+    "huellas_productos": """
+    CREATE TABLE IF NOT EXISTS huellas_productos (
+        producto_id TEXT,
+        warehouse TEXT NOT NULL DEFAULT 'default',
+        huella TEXT,
+        PRIMARY KEY (producto_id, warehouse)
+    )
+    """,
+    # Detalle de cada producto (descripción, ingredientes...) obtenido de
+    # /api/products/{id}. `huella` es la del listado en el momento de la
+    # descarga: mientras no cambie, el detalle no se vuelve a pedir.
+    "productos_detalle": """
+    CREATE TABLE IF NOT EXISTS productos_detalle (
+        producto_id TEXT,
+        warehouse TEXT NOT NULL DEFAULT 'default',
+        huella TEXT,
+        descripcion TEXT,
+        denominacion_legal TEXT,
+        marca TEXT,
+        origen TEXT,
+        ean TEXT,
+        proveedores TEXT,
+        ingredientes TEXT,
+        alergenos TEXT,
+        conservacion TEXT,
+        modo_empleo TEXT,
+        fecha_detalle TEXT,
+        PRIMARY KEY (producto_id, warehouse)
+    )
+    """,
+}
+
+INDICES = (
+    # Un solo intervalo abierto por producto y almacén
+    """CREATE UNIQUE INDEX IF NOT EXISTS idx_intervalos_abiertos
+    ON precios_intervalos(producto_id, warehouse) WHERE valid_to IS NULL""",
+    # Cambios entre dos fechas: intervalos que empiezan en el rango
+    "CREATE INDEX IF NOT EXISTS idx_intervalos_desde ON precios_intervalos(warehouse, valid_from)",
+    # Productos de una categoría (scripts/queries.py)
+    """CREATE INDEX IF NOT EXISTS idx_productos_categoria
+    ON productos(warehouse, categoria_L1, categoria_L2, categoria_L3)""",
+)
+
+# Vista de compatibilidad: reproduce la antigua tabla con una fila por
+# producto y día de ingesta
+VISTA_PRECIOS_HISTORICOS = """
+CREATE VIEW IF NOT EXISTS precios_historicos AS
+SELECT i.producto_id, i.warehouse, i.precio_con_descuento, f.fecha AS fecha_actualizacion
+FROM precios_intervalos i
+JOIN fechas_ingesta f
+    ON f.warehouse = i.warehouse
+    AND f.fecha >= i.valid_from
+    AND (i.valid_to IS NULL OR f.fecha < i.valid_to)
+"""
+
+# Columnas de productos_detalle que rellena guardar_detalles
+DETALLE_COLUMNS = (
+    "producto_id", "warehouse", "huella", "descripcion", "denominacion_legal", "marca",
+    "origen", "ean", "proveedores", "ingredientes", "alergenos", "conservacion",
+    "modo_empleo", "fecha_detalle",
+)
+
+def _columnas(cursor, tabla):
+    """Devuelve los nombres de las columnas de una tabla (vacío si no existe)."""
+    cursor.execute(f"PRAGMA table_info({tabla})")
+    return [row[1] for row in cursor.fetchall()]
+
+def _anadir_warehouse(cursor, tabla):
+    """Reconstruye una tabla antigua (sin almacén) con la nueva clave primaria.
+
+    Las filas existentes se asignan al almacén por defecto.
+    """
+    columnas = _columnas(cursor, tabla)
+    if not columnas or "warehouse" in columnas:
+        return
+    cursor.execute(f"ALTER TABLE {tabla} RENAME TO {tabla}_sin_warehouse")
+    cursor.execute(SCHEMA[tabla])
+    lista = ", ".join(columnas)
+    cursor.execute(f"INSERT INTO {tabla} ({lista}) SELECT {lista} FROM {tabla}_sin_warehouse")
+    cursor.execute(f"DROP TABLE {tabla}_sin_warehouse")
+
+def _migrar_historico_diario(cursor):
+    """Convierte la antigua tabla `precios_historicos` (una fila por día) en intervalos.
+
+    Un intervalo se corta cuando cambia el precio o cuando el producto
+    falta en alguna de las fechas de ingesta de su almacén, de modo que la
+    vista `precios_historicos` devuelve exactamente las mismas filas.
+    """
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = 'precios_historicos'")
+    row = cursor.fetchone()
+    if row is None or row[0] != "table":
+        return
+    if "warehouse" in _columnas(cursor, "precios_historicos"):
+        warehouse, warehouse_h = "warehouse", "h.warehouse"
+    else:
+        warehouse = warehouse_h = f"'{DEFAULT_WAREHOUSE}'"
+    cursor.execute("ALTER TABLE precios_historicos RENAME TO precios_historicos_diarios")
+    cursor.execute(f"""
+    INSERT OR IGNORE INTO fechas_ingesta (warehouse, fecha)
+    SELECT DISTINCT {warehouse}, fecha_actualizacion FROM precios_historicos_diarios
+    """)
+    cursor.execute(f"""
+    WITH fechas AS (
+        SELECT warehouse, fecha,
+               ROW_NUMBER() OVER (PARTITION BY warehouse ORDER BY fecha) AS n,
+               LEAD(fecha) OVER (PARTITION BY warehouse ORDER BY fecha) AS siguiente
+        FROM fechas_ingesta
+    ),
+    filas AS (
+        SELECT h.producto_id, f.warehouse, h.precio_con_descuento AS precio, f.fecha, f.n, f.siguiente,
+               LAG(h.precio_con_descuento) OVER w AS precio_anterior,
+               LAG(f.n) OVER w AS n_anterior
+        FROM precios_historicos_diarios h
+        JOIN fechas f ON f.warehouse = {warehouse_h} AND f.fecha = h.fecha_actualizacion
+        WINDOW w AS (PARTITION BY h.producto_id, f.warehouse ORDER BY f.n)
+    ),
+    islas AS (
+        SELECT *, SUM(CASE WHEN n_anterior = n - 1 AND precio_anterior IS precio THEN 0 ELSE 1 END)
+                  OVER (PARTITION BY producto_id, warehouse ORDER BY n) AS isla
+        FROM filas
     )
+    INSERT INTO precios_intervalos (producto_id, warehouse, precio_con_descuento, valid_from, valid_to)
+    -- El intervalo acaba en la fecha de ingesta siguiente a la última de la isla
+    SELECT g.producto_id, g.warehouse, g.precio, g.valid_from, f.siguiente
+    FROM (SELECT producto_id, warehouse, precio, MIN(fecha) AS valid_from, MAX(n) AS ultima
+          FROM islas GROUP BY producto_id, warehouse, isla) g
+    JOIN fechas f ON f.warehouse = g.warehouse AND f.n = g.ultima
     """)
+    cursor.execute("DROP TABLE precios_historicos_diarios")
+
+def _migracion_inicial(cursor):
+    """Esquema anterior al control de versiones.
+
+    Es idempotente: en una base de datos sin versión (creada con
+    versiones anteriores del script) solo añade lo que falte y convierte
+    las tablas antiguas.
+    """
+    for tabla, create_sql in SCHEMA.items():
+        # Migrar las tablas creadas antes de añadir el almacén
+        _anadir_warehouse(cursor, tabla)
+        cursor.execute(create_sql)
+    _migrar_historico_diario(cursor)
+    for create_sql in INDICES:
+        cursor.execute(create_sql)
+    cursor.execute(VISTA_PRECIOS_HISTORICOS)
+
+# Dimensión de categorías: un nodo por categoría L1, L2 y L3. `padre_id`
+# es la categoría del nivel superior (0 para las L1).
+TABLA_CATEGORIAS = """
+CREATE TABLE categorias (
+    id INTEGER PRIMARY KEY,
+    nivel INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    padre_id INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (padre_id, nombre)
+)
+"""
+
+# Columnas de `productos_base` que sustituyen a las de texto de categoría
+COLUMNAS_ID_CATEGORIA = ("categoria_L1_id", "categoria_L2_id", "categoria_L3_id")
+
+# Migración 2: `productos_base` guarda ids de categoría en lugar de los
+# nombres. Su esquema y sus columnas quedan congelados aquí; los cambios
+# posteriores van en migraciones nuevas.
+TABLA_PRODUCTOS_BASE_V2 = """
+CREATE TABLE productos_base (
+    id TEXT,
+    warehouse TEXT NOT NULL DEFAULT 'default',
+    nombre TEXT,
+    categoria_L1_id INTEGER REFERENCES categorias(id),
+    categoria_L2_id INTEGER REFERENCES categorias(id),
+    categoria_L3_id INTEGER REFERENCES categorias(id),
+    precio_con_descuento REAL,
+    precio_sin_descuento REAL,
+    packaging TEXT,
+    bulk_price REAL,
+    unit_size REAL,
+    size_format TEXT,
+    iva INTEGER,
+    selling_method INTEGER,
+    is_pack INTEGER,
+    is_new INTEGER,
+    price_decreased INTEGER,
+    unavailable_from TEXT,
+    url TEXT,
+    imagen TEXT,
+    last_updated TEXT,
+    PRIMARY KEY (id, warehouse)
+)
+"""
+
+# Vista de compatibilidad: las columnas de la antigua tabla `productos`, en
+# el mismo orden, más los ids de categoría al final
+VISTA_PRODUCTOS_V2 = """
+CREATE VIEW productos AS
+SELECT p.id, p.warehouse, p.nombre,
+    c1.nombre AS categoria_L1, c2.nombre AS categoria_L2, c3.nombre AS categoria_L3,
+    p.precio_con_descuento, p.precio_sin_descuento, p.packaging, p.bulk_price, p.unit_size,
+    p.size_format, p.iva, p.selling_method, p.is_pack, p.is_new, p.price_decreased,
+    p.unavailable_from, p.url, p.imagen, p.last_updated,
+    p.categoria_L1_id, p.categoria_L2_id, p.categoria_L3_id
+FROM productos_base p
+LEFT JOIN categorias c1 ON c1.id = p.categoria_L1_id
+LEFT JOIN categorias c2 ON c2.id = p.categoria_L2_id
+LEFT JOIN categorias c3 ON c3.id = p.categoria_L3_id
+"""
+
+def _migracion_categorias(cursor):
+    """Mueve las categorías de `productos` a la dimensión `categorias`.
+
+    `productos` pasa a ser una vista sobre `productos_base`, que guarda
+    los ids enteros de categoría en lugar de las tres cadenas.
+    """
+    cursor.execute(TABLA_CATEGORIAS)
+    cursor.execute(TABLA_PRODUCTOS_BASE_V2)
+    cursor.execute("""
+    INSERT INTO categorias (nivel, nombre, padre_id)
+    SELECT DISTINCT 1, categoria_L1, 0 FROM productos WHERE categoria_L1 IS NOT NULL
+    """)
+    cursor.execute("""
+    INSERT INTO categorias (nivel, nombre, padre_id)
+    SELECT DISTINCT 2, p.categoria_L2, c1.id FROM productos p
+    JOIN categorias c1 ON c1.padre_id = 0 AND c1.nombre = p.categoria_L1
+    WHERE p.categoria_L2 IS NOT NULL
+    """)
+    cursor.execute("""
+    INSERT INTO categorias (nivel, nombre, padre_id)
+    SELECT DISTINCT 3, p.categoria_L3, c2.id FROM productos p
+    JOIN categorias c1 ON c1.padre_id = 0 AND c1.nombre = p.categoria_L1
+    JOIN categorias c2 ON c2.padre_id = c1.id AND c2.nombre = p.categoria_L2
+    WHERE p.categoria_L3 IS NOT NULL
+    """)
+    cursor.execute("""
+    INSERT INTO productos_base (id, warehouse, nombre, categoria_L1_id, categoria_L2_id, categoria_L3_id,
+        precio_con_descuento, precio_sin_descuento, packaging, bulk_price, unit_size, size_format, iva,
+        selling_method, is_pack, is_new, price_decreased, unavailable_from, url, imagen, last_updated)
+    SELECT p.id, p.warehouse, p.nombre, c1.id, c2.id, c3.id,
+        p.precio_con_descuento, p.precio_sin_descuento, p.packaging, p.bulk_price, p.unit_size, p.size_format, p.iva,
+        p.selling_method, p.is_pack, p.is_new, p.price_decreased, p.unavailable_from, p.url, p.imagen, p.last_updated
+    FROM productos p
+    LEFT JOIN categorias c1 ON c1.padre_id = 0 AND c1.nombre = p.categoria_L1
+    LEFT JOIN categorias c2 ON c2.padre_id = c1.id AND c2.nombre = p.categoria_L2
+    LEFT JOIN categorias c3 ON c3.padre_id = c2.id AND c3.nombre = p.categoria_L3
+    """)
+    cursor.execute("DROP TABLE productos")  # También borra idx_productos_categoria
+    cursor.execute(VISTA_PRODUCTOS_V2)
+    cursor.execute("""CREATE INDEX idx_productos_categoria
+    ON productos_base(warehouse, categoria_L1_id, categoria_L2_id, categoria_L3_id)""")
+
+# Migración 3: `productos_base` con una clave entera estable (`clave`,
+# alias de rowid, que VACUUM no renumera) para enlazar el índice de búsqueda.
+# Como todas las migraciones, el esquema va escrito tal cual y no se toca.
+TABLA_PRODUCTOS_BASE_V3 = """
+CREATE TABLE productos_base (
+    clave INTEGER PRIMARY KEY,
+    id TEXT,
+    warehouse TEXT NOT NULL DEFAULT 'default',
+    nombre TEXT,
+    categoria_L1_id INTEGER REFERENCES categorias(id),
+    categoria_L2_id INTEGER REFERENCES categorias(id),
+    categoria_L3_id INTEGER REFERENCES categorias(id),
+    precio_con_descuento REAL,
+    precio_sin_descuento REAL,
+    packaging TEXT,
+    bulk_price REAL,
+    unit_size REAL,
+    size_format TEXT,
+    iva INTEGER,
+    selling_method INTEGER,
+    is_pack INTEGER,
+    is_new INTEGER,
+    price_decreased INTEGER,
+    unavailable_from TEXT,
+    url TEXT,
+    imagen TEXT,
+    last_updated TEXT,
+    UNIQUE (id, warehouse)
+)
+"""
+
+VISTA_PRODUCTOS_V3 = """
+CREATE VIEW productos AS
+SELECT p.id, p.warehouse, p.nombre,
+    c1.nombre AS categoria_L1, c2.nombre AS categoria_L2, c3.nombre AS categoria_L3,
+    p.precio_con_descuento, p.precio_sin_descuento, p.packaging, p.bulk_price, p.unit_size,
+    p.size_format, p.iva, p.selling_method, p.is_pack, p.is_new, p.price_decreased,
+    p.unavailable_from, p.url, p.imagen, p.last_updated,
+    p.categoria_L1_id, p.categoria_L2_id, p.categoria_L3_id, p.clave
+FROM productos_base p
+LEFT JOIN categorias c1 ON c1.id = p.categoria_L1_id
+LEFT JOIN categorias c2 ON c2.id = p.categoria_L2_id
+LEFT JOIN categorias c3 ON c3.id = p.categoria_L3_id
+"""
+
+# Índice de texto completo sobre nombre, categorías y envase: palabras
+# sin acentos ni mayúsculas, con índices de prefijos de 2 y 3 letras. Su
+# rowid es `productos_base.clave`. `productos_fts_vocab` lista sus
+# palabras, para corregir erratas en la búsqueda.
+TABLAS_BUSQUEDA = (
+    """CREATE VIRTUAL TABLE productos_fts USING fts5(
+        nombre, categorias, packaging, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    "CREATE VIRTUAL TABLE productos_fts_vocab USING fts5vocab(productos_fts, 'row')",
+)
+
+_CATEGORIAS_FTS = """(SELECT group_concat(nombre, ' ') FROM categorias
+    WHERE id IN ({fila}.categoria_L1_id, {fila}.categoria_L2_id, {fila}.categoria_L3_id))"""
+
+# Los triggers mantienen el índice al día en cualquier escritura de productos_base
+TRIGGERS_BUSQUEDA = (
+    f"""CREATE TRIGGER busqueda_producto_nuevo AFTER INSERT ON productos_base
+    BEGIN
+        INSERT INTO productos_fts (rowid, nombre, categorias, packaging)
+        VALUES (NEW.clave, NEW.nombre, {_CATEGORIAS_FTS.format(fila="NEW")}, NEW.packaging);
+    END""",
+    f"""CREATE TRIGGER busqueda_producto_modificado
+    AFTER UPDATE OF nombre, categoria_L1_id, categoria_L2_id, categoria_L3_id, packaging ON productos_base
+    BEGIN
+        UPDATE productos_fts SET nombre = NEW.nombre, categorias = {_CATEGORIAS_FTS.format(fila="NEW")},
+            packaging = NEW.packaging
+        WHERE rowid = NEW.clave;
+    END""",
+    """CREATE TRIGGER busqueda_producto_borrado AFTER DELETE ON productos_base
+    BEGIN
+        DELETE FROM productos_fts WHERE rowid = OLD.clave;
+    END""",
+)
+
+def _migracion_busqueda(cursor):
+    """Añade `clave` a productos_base y crea el índice de búsqueda de texto."""
+    cursor.execute("DROP VIEW productos")
+    cursor.execute("ALTER TABLE productos_base RENAME TO productos_base_v2")
+    cursor.execute(TABLA_PRODUCTOS_BASE_V3)
+    columnas = """id, warehouse, nombre, categoria_L1_id, categoria_L2_id, categoria_L3_id,
+        precio_con_descuento, precio_sin_descuento, packaging, bulk_price, unit_size, size_format, iva,
+        selling_method, is_pack, is_new, price_decreased, unavailable_from, url, imagen, last_updated"""
+    cursor.execute(f"INSERT INTO productos_base ({columnas}) SELECT {columnas} FROM productos_base_v2 ORDER BY warehouse, id")
+    cursor.execute("DROP TABLE productos_base_v2")  # También borra idx_productos_categoria
+    cursor.execute(VISTA_PRODUCTOS_V3)
+    cursor.execute("""CREATE INDEX idx_productos_categoria
+    ON productos_base(warehouse, categoria_L1_id, categoria_L2_id, categoria_L3_id)""")
+    for create_sql in TABLAS_BUSQUEDA:
+        cursor.execute(create_sql)
+    cursor.execute(f"""
+    INSERT INTO productos_fts (rowid, nombre, categorias, packaging)
+    SELECT p.clave, p.nombre, {_CATEGORIAS_FTS.format(fila="p")}, p.packaging FROM productos_base p
+    """)
+    for create_sql in TRIGGERS_BUSQUEDA:
+        cursor.execute(create_sql)
+
+# Migración 4: índices para ordenar el explorador de productos por clave
+# (keyset). Como `clave` es el rowid, cada índice queda ordenado por
+# (warehouse, columna, clave) y una página es un recorrido de LIMIT filas.
+INDICES_ORDEN = (
+    "CREATE INDEX idx_productos_nombre ON productos_base(warehouse, nombre)",
+    "CREATE INDEX idx_productos_precio ON productos_base(warehouse, precio_con_descuento)",
+    "CREATE INDEX idx_productos_precio_unidad ON productos_base(warehouse, bulk_price)",
+)
+
+def _migracion_indices_orden(cursor):
+    for create_sql in INDICES_ORDEN:
+        cursor.execute(create_sql)
+
+# Migración 5: productos de marca blanca por grupo en `resumen_diario`
+# (scripts/rollups.py). Se rellena el último día de cada almacén con el
+# catálogo actual, que es de donde copia la siguiente ingesta; los días
+# anteriores quedan a 0. La marca va escrita tal cual, como en el resto
+# de migraciones, aunque cambie después rollups.MARCA_BLANCA.
+def _migracion_marca_blanca(cursor):
+    cursor.execute("ALTER TABLE resumen_diario ADD COLUMN marca_blanca INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("""
+    UPDATE resumen_diario SET marca_blanca = (
+        SELECT COUNT(*) FROM precios_intervalos i
+        JOIN productos p ON p.id = i.producto_id AND p.warehouse = i.warehouse
+        WHERE i.warehouse = resumen_diario.warehouse AND i.valid_to IS NULL
+            AND i.precio_con_descuento IS NOT NULL AND instr(lower(p.nombre), ?) > 0
+            AND (resumen_diario.nivel NOT IN ('L1', 'L2', 'L1_iva') OR p.categoria_L1 = resumen_diario.categoria_L1)
+            AND (resumen_diario.nivel <> 'L2' OR p.categoria_L2 = resumen_diario.categoria_L2)
+            AND (resumen_diario.nivel NOT IN ('iva', 'L1_iva') OR COALESCE(p.iva, -1) = resumen_diario.iva)
+    )
+    WHERE fecha = (SELECT MAX(fecha) FROM resumen_diario r WHERE r.warehouse = resumen_diario.warehouse)
+    """, ("hacendado",))
+
+# Migraciones del esquema en orden: (versión, descripción, función). La
+# versión aplicada se guarda en `PRAGMA user_version`; las nuevas se
+# añaden al final con el número siguiente.
+MIGRACIONES = (
+    (1, "esquema inicial", _migracion_inicial),
+    (2, "dimensión de categorías", _migracion_categorias),
+    (3, "clave de producto e índice de búsqueda", _migracion_busqueda),
+    (4, "índices de orden del explorador de productos", _migracion_indices_orden),
+    (5, "marca blanca en los resúmenes diarios", _migracion_marca_blanca),
+)
+
+def version_esquema(conn):
+    """Versión del esquema de la base de datos (0 si no se ha migrado nunca)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrar(conn):
+    """Aplica las migraciones pendientes, cada una en su propia transacción.
 
-    conn.commit()
+    Devuelve la lista de versiones aplicadas. Si una migración falla se
+    deshace entera y la base de datos queda en la versión anterior.
+    """
+    aplicadas = []
+    for version, descripcion, migracion in MIGRACIONES:
+        if version <= version_esquema(conn):
+            continue
+        conn.execute("BEGIN")
+        try:
+            migracion(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Migración {version} aplicada: {descripcion}")
+        aplicadas.append(version)
+    return aplicadas
+
+# scripts/db_utils.py
+def create_database():
+    """Crea la base de datos o la actualiza a la última versión del esquema."""
+    conn = sqlite3.connect(DB_PATH)
+    migrar(conn)
     conn.close()
 
-def save_json_to_db(json_file):
-    """Guarda los datos del JSON en la base de datos."""
-    conn = sqlite3.connect("data/productos.db")
+def cargar_huellas(conn):
+    """Devuelve las huellas guardadas por clave (warehouse, L1, L2, L3) y (producto_id, warehouse)."""
     cursor = conn.cursor()
+    cursor.execute("SELECT warehouse, categoria_L1, categoria_L2, categoria_L3, huella FROM huellas_categorias")
+    categorias = {tuple(row[:4]): row[4] for row in cursor.fetchall()}
+    cursor.execute("SELECT producto_id, warehouse, huella FROM huellas_productos")
+    productos = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+    return categorias, productos
 
-    with open(json_file, "r", encoding="utf-8") as file:
-        productos = json.load(file)
+def guardar_huellas(conn, categoria, huella_categoria, huellas_productos):
+    """Guarda la huella de una categoría L3 y las de sus productos modificados.
 
-    for producto in productos:
-        cursor.execute("""
-        INSERT OR REPLACE INTO productos VALUES (
-            :id, :nombre, :categoria_L1, :categoria_L2, :categoria_L3,
-            :precio_con_descuento, :precio_sin_descuento, :packaging, :bulk_price,
-            :unit_size, :size_format, :iva, :selling_method, :is_pack, :is_new,
-            :price_decreased, :unavailable_from, :url, :imagen
-        )
-        """, producto)
+    `categoria` es (warehouse, L1, L2, L3) y `huellas_productos` una lista
+    de (producto_id, warehouse, huella).
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+    INSERT OR REPLACE INTO huellas_categorias (warehouse, categoria_L1, categoria_L2, categoria_L3, huella)
+    VALUES (?, ?, ?, ?, ?)
+    """, (*categoria, huella_categoria))
+    cursor.executemany("""
+    INSERT OR REPLACE INTO huellas_productos (producto_id, warehouse, huella) VALUES (?, ?, ?)
+    """, huellas_productos)
 
-    conn.commit()
-    conn.close()
+def cargar_intervalos_abiertos(conn):
+    """Devuelve el conjunto de (producto_id, warehouse) con un intervalo de precio abierto."""
+    cursor = conn.execute("SELECT producto_id, warehouse FROM precios_intervalos WHERE valid_to IS NULL")
+    return {(row[0], row[1]) for row in cursor.fetchall()}
 
-# scripts/db_utils.py
-def update_product_prices(productos):
-    """Actualiza los precios de los productos y guarda el histórico."""
-    conn = get_db_connection()
+def cargar_huellas_detalle(conn):
+    """Devuelve {(producto_id, warehouse): huella} de los detalles ya descargados."""
     cursor = conn.cursor()
+    cursor.execute("SELECT producto_id, warehouse, huella FROM productos_detalle")
+    return {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+
+def guardar_detalles(conn, detalles):
+    """Inserta o reemplaza filas de productos_detalle (diccionarios con DETALLE_COLUMNS)."""
+    columnas = ", ".join(DETALLE_COLUMNS)
+    marcadores = ", ".join("?" for _ in DETALLE_COLUMNS)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO productos_detalle ({columnas}) VALUES ({marcadores})",
+        [tuple(detalle.get(columna) for columna in DETALLE_COLUMNS) for detalle in detalles]
+    )
+
+def save_json_to_db(json_file, fecha=None):
+    """Guarda los datos del JSON (array o JSONL) en la base de datos.
+
+    El fichero se importa en streaming y por lotes (scripts/json_import.py).
+    """
+    from scripts.json_import import importar_json  # json_import depende de este módulo
+    return importar_json(json_file, fecha)
+
+def parametros_producto(producto):
+    """Parámetros del INSERT de `productos` para un ProductRecord o un diccionario de parse_product."""
+    if hasattr(producto, "as_db_params"):
+        return producto.as_db_params()
+    return (
+        producto["id"], producto.get("warehouse", DEFAULT_WAREHOUSE),
+        producto["nombre"], producto["categoria_L1"],
+        producto["categoria_L2"], producto["categoria_L3"],
+        producto["precio_con_descuento"], producto["precio_sin_descuento"],
+        producto["packaging"], producto["bulk_price"], producto["unit_size"],
+        producto["size_format"], producto["iva"], producto["selling_method"],
+        producto["is_pack"], producto["is_new"], producto["price_decreased"],
+        producto["unavailable_from"], producto["url"], producto["imagen"]
+    )
+
+# Columnas de `productos` en el orden de parametros_producto
+COLUMNAS_PRODUCTO = (
+    "id", "warehouse", "nombre", "categoria_L1", "categoria_L2", "categoria_L3",
+    "precio_con_descuento", "precio_sin_descuento", "packaging",
+    "bulk_price", "unit_size", "size_format", "iva", "selling_method",
+    "is_pack", "is_new", "price_decreased", "unavailable_from", "url", "imagen"
+)
+
+# Columnas de `productos_base`: las de COLUMNAS_PRODUCTO con los ids de
+# categoría en lugar de los nombres
+COLUMNAS_PRODUCTO_BASE = COLUMNAS_PRODUCTO[:3] + COLUMNAS_ID_CATEGORIA + COLUMNAS_PRODUCTO[6:]
+
+# Filas por llamada a executemany
+CHUNK_SIZE = 1000
+
+# Upsert real: si el producto ya existe solo se actualiza cuando alguna
+# columna ha cambiado, y `last_updated` queda como la fecha del último cambio
+_COLUMNAS_DATOS = COLUMNAS_PRODUCTO_BASE[2:]
+UPSERT_PRODUCTOS = f"""
+INSERT INTO productos_base ({", ".join(COLUMNAS_PRODUCTO_BASE)}, last_updated)
+VALUES ({", ".join("?" * (len(COLUMNAS_PRODUCTO_BASE) + 1))})
+ON CONFLICT(id, warehouse) DO UPDATE SET
+    {", ".join(f"{c} = excluded.{c}" for c in _COLUMNAS_DATOS)},
+    last_updated = excluded.last_updated
+WHERE {" OR ".join(f"productos_base.{c} IS NOT excluded.{c}" for c in _COLUMNAS_DATOS)}
+"""
+
+# Registros del antiguo scraper de Selenium (scripts/json_import.py): solo
+# traen nombre, categorías L1/L2, precio, envase y URL. Un producto que ya
+# existe conserva el resto de columnas y las que falten en el registro; su
+# L2 y su L3 solo se conservan si siguen bajo la misma categoría padre.
+_L1_LEGADO = "COALESCE(excluded.categoria_L1_id, productos_base.categoria_L1_id)"
+_ASIGNACIONES_LEGADO = (
+    ("categoria_L1_id", _L1_LEGADO),
+    ("categoria_L2_id", f"""CASE WHEN excluded.categoria_L2_id IS NOT NULL THEN excluded.categoria_L2_id
+        WHEN {_L1_LEGADO} IS productos_base.categoria_L1_id THEN productos_base.categoria_L2_id END"""),
+    ("categoria_L3_id", f"""CASE WHEN {_L1_LEGADO} IS productos_base.categoria_L1_id
+        AND COALESCE(excluded.categoria_L2_id, productos_base.categoria_L2_id) IS productos_base.categoria_L2_id
+        THEN productos_base.categoria_L3_id END"""),
+) + tuple(
+    (c, f"COALESCE(excluded.{c}, productos_base.{c})") for c in ("nombre", "precio_con_descuento", "packaging", "url")
+)
+UPSERT_PRODUCTOS_LEGADO = f"""
+INSERT INTO productos_base ({", ".join(COLUMNAS_PRODUCTO_BASE)}, last_updated)
+VALUES ({", ".join("?" * (len(COLUMNAS_PRODUCTO_BASE) + 1))})
+ON CONFLICT(id, warehouse) DO UPDATE SET
+    {", ".join(f"{c} = {valor}" for c, valor in _ASIGNACIONES_LEGADO)},
+    last_updated = excluded.last_updated
+WHERE {" OR ".join(f"({valor}) IS NOT productos_base.{c}" for c, valor in _ASIGNACIONES_LEGADO)}
+"""
+
+# Histórico por intervalos: primero se cierra el intervalo abierto si el
+# precio ha cambiado y después se abre uno nuevo (o, si el abierto empezó
+# el mismo día, se corrige su precio)
+CERRAR_INTERVALOS = """
+UPDATE precios_intervalos SET valid_to = ?4
+WHERE producto_id = ?1 AND warehouse = ?2 AND valid_to IS NULL
+    AND valid_from < ?4 AND precio_con_descuento IS NOT ?3
+"""
+
+ABRIR_INTERVALOS = """
+INSERT INTO precios_intervalos (producto_id, warehouse, precio_con_descuento, valid_from)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(producto_id, warehouse) WHERE valid_to IS NULL DO UPDATE SET
+    precio_con_descuento = excluded.precio_con_descuento
+WHERE precios_intervalos.precio_con_descuento IS NOT excluded.precio_con_descuento
+"""
+
+def configurar_escritura(conn):
+    """Ajusta la conexión para una ingesta masiva: WAL, sync NORMAL y caché grande."""
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")  # Seguro con WAL; solo se sincroniza en el checkpoint
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -65536")  # 64 MB
+
+def cerrar_escritura(conn):
+    """Vuelca el WAL al fichero principal y vuelve al modo de journal normal.
 
-    # Obtener la fecha actual
-    fecha_actualizacion = datetime.now().strftime("%Y-%m-%d")
+    Así `data/productos.db` queda como un único fichero autocontenido (se
+    sube al repositorio y la app lo abre en solo lectura). Si otra conexión
+    tiene la base de datos abierta el cambio de modo no es posible; se deja
+    en WAL y la última conexión en cerrarse vuelca y borra el fichero -wal.
+    """
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    try:
+        conn.execute("PRAGMA journal_mode = DELETE")
+    except sqlite3.OperationalError:
+        pass
 
+def _chunks(filas, size=CHUNK_SIZE):
+    """Agrupa un iterable de filas en listas de `size` elementos."""
+    chunk = []
+    for fila in filas:
+        chunk.append(fila)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _id_categoria(conn, nivel, nombre, padre_id):
+    """Id de una categoría de la dimensión; la crea si no existe."""
+    if nombre is None or padre_id is None:
+        return None
+    fila = conn.execute("SELECT id FROM categorias WHERE padre_id = ? AND nombre = ?", (padre_id, nombre)).fetchone()
+    if fila:
+        return fila[0]
+    return conn.execute("INSERT INTO categorias (nivel, nombre, padre_id) VALUES (?, ?, ?)",
+                        (nivel, nombre, padre_id)).lastrowid
+
+def ids_categoria(conn, L1, L2, L3, cache=None):
+    """Ids (L1, L2, L3) de una ruta de categoría, creando las que falten.
+
+    `cache` es un diccionario opcional {ruta: ids} para no repetir las
+    búsquedas dentro de una misma ingesta.
+    """
+    clave = (L1, L2, L3)
+    if cache is not None and clave in cache:
+        return cache[clave]
+    id_L1 = _id_categoria(conn, 1, L1, 0)
+    id_L2 = _id_categoria(conn, 2, L2, id_L1)
+    ids = (id_L1, id_L2, _id_categoria(conn, 3, L3, id_L2))
+    if cache is not None:
+        cache[clave] = ids
+    return ids
+
+def _parametros_base(conn, producto, fecha, cache):
+    """Parámetros de UPSERT_PRODUCTOS: los nombres de categoría pasan a ids."""
+    params = parametros_producto(producto)
+    return params[:3] + ids_categoria(conn, *params[3:6], cache=cache) + params[6:] + (fecha,)
+
+def upsert_productos(conn, productos, fecha=None, legado=False):
+    """Inserta o actualiza productos con executemany por bloques.
+
+    No confirma la transacción. Devuelve el número de filas insertadas o
+    modificadas (las que no han cambiado no se reescriben). Con `legado`
+    los productos vienen del antiguo scraper de Selenium y solo se
+    actualizan las columnas que este trae (UPSERT_PRODUCTOS_LEGADO).
+    """
+    fecha = fecha or datetime.now().strftime("%Y-%m-%d")
+    upsert = UPSERT_PRODUCTOS_LEGADO if legado else UPSERT_PRODUCTOS
+    escritas = 0
+    cache = {}
+    for chunk in _chunks(_parametros_base(conn, producto, fecha, cache) for producto in productos):
+        cursor = conn.executemany(upsert, chunk)
+        escritas += cursor.rowcount
+    return escritas
+
+def upsert_historico(conn, productos, fecha=None):
+    """Registra el precio del día de cada producto en `precios_intervalos` (sin confirmar).
+
+    Solo se escribe algo cuando el precio cambia o el producto es nuevo;
+    la fecha queda anotada en `fechas_ingesta` para la vista diaria.
+    """
+    fecha = fecha or datetime.now().strftime("%Y-%m-%d")
+    warehouses = set()
+    filas = []
     for producto in productos:
-        producto_id = producto["id"]
-        precio_con_descuento = producto["precio_con_descuento"]
-
-        # Insertar o actualizar el histórico de precios
-        cursor.execute("""
-        INSERT INTO precios_historicos (producto_id, precio_con_descuento, fecha_actualizacion)
-        VALUES (?, ?, ?)
-        ON CONFLICT(producto_id, fecha_actualizacion) DO UPDATE SET
-            precio_con_descuento = excluded.precio_con_descuento
-        """, (producto_id, precio_con_descuento, fecha_actualizacion))
-
-        # Actualizar la tabla productos
-        cursor.execute("""
-        UPDATE productos
-        SET precio_con_descuento = ?, last_updated = ?
-        WHERE id = ?
-        """, (precio_con_descuento, fecha_actualizacion, producto_id))
+        warehouse = producto.get("warehouse", DEFAULT_WAREHOUSE)
+        warehouses.add(warehouse)
+        filas.append((producto["id"], warehouse, producto["precio_con_descuento"], fecha))
+    for chunk in _chunks(filas):
+        conn.executemany(CERRAR_INTERVALOS, chunk)
+        conn.executemany(ABRIR_INTERVALOS, chunk)
+    registrar_ingesta(conn, warehouses, fecha)
+
+def registrar_ingesta(conn, warehouses, fecha):
+    """Anota que hoy se ha hecho una ingesta de estos almacenes."""
+    conn.executemany("INSERT OR IGNORE INTO fechas_ingesta (warehouse, fecha) VALUES (?, ?)",
+                     [(warehouse, fecha) for warehouse in warehouses])
+
+def preparar_vistos(conn):
+    """Crea la tabla temporal con los productos vistos en la ingesta en curso."""
+    conn.execute("DROP TABLE IF EXISTS temp.productos_vistos")
+    conn.execute("""
+    CREATE TEMP TABLE productos_vistos (
+        producto_id TEXT,
+        warehouse TEXT,
+        PRIMARY KEY (producto_id, warehouse)
+    ) WITHOUT ROWID
+    """)
+
+def marcar_vistos(conn, productos):
+    """Añade productos a la tabla temporal de vistos."""
+    conn.executemany(
+        "INSERT OR IGNORE INTO temp.productos_vistos (producto_id, warehouse) VALUES (?, ?)",
+        [(producto["id"], producto.get("warehouse", DEFAULT_WAREHOUSE)) for producto in productos]
+    )
+
+# Intervalos abiertos de un almacén cuyo producto no se ha visto en la ingesta
+_DESAPARECIDOS = """
+SELECT producto_id FROM precios_intervalos i
+WHERE i.warehouse = ? AND i.valid_to IS NULL AND NOT EXISTS (
+    SELECT 1 FROM temp.productos_vistos v WHERE v.producto_id = i.producto_id AND v.warehouse = i.warehouse
+)
+"""
+
+def cerrar_desaparecidos(conn, warehouses, fecha=None):
+    """Cierra los intervalos abiertos de los productos que no han aparecido en la ingesta.
+
+    Solo afecta a los almacenes recorridos. También borra las huellas de
+    esos productos y de sus categorías L3, para que la actualización
+    incremental los vuelva a escribir (y les abra un intervalo) si
+    reaparecen sin cambios. Devuelve cuántos se han cerrado.
+    """
+    fecha = fecha or datetime.now().strftime("%Y-%m-%d")
+    cerrados = 0
+    for warehouse in warehouses:
+        conn.execute(f"""
+        DELETE FROM huellas_categorias
+        WHERE (warehouse, categoria_L1, categoria_L2, categoria_L3) IN (
+            SELECT warehouse, categoria_L1, categoria_L2, categoria_L3 FROM productos
+            WHERE warehouse = ? AND id IN ({_DESAPARECIDOS})
+        )
+        """, (warehouse, warehouse))
+        conn.execute(f"DELETE FROM huellas_productos WHERE warehouse = ? AND producto_id IN ({_DESAPARECIDOS})",
+                     (warehouse, warehouse))
+        cursor = conn.execute(f"""
+        UPDATE precios_intervalos SET valid_to = ?
+        WHERE warehouse = ? AND valid_to IS NULL AND producto_id IN ({_DESAPARECIDOS})
+        """, (fecha, warehouse, warehouse))
+        cerrados += cursor.rowcount
+    # Intervalos abiertos y cerrados el mismo día: no cubren ninguna fecha
+    conn.execute("DELETE FROM precios_intervalos WHERE valid_to = valid_from")
+    return cerrados
+
+def guardar_lote(conn, productos, fecha=None, legado=False):
+    """Escribe un lote en `productos` y en el histórico, dentro de la transacción en curso."""
+    productos = list(productos)
+    fecha = fecha or datetime.now().strftime("%Y-%m-%d")
+    escritas = upsert_productos(conn, productos, fecha, legado)
+    upsert_historico(conn, productos, fecha)
+    return escritas
+
+def guardar_datos_en_db(productos, conn=None):
+    """Guarda los datos obtenidos de la API en la base de datos.
+
+    Si se pasa una conexión, se usa sin confirmar ni cerrarla (la
+    transacción la gestiona quien llama).
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    upsert_productos(conn, productos)
 
     # Guardar los cambios y cerrar la conexión
-    conn.commit()
-    conn.close()
+    if own_conn:
+        conn.commit()
+        conn.close()
+
+# scripts/db_utils.py
+def update_product_prices(productos, conn=None):
+    """Guarda el histórico de precios de los productos.
+
+    El precio de `productos` ya lo escribe guardar_datos_en_db; aquí solo
+    se actualiza el histórico del día.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    upsert_historico(conn, productos)
+
+    # Guardar los cambios y cerrar la conexión
+    if own_conn:
+        conn.commit()
+        conn.close()
 
 
 
@@ -0,0 +1,235 @@
+# scripts/fake_api.py
+"""Servidor local que imita la API de categorías de Mercadona.
+
+Sirve un catálogo sintético de tamaño configurable (L1 x L2 x L3 x
+productos) en /api/categories/, /api/categories/{id} y
+/api/products/{id}/ (los precios varían según el parámetro `wh`),
+resuelve códigos postales a almacenes en
+/api/postal-codes/actions/change-pc/, simula latencia con jitter e
+inyecta errores 429 (con Retry-After) y 5xx para probar el rendimiento,
+los reintentos y el límite de ritmo del scraper sin tocar la tienda real:
+
+    python -m scripts.fake_api --port 8000 --latency 50 --jitter 30 --throttle-rate 0.1 --error-rate 0.05
+    MERCADONA_API_URL=http://127.0.0.1:8000/api python main.py
+"""
+import argparse
+import copy
+import json
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def build_catalog(n_l1=3, n_l2=4, n_l3=3, n_products=10, seed=0):
+    """Genera un catálogo sintético: (categorías L1, detalle de cada L2 por id)."""
+    rng = random.Random(seed)
+    categories = []
+    details = {}
+    product_id = 0
+    for i in range(n_l1):
+        l2_list = []
+        for j in range(n_l2):
+            l2_id = (i + 1) * 100 + j
+            l3_list = []
+            for k in range(n_l3):
+                products = []
+                for _ in range(n_products):
+                    product_id += 1
+                    products.append(_build_product(product_id, rng))
+                l3_list.append({"id": l2_id * 100 + k, "name": f"Categoría L3 {i}.{j}.{k}", "products": products})
+            l2_list.append({"id": l2_id, "name": f"Categoría L2 {i}.{j}"})
+            details[l2_id] = {"id": l2_id, "name": f"Categoría L2 {i}.{j}", "categories": l3_list}
+        categories.append({"id": i + 1, "name": f"Categoría L1 {i}", "categories": l2_list})
+    return categories, details
+
+
+def _build_product(product_id, rng):
+    """Genera un producto con la misma forma que los de la API real."""
+    unit_price = round(rng.uniform(0.5, 30), 2)
+    return {
+        "id": str(product_id),
+        "display_name": f"Producto {product_id}" + (" Hacendado" if product_id % 3 == 0 else ""),
+        "packaging": rng.choice(["Paquete", "Botella", "Bandeja", None]),
+        "share_url": f"https://tienda.mercadona.es/product/{product_id}/producto",
+        "thumbnail": f"https://prod-mercadona.imgix.net/images/{product_id}.jpg",
+        "unavailable_from": None,
+        "price_instructions": {
+            "unit_price": f"{unit_price:.2f}",
+            "previous_unit_price": None,
+            "bulk_price": f"{unit_price * 2:.2f}",
+            "unit_size": round(rng.uniform(0.1, 5), 3),
+            "size_format": rng.choice(["kg", "l", "ud"]),
+            "iva": rng.choice([4, 10, 21]),
+            "selling_method": 0,
+            "is_pack": False,
+            "is_new": product_id % 50 == 0,
+            "price_decreased": False,
+        },
+    }
+
+
+def warehouse_detail(detail, warehouse):
+    """Copia del detalle de una L2 con los precios ajustados para un almacén."""
+    if not warehouse:
+        return detail
+    factor = 1 + (zlib.crc32(warehouse.encode("utf-8")) % 11 - 5) / 100  # ±5 %
+    detail = copy.deepcopy(detail)
+    for category_L3 in detail["categories"]:
+        for product in category_L3["products"]:
+            instructions = product["price_instructions"]
+            instructions["unit_price"] = f"{float(instructions['unit_price']) * factor:.2f}"
+    return detail
+
+
+def product_detail(product):
+    """Detalle de un producto con la forma de /api/products/{id}/."""
+    return dict(
+        product,
+        ean=f"84{int(product['id']):011d}",
+        brand="Hacendado" if "Hacendado" in product["display_name"] else "Marca",
+        details={
+            "description": product["display_name"],
+            "legal_name": f"Denominación legal de {product['display_name']}",
+            "origin": "España",
+            "suppliers": [{"name": "Proveedor S.A."}],
+            "storage_instructions": "Conservar en lugar fresco y seco",
+            "usage_instructions": None,
+        },
+        nutrition_information={"ingredients": "Ingredientes", "allergens": None},
+    )
+
+
+def postal_code_warehouse(postal_code):
+    """Almacén ficticio de un código postal (uno por provincia)."""
+    return f"wh{postal_code[:2]}"
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Permite keep-alive
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.count_request()
+        server.simulate_latency()
+
+        roll = server.rng_random()
+        if roll < server.throttle_rate:
+            return self._send(429, {"error": "Too Many Requests"}, {"Retry-After": str(server.retry_after)})
+        if roll < server.throttle_rate + server.error_rate:
+            return self._send(503 if roll < server.throttle_rate + server.error_rate / 2 else 500,
+                              {"error": "Server Error"})
+
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        warehouse = parse_qs(url.query).get("wh", [None])[0]
+        if path == "/api/categories":
+            return self._send(200, {"count": len(server.categories), "results": server.categories})
+        if path.startswith("/api/products/"):
+            product = server.products.get(path.rsplit("/", 1)[1])
+            if product is not None:
+                return self._send(200, product_detail(product))
+        if path.startswith("/api/categories/"):
+            try:
+                detail = server.details.get(int(path.rsplit("/", 1)[1]))
+            except ValueError:
+                detail = None
+            if detail is not None:
+                return self._send(200, warehouse_detail(detail, warehouse))
+        self._send(404, {"error": "Not Found"})
+
+    def do_PUT(self):
+        if self.path.rstrip("/") != "/api/postal-codes/actions/change-pc":
+            return self._send(404, {"error": "Not Found"})
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        postal_code = str(body.get("new_postal_code", ""))
+        if len(postal_code) != 5 or not postal_code.isdigit():
+            return self._send(400, {"error": "Invalid postal code"})
+        self._send(204, None, {"x-customer-wh": postal_code_warehouse(postal_code)})
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeAPIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, catalog, throttle_rate=0.0, error_rate=0.0, retry_after=0, seed=0,
+                 latency=0.0, jitter=0.0):
+        super().__init__(address, FakeAPIHandler)
+        self.latency = latency  # Segundos fijos por respuesta
+        self.jitter = jitter    # Segundos extra aleatorios (uniforme entre 0 y jitter)
+        self.categories, self.details = catalog
+        self.products = {
+            product["id"]: product
+            for detail in self.details.values()
+            for category_L3 in detail["categories"]
+            for product in category_L3["products"]
+        }
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def rng_random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def simulate_latency(self):
+        delay = self.latency + (self.rng_random() * self.jitter if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/api"
+
+
+def start_server(port=0, catalog=None, **kwargs):
+    """Arranca el servidor en un hilo en segundo plano y lo devuelve."""
+    server = FakeAPIServer(("127.0.0.1", port), catalog or build_catalog(), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API falsa de Mercadona para pruebas locales.")
+    parser.add_argument("--port", type=int, default=8000, help="Puerto (0 = uno libre cualquiera)")
+    parser.add_argument("--l1", type=int, default=3, help="Categorías L1")
+    parser.add_argument("--l2", type=int, default=4, help="Categorías L2 por cada L1")
+    parser.add_argument("--l3", type=int, default=3, help="Categorías L3 por cada L2")
+    parser.add_argument("--products", type=int, default=10, help="Productos por cada L3")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia fija por respuesta (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latencia aleatoria adicional máxima (ms)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fracción de respuestas 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 500/503")
+    parser.add_argument("--retry-after", type=int, default=1, help="Valor de Retry-After en los 429")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.l1, args.l2, args.l3, args.products, args.seed)
+    server = FakeAPIServer(("127.0.0.1", args.port), catalog, args.throttle_rate, args.error_rate,
+                           args.retry_after, args.seed, args.latency / 1000, args.jitter / 1000)
+    print(f"API falsa escuchando en {server.base_url}")
+    sys.stdout.flush()  # El benchmark lee esta línea para conocer el puerto
+    server.serve_forever()
@@ -7,8 +7,7 @@ from datetime import date
 import os
 import toml
 from selenium.webdriver.chrome.service import Service
-import requests
-import uuid
+from scripts.image_cache import ImageCache
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -98,14 +97,9 @@ def get_images(driver):
     img_url = img_element.get_attribute('src')
     if not os.path.exists('imgs'):
         os.makedirs('imgs')
-    img_data = requests.get(img_url).content
-    img_filename = str(uuid.uuid4()) + '.jpg'
-    img_path = os.path.join('imgs', img_filename)
-    img_data = requests.get(img_url).content
-    with open(img_path, 'wb') as file:
-        file.write(img_data)
-
-    return img_path
+    # Guardar por contenido: la misma imagen se reutiliza en vez de duplicarse
+    _, _, img_filename, _ = ImageCache('imgs').download(img_url)
+    return os.path.join('imgs', img_filename)
 
 
 def load_config():
@@ -0,0 +1,178 @@
+# scripts/http_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Constantes
+CACHE_DIR = "data/http_cache"
+CACHE_MODES = ("off", "revalidate", "replay")
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_SIZE_MB = 200
+
+
+class CacheMissError(LookupError):
+    """Se lanza en modo replay cuando una URL no está en la caché."""
+
+
+class CachedResponse:
+    """Respuesta servida por la caché (o descargada a través de ella)."""
+
+    def __init__(self, status_code, content, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ResponseCache:
+    """Caché en disco de respuestas HTTP indexada por URL.
+
+    Modos:
+    - "revalidate": reutiliza el cuerpo guardado si el servidor responde 304
+      a una petición condicional (If-None-Match / If-Modified-Since). Si el
+      servidor no las soporta, compara el hash del contenido descargado.
+    - "replay": sirve todo desde disco sin tocar la red (ejecuciones offline
+      y reproducibles). Una URL ausente lanza CacheMissError.
+    """
+
+    def __init__(self, directory=CACHE_DIR, mode="revalidate",
+                 max_age_days=DEFAULT_MAX_AGE_DAYS, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        if mode not in CACHE_MODES or mode == "off":
+            raise ValueError(f"Modo de caché no válido: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.max_age = max_age_days * 86400
+        self.max_size = max_size_mb * 1024 * 1024
+        self.stats = {"hits": 0, "not_modified": 0, "unchanged": 0, "downloaded": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        """Devuelve las rutas del cuerpo y los metadatos de una URL."""
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".body", base + ".meta.json"
+
+    def _load(self, url):
+        """Lee la entrada de una URL; devuelve (metadatos, cuerpo) o (None, None)."""
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (FileNotFoundError, ValueError):
+            return None, None
+        return meta, body
+
+    def _write(self, path, data):
+        """Escribe un fichero de forma atómica."""
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        mode = "wb" if isinstance(data, bytes) else "w"
+        with open(tmp_path, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _save_meta(self, url, meta):
+        _, meta_path = self._paths(url)
+        meta["last_used"] = time.time()
+        self._write(meta_path, json.dumps(meta))
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, session, url, timeout=None):
+        """Obtiene una URL a través de la caché."""
+        meta, body = self._load(url)
+
+        if self.mode == "replay":
+            if meta is None:
+                raise CacheMissError(f"URL no disponible en la caché: {url}")
+            self._count("hits")
+            return CachedResponse(200, body)
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = session.get(url, headers=headers, timeout=timeout)
+
+        if response.status_code == 304 and meta is not None:
+            self._count("not_modified")
+            # El servidor ha vuelto a validar la entrada: renovar su edad y sus validadores
+            meta["fetched_at"] = time.time()
+            if response.headers.get("ETag"):
+                meta["etag"] = response.headers["ETag"]
+            if response.headers.get("Last-Modified"):
+                meta["last_modified"] = response.headers["Last-Modified"]
+            self._save_meta(url, meta)
+            return CachedResponse(200, body)
+
+        if response.status_code != 200:
+            return CachedResponse(response.status_code, response.content, headers=response.headers)
+
+        content = response.content
+        content_hash = hashlib.sha256(content).hexdigest()
+        unchanged = meta is not None and meta.get("sha256") == content_hash
+
+        if unchanged:
+            self._count("unchanged")
+        else:
+            self._count("downloaded")
+            body_path, _ = self._paths(url)
+            self._write(body_path, content)
+
+        self._save_meta(url, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "sha256": content_hash,
+            "fetched_at": time.time(),  # Última validación contra el servidor
+            "size": len(content),
+        })
+        return CachedResponse(200, content)
+
+    def evict(self):
+        """Elimina las entradas caducadas y, si hace falta, las menos usadas (LRU)."""
+        if self.mode == "replay":
+            return 0  # En replay la caché es de solo lectura
+
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".meta.json"):
+                continue
+            meta_path = os.path.join(self.directory, name)
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except ValueError:
+                meta = {}
+            body_path = meta_path[:-len(".meta.json")] + ".body"
+            size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            entries.append((meta.get("last_used", 0), meta.get("fetched_at", 0), size, body_path, meta_path))
+
+        removed = 0
+        total_size = sum(entry[2] for entry in entries)
+        # Primero las más antiguas por último uso
+        for last_used, fetched_at, size, body_path, meta_path in sorted(entries):
+            if now - fetched_at <= self.max_age and total_size <= self.max_size:
+                continue
+            for path in (body_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            total_size -= size
+            removed += 1
+        return removed
+
+    def summary(self):
+        """Resumen legible de la actividad de la caché."""
+        return ", ".join(f"{key}={value}" for key, value in self.stats.items())
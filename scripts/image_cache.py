@@ -0,0 +1,166 @@
+# scripts/image_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import requests
+from requests.adapters import HTTPAdapter
+
+# Constantes
+IMAGE_CACHE_DIR = "data/img_cache"
+DEFAULT_MAX_SIZE_MB = 500
+REQUEST_TIMEOUT = 30  # Segundos
+
+_EXTENSIONES = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif"}
+
+
+class ImageCache:
+    """Caché local de imágenes de producto, direccionada por contenido.
+
+    Cada imagen se guarda una sola vez como `<sha256>.<ext>`, aunque la
+    usen varias URLs. Un índice SQLite propio (`index.db`) relaciona cada
+    URL con su fichero y guarda la fecha de último uso para la expulsión
+    LRU por tamaño. Solo la escribe la ingesta (`touch()` con las URLs que
+    siguen en el catálogo); la app lee el índice con `imagen_local()`, en
+    modo de solo lectura.
+    """
+
+    def __init__(self, directory=IMAGE_CACHE_DIR, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        self.directory = directory
+        self.max_size = max_size_mb * 1024 * 1024
+        self._local = threading.local()
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS imagenes (
+            url TEXT PRIMARY KEY,
+            sha256 TEXT,
+            fichero TEXT,
+            tamano INTEGER,
+            ultimo_uso REAL
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_imagenes_sha256 ON imagenes(sha256)")
+        conn.commit()
+
+    def _conn(self):
+        """Conexión al índice, una por hilo."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.directory, "index.db"), timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _session(self):
+        """Sesión HTTP keep-alive, una por hilo."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_maxsize=4))
+            self._local.session = session
+        return session
+
+    def known_urls(self):
+        """Conjunto de URLs que ya están en la caché."""
+        return {row[0] for row in self._conn().execute("SELECT url FROM imagenes")}
+
+    def download(self, url):
+        """Descarga una imagen y la guarda por contenido; devuelve (url, sha256, fichero, tamaño).
+
+        Se puede llamar desde varios hilos a la vez: solo escribe ficheros,
+        el índice lo actualiza `register()` desde el hilo que lo gestiona.
+        """
+        response = self._session().get(url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        content = response.content
+        sha256 = hashlib.sha256(content).hexdigest()
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+        fichero = sha256 + _EXTENSIONES.get(content_type, ".jpg")
+        path = os.path.join(self.directory, fichero)
+        if not os.path.exists(path):  # Misma imagen con otra URL: no se duplica
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return url, sha256, fichero, len(content)
+
+    def register(self, descargas):
+        """Añade al índice el resultado de varias llamadas a `download()`."""
+        now = time.time()
+        conn = self._conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO imagenes (url, sha256, fichero, tamano, ultimo_uso) VALUES (?, ?, ?, ?, ?)",
+            [(*descarga, now) for descarga in descargas]
+        )
+        conn.commit()
+
+    def touch(self, urls):
+        """Marca como usadas ahora las imágenes de varias URLs (las que siguen en el catálogo)."""
+        now = time.time()
+        conn = self._conn()
+        conn.executemany("UPDATE imagenes SET ultimo_uso = ? WHERE url = ?", [(now, url) for url in urls])
+        conn.commit()
+
+    def evict(self):
+        """Elimina las imágenes menos usadas hasta quedar por debajo del tamaño máximo."""
+        conn = self._conn()
+        # Tamaño por fichero (una imagen compartida por varias URLs cuenta una vez)
+        ficheros = conn.execute("""
+        SELECT fichero, MAX(tamano), MAX(ultimo_uso) AS uso
+        FROM imagenes GROUP BY fichero ORDER BY uso
+        """).fetchall()
+        total = sum(row[1] for row in ficheros)
+        eliminados = 0
+        for fichero, tamano, _ in ficheros:
+            if total <= self.max_size:
+                break
+            path = os.path.join(self.directory, fichero)
+            if os.path.exists(path):
+                os.remove(path)
+            conn.execute("DELETE FROM imagenes WHERE fichero = ?", (fichero,))
+            total -= tamano
+            eliminados += 1
+        conn.commit()
+        return eliminados
+
+    def close(self):
+        """Cierra la conexión al índice del hilo actual."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+def _indice_solo_lectura():
+    """Conexión de solo lectura al índice, compartida por los hilos de la app.
+
+    Se abre con `mode=ro`: si la caché todavía no existe, falla en lugar de
+    crearla.
+    """
+    global _indice
+    if _indice is None:
+        uri = Path(IMAGE_CACHE_DIR, "index.db").resolve().as_uri() + "?mode=ro"
+        _indice = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    return _indice
+
+def imagen_local(url):
+    """Devuelve la ruta local de una imagen si está en caché, o la URL remota si no.
+
+    Solo lee la caché: nunca la crea ni escribe en su índice.
+    """
+    if not url:
+        return url
+    try:
+        with _indice_lock:
+            row = _indice_solo_lectura().execute("SELECT fichero FROM imagenes WHERE url = ?", (url,)).fetchone()
+    except sqlite3.Error:
+        return url
+    if row is None:
+        return url
+    path = os.path.join(IMAGE_CACHE_DIR, row[0])
+    return path if os.path.exists(path) else url
@@ -0,0 +1,264 @@
+# scripts/jobs.py
+"""Actualizaciones de datos en segundo plano con registro de progreso.
+
+Cada ejecución de main.py es un trabajo en la tabla `trabajos` de
+`jobs.db` (junto a la base de datos, fuera del repositorio) con su
+estado, etapa y progreso: categorías L3 descargadas y productos
+escritos. La app lanza main.py en un subproceso con
+lanzar_actualizacion() y consulta el progreso mientras tanto, sin
+bloquear la sesión.
+
+Solo puede haber un trabajo activo: reservar() comprueba y registra el
+trabajo dentro de una transacción BEGIN IMMEDIATE, así que dos
+peticiones a la vez (dos usuarios, o la app y una ejecución programada)
+no pueden abrir dos escritores sobre la misma base de datos. Un trabajo
+cuyo proceso ya no existe, o que lleva SIN_LATIDO_MINUTOS sin dar
+señales, deja de contar como activo.
+
+    python -m scripts.jobs   # Últimos trabajos
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+from datetime import datetime, timedelta
+import scripts.db_utils as db_utils
+
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+TERMINADO = "terminado"
+ERROR = "error"
+ACTIVOS = (PENDIENTE, EN_CURSO)
+
+LAST_REFRESH_FILE = "last_refresh.txt"  # Fecha de la última actualización completa (la escribe main.py)
+
+SIN_LATIDO_MINUTOS = 30  # Minutos sin progreso tras los que un trabajo se da por muerto
+
+COLUMNAS_TRABAJO = ("id", "estado", "etapa", "origen", "pid", "creado", "actualizado", "terminado",
+                    "categorias", "productos", "mensaje")
+
+TABLA_TRABAJOS = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id INTEGER PRIMARY KEY,
+    estado TEXT NOT NULL,
+    etapa TEXT,
+    origen TEXT,
+    pid INTEGER,
+    creado TEXT,
+    actualizado TEXT,
+    terminado TEXT,
+    categorias INTEGER NOT NULL DEFAULT 0,
+    productos INTEGER NOT NULL DEFAULT 0,
+    mensaje TEXT
+)
+"""
+
+
+class TrabajoEnCurso(RuntimeError):
+    """Ya hay una actualización activa."""
+
+    def __init__(self, trabajo):
+        super().__init__(f"Ya hay una actualización en curso (trabajo {trabajo['id']})")
+        self.trabajo = trabajo
+
+
+def ruta_trabajos():
+    """Base de datos de trabajos: `jobs.db` junto a la base de datos de productos."""
+    return os.path.join(os.path.dirname(db_utils.DB_PATH) or ".", "jobs.db")
+
+
+def directorio_logs():
+    """Salida de cada trabajo lanzado desde la app: `jobs/trabajo-N.log`."""
+    return os.path.join(os.path.dirname(db_utils.DB_PATH) or ".", "jobs")
+
+
+def conectar():
+    """Conexión a la base de datos de trabajos (la crea si no existe)."""
+    os.makedirs(os.path.dirname(ruta_trabajos()) or ".", exist_ok=True)
+    conn = sqlite3.connect(ruta_trabajos(), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(TABLA_TRABAJOS)
+    return conn
+
+
+def _ahora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _como_dict(fila):
+    return dict(zip(COLUMNAS_TRABAJO, fila)) if fila else None
+
+
+def _proceso_vivo(pid):
+    if pid is None or os.name == "nt":  # En Windows solo cuenta el latido
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _vivo(trabajo):
+    """Si un trabajo activo sigue vivo: su proceso existe y ha dado señales hace poco."""
+    limite = datetime.now() - timedelta(minutes=SIN_LATIDO_MINUTOS)
+    return trabajo["actualizado"] >= limite.strftime("%Y-%m-%d %H:%M:%S") and _proceso_vivo(trabajo["pid"])
+
+
+def _activos(conn):
+    cursor = conn.execute(
+        f"SELECT {', '.join(COLUMNAS_TRABAJO)} FROM trabajos WHERE estado IN (?, ?) ORDER BY id", ACTIVOS
+    )
+    return [_como_dict(fila) for fila in cursor]
+
+
+def actualizar(conn, trabajo_id, **campos):
+    """Cambia campos de un trabajo y renueva su latido (`actualizado`)."""
+    campos.setdefault("actualizado", _ahora())
+    conn.execute(
+        f"UPDATE trabajos SET {', '.join(f'{campo} = ?' for campo in campos)} WHERE id = ?",
+        list(campos.values()) + [trabajo_id]
+    )
+
+
+def reservar(origen="cli", pid=None):
+    """Registra un trabajo pendiente y devuelve su id.
+
+    Los trabajos activos cuyo proceso ha muerto se marcan como error.
+    Lanza TrabajoEnCurso si queda alguno vivo.
+    """
+    conn = conectar()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for trabajo in _activos(conn):
+                if _vivo(trabajo):
+                    raise TrabajoEnCurso(trabajo)
+                actualizar(conn, trabajo["id"], estado=ERROR, terminado=_ahora(),
+                           mensaje="El proceso terminó sin cerrar el trabajo")
+            ahora = _ahora()
+            cursor = conn.execute(
+                "INSERT INTO trabajos (estado, origen, pid, creado, actualizado) VALUES (?, ?, ?, ?, ?)",
+                (PENDIENTE, origen, pid, ahora, ahora)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+def empezar(trabajo_id, etapa):
+    """Marca el trabajo en curso en el proceso actual."""
+    conn = conectar()
+    try:
+        actualizar(conn, trabajo_id, estado=EN_CURSO, etapa=etapa, pid=os.getpid())
+    finally:
+        conn.close()
+
+
+def etapa(trabajo_id, nombre):
+    """Pasa el trabajo a la etapa `nombre` (también sirve de latido)."""
+    conn = conectar()
+    try:
+        actualizar(conn, trabajo_id, etapa=nombre)
+    finally:
+        conn.close()
+
+
+def terminar(trabajo_id, error=None):
+    """Cierra el trabajo como terminado o, con `error`, como fallido.
+
+    Solo cambia un trabajo que siga activo (no pisa el cierre que haya
+    hecho el propio proceso).
+    """
+    conn = conectar()
+    try:
+        conn.execute(
+            "UPDATE trabajos SET estado = ?, terminado = ?, actualizado = ?, mensaje = ? WHERE id = ? AND estado IN (?, ?)",
+            (ERROR if error else TERMINADO, _ahora(), _ahora(), error, trabajo_id) + ACTIVOS
+        )
+    finally:
+        conn.close()
+
+
+def trabajo(trabajo_id):
+    """Un trabajo como diccionario (None si no existe)."""
+    conn = conectar()
+    try:
+        return _como_dict(conn.execute(
+            f"SELECT {', '.join(COLUMNAS_TRABAJO)} FROM trabajos WHERE id = ?", (trabajo_id,)
+        ).fetchone())
+    finally:
+        conn.close()
+
+
+def ultimos_trabajos(n=10):
+    """Los `n` trabajos más recientes, del último al primero."""
+    conn = conectar()
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(COLUMNAS_TRABAJO)} FROM trabajos ORDER BY id DESC LIMIT ?", (n,))
+        return [_como_dict(fila) for fila in cursor]
+    finally:
+        conn.close()
+
+
+def trabajo_activo():
+    """El trabajo activo y vivo, o None. No crea la base de datos de trabajos si no existe."""
+    if not os.path.exists(ruta_trabajos()):
+        return None
+    conn = conectar()
+    try:
+        return next((trabajo for trabajo in _activos(conn) if _vivo(trabajo)), None)
+    finally:
+        conn.close()
+
+
+def _esperar(proceso, trabajo_id, log):
+    """Recoge el subproceso y cierra el trabajo si el proceso no llegó a hacerlo."""
+    codigo = proceso.wait()
+    log.close()
+    if codigo != 0:
+        terminar(trabajo_id, error=f"main.py terminó con código {codigo} (ver {log.name})")
+    else:
+        terminar(trabajo_id)
+
+
+def lanzar_actualizacion(argumentos=(), origen="app"):
+    """Reserva un trabajo y ejecuta `main.py --job-id N` en segundo plano.
+
+    Devuelve el id del trabajo sin esperar a que termine; la salida del
+    proceso va a `jobs/trabajo-N.log`. Lanza TrabajoEnCurso si ya hay
+    una actualización activa.
+    """
+    trabajo_id = reservar(origen)
+    os.makedirs(directorio_logs(), exist_ok=True)
+    log = open(os.path.join(directorio_logs(), f"trabajo-{trabajo_id}.log"), "w", encoding="utf-8")
+    try:
+        proceso = subprocess.Popen(
+            [sys.executable, "main.py", "--job-id", str(trabajo_id), *argumentos],
+            stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, start_new_session=True,
+        )
+    except BaseException as e:
+        log.close()
+        terminar(trabajo_id, error=f"No se pudo lanzar main.py: {e}")
+        raise
+    conn = conectar()
+    try:
+        actualizar(conn, trabajo_id, pid=proceso.pid)
+    finally:
+        conn.close()
+    threading.Thread(target=_esperar, args=(proceso, trabajo_id, log), name=f"trabajo-{trabajo_id}",
+                     daemon=True).start()
+    return trabajo_id
+
+
+if __name__ == "__main__":
+    for t in ultimos_trabajos():
+        print(f"{t['id']:>5} {t['estado']:<10} {t['etapa'] or '':<10} {t['creado']} → {t['terminado'] or '…'}  "
+              f"{t['categorias']} categorías, {t['productos']} productos  {t['mensaje'] or ''}")
@@ -0,0 +1,313 @@
+# scripts/json_import.py
+"""Importación en streaming de volcados JSON de productos a la base de datos.
+
+Admite tres formatos, que se detectan por el contenido:
+
+- Array JSON con los diccionarios de parse_product (lo que escribe
+  JSONSink en `data/productos.json`).
+- JSONL: un diccionario por línea.
+- El `products.json` del antiguo scraper de Selenium (`description`,
+  `price`, `categoryL1`, `ProductURL`...); el id sale de la URL.
+
+El fichero se lee por bloques y cada elemento se decodifica en cuanto
+está completo, así que la memoria no depende del tamaño del volcado.
+Cada registro se valida y se convierte a los tipos de las columnas de
+`productos`; los que no son válidos se cuentan y se descartan. Los
+registros de Selenium solo actualizan las columnas que traen, así que
+no borran la L3, el IVA ni la imagen de un producto que ya existe. Los
+productos se escriben en transacciones de LOTE registros y todo el
+fichero cuenta como la ingesta de una fecha. Esa fecha no puede ser
+anterior a la última ingesta de sus almacenes: el histórico por
+intervalos solo avanza, y un volcado antiguo sobrescribiría el precio
+actual con el de entonces.
+
+    python -m scripts.json_import volcado.jsonl --fecha 2025-03-01
+"""
+import argparse
+import codecs
+import json
+import os
+import re
+import sys
+import time
+from datetime import date
+import scripts.db_utils as db_utils
+from scripts import rollups
+from scripts.db_utils import COLUMNAS_PRODUCTO, DEFAULT_WAREHOUSE
+
+LOTE = 5000                 # Registros por transacción
+BLOQUE_BYTES = 1 << 20      # Bytes leídos del fichero de cada vez
+PROGRESO_CADA = 100000      # Registros entre mensajes de progreso
+MAX_ERRORES_MOSTRADOS = 10
+MAX_ELEMENTO = 16 << 20     # Caracteres máximos de un elemento del array
+
+_ESPACIOS = re.compile(r"\s*")
+_SEPARADORES = ",] \t\r\n"
+_ID_URL = re.compile(r"/product/(\d+)")
+
+
+class FechaAnteriorError(ValueError):
+    """La fecha de la importación es anterior a la última ingesta de un almacén."""
+
+    def __init__(self, warehouse, fecha, ultima):
+        super().__init__(f"La fecha {fecha} es anterior a la última ingesta del almacén {warehouse!r} "
+                         f"({ultima}); solo se pueden importar volcados de esa fecha o posteriores")
+        self.warehouse = warehouse
+        self.fecha = fecha
+        self.ultima = ultima
+
+
+def _textos(f, bloque_bytes):
+    """Lee un fichero binario por bloques y los decodifica como UTF-8."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    for datos in iter(lambda: f.read(bloque_bytes), b""):
+        yield decoder.decode(datos)
+    yield decoder.decode(b"", final=True)
+
+
+def _elementos_array(textos, buffer):
+    """Decodifica uno a uno los elementos de un array JSON que llega por trozos."""
+    decoder = json.JSONDecoder()
+    pos = _ESPACIOS.match(buffer).end() + 1  # Tras el "["
+    esperando_valor = True
+    primero = True
+    fin_datos = False
+    while True:
+        pos = _ESPACIOS.match(buffer, pos).end()
+        if pos < len(buffer):
+            caracter = buffer[pos]
+            if caracter == "]" and (primero or not esperando_valor):
+                return
+            if not esperando_valor:
+                if caracter != ",":
+                    raise ValueError(f"Se esperaba ',' o ']' y se ha encontrado {caracter!r}")
+                pos += 1
+                esperando_valor = True
+                continue
+            try:
+                valor, fin = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if fin_datos or len(buffer) - pos > MAX_ELEMENTO:
+                    raise
+                valor = fin = None
+            # Un valor simple solo está completo si le sigue un separador (un
+            # número al final del trozo puede continuar en el siguiente)
+            if fin is not None and (isinstance(valor, (dict, list)) or fin_datos
+                                    or (fin < len(buffer) and buffer[fin] in _SEPARADORES)):
+                yield valor
+                pos = fin
+                esperando_valor = primero = False
+                continue
+        elif fin_datos:
+            raise ValueError("El array JSON no está cerrado")
+        # Hace falta más texto: se descarta lo ya procesado y se lee otro trozo
+        buffer = buffer[pos:]
+        pos = 0
+        trozo = next(textos, None)
+        if trozo is None:
+            fin_datos = True
+        else:
+            buffer += trozo
+
+
+def _lineas_jsonl(textos, buffer):
+    """Decodifica un objeto JSON por línea (se ignoran las líneas vacías)."""
+    while True:
+        trozo = next(textos, None)
+        if trozo is not None:
+            buffer += trozo
+        lineas = buffer.split("\n")
+        buffer = lineas.pop() if trozo is not None else ""
+        for linea in lineas:
+            if linea.strip():
+                yield json.loads(linea)
+        if trozo is None:
+            return
+
+
+def iterar_registros(f, bloque_bytes=BLOQUE_BYTES):
+    """Registros de un fichero binario con un array JSON o con JSONL."""
+    textos = _textos(f, bloque_bytes)
+    buffer = ""
+    for trozo in textos:
+        buffer += trozo
+        if buffer.strip():
+            break
+    if buffer.lstrip().startswith("["):
+        return _elementos_array(textos, buffer)
+    return _lineas_jsonl(textos, buffer)
+
+
+def tipos_columnas(conn):
+    """Tipo declarado (TEXT, REAL o INTEGER) de cada columna de la vista `productos`."""
+    return {row[1]: (row[2] or "TEXT").upper() for row in conn.execute("PRAGMA table_info(productos)")}
+
+
+def _numero(valor):
+    """Admite números con coma decimal y símbolo de euro ("22,95 €")."""
+    texto = valor.replace("€", "").strip()
+    if "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    return float(texto)
+
+
+def _convertir(valor, tipo):
+    if valor is None or valor == "":
+        return None
+    if tipo == "REAL":
+        if isinstance(valor, bool):
+            raise ValueError(f"no es un número: {valor!r}")
+        return _numero(valor) if isinstance(valor, str) else float(valor)
+    if tipo == "INTEGER":
+        if isinstance(valor, str):
+            if valor.lower() in ("true", "false"):
+                return int(valor.lower() == "true")
+            valor = _numero(valor)
+        if isinstance(valor, float):
+            if not valor.is_integer():
+                raise ValueError(f"no es un entero: {valor!r}")
+            return int(valor)
+        return int(valor)
+    if isinstance(valor, (dict, list)):
+        raise ValueError(f"no es un valor simple: {valor!r}")
+    return str(valor)
+
+
+def _desde_legado(registro):
+    """Convierte un registro del antiguo scraper de Selenium al formato de parse_product."""
+    url = registro.get("ProductURL") or ""
+    encontrado = _ID_URL.search(url)
+    atributos = registro.get("technical_attributes") or ""
+    return {
+        "id": encontrado.group(1) if encontrado else None,
+        "nombre": registro.get("description"),
+        "categoria_L1": registro.get("categoryL1"),
+        "categoria_L2": registro.get("categoryL2"),
+        "precio_con_descuento": registro.get("price"),
+        "packaging": atributos.split("|")[0].strip() or None,
+        "url": url or None,
+    }
+
+
+def normalizar(registro, tipos):
+    """Diccionario con las columnas de COLUMNAS_PRODUCTO y sus tipos.
+
+    Lanza ValueError si el registro no es válido.
+    """
+    if not isinstance(registro, dict):
+        raise ValueError(f"no es un objeto: {type(registro).__name__}")
+    if "ProductURL" in registro:
+        registro = _desde_legado(registro)
+    producto = {}
+    for columna in COLUMNAS_PRODUCTO:
+        try:
+            producto[columna] = _convertir(registro.get(columna), tipos.get(columna, "TEXT"))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{columna}: {e}") from None
+    if not producto["id"]:
+        raise ValueError("falta el id")
+    if producto["precio_con_descuento"] is None:
+        raise ValueError("falta el precio")
+    producto["warehouse"] = producto["warehouse"] or DEFAULT_WAREHOUSE
+    return producto
+
+
+def comprobar_fecha(conn, warehouses, fecha):
+    """Lanza FechaAnteriorError si `fecha` es anterior a la última ingesta de algún almacén."""
+    for warehouse in sorted(warehouses):
+        ultima = conn.execute("SELECT MAX(fecha) FROM fechas_ingesta WHERE warehouse = ?", (warehouse,)).fetchone()[0]
+        if ultima is not None and fecha < ultima:
+            raise FechaAnteriorError(warehouse, fecha, ultima)
+
+
+def importar_json(path, fecha=None, tamano_lote=LOTE):
+    """Importa un volcado JSON/JSONL como la ingesta de `fecha` (hoy por defecto).
+
+    Cada lote se confirma por separado, salvo el último, que se confirma
+    junto con los resúmenes diarios. La importación no es atómica: si el
+    fichero está mal formado se detiene con el error, los lotes ya
+    confirmados se quedan y, antes de relanzar el error, se actualizan sus
+    resúmenes, de modo que `resumen_diario` refleja lo importado. Antes
+    de escribir el primer producto de cada almacén se comprueba que
+    `fecha` no es anterior a su última ingesta (FechaAnteriorError).
+    Devuelve las estadísticas de la importación.
+    """
+    fecha = str(date.fromisoformat(str(fecha)) if fecha else date.today())
+    total_bytes = os.path.getsize(path)
+    stats = {"leidos": 0, "importados": 0, "rechazados": 0, "filas_modificadas": 0}
+    warehouses = set()
+    inicio = time.perf_counter()
+
+    def escribir(lote, legado, confirmar=True):
+        comprobar_fecha(conn, {producto["warehouse"] for producto in lote} - warehouses, fecha)
+        stats["filas_modificadas"] += db_utils.guardar_lote(conn, lote, fecha, legado)
+        if confirmar:
+            conn.commit()
+        stats["importados"] += len(lote)
+        warehouses.update(producto["warehouse"] for producto in lote)
+
+    def resumir():
+        stats["grupos_resumen"] = rollups.actualizar_resumenes(conn, warehouses, fecha)
+        conn.commit()
+
+    conn = db_utils.get_db_connection()
+    db_utils.configurar_escritura(conn)
+    try:
+        rollups.preparar_resumenes(conn)
+        tipos = tipos_columnas(conn)
+        with open(path, "rb") as f:
+            # Un lote por tipo de registro: los de Selenium usan otro upsert
+            lotes = {False: [], True: []}
+            for registro in iterar_registros(f):
+                stats["leidos"] += 1
+                legado = isinstance(registro, dict) and "ProductURL" in registro
+                try:
+                    lotes[legado].append(normalizar(registro, tipos))
+                except ValueError as e:
+                    stats["rechazados"] += 1
+                    if stats["rechazados"] <= MAX_ERRORES_MOSTRADOS:
+                        print(f"Registro {stats['leidos']} descartado: {e}")
+                if len(lotes[legado]) >= tamano_lote:
+                    escribir(lotes[legado], legado)
+                    lotes[legado] = []
+                if stats["leidos"] % PROGRESO_CADA == 0:
+                    segundos = time.perf_counter() - inicio
+                    print(f"{stats['leidos']} registros ({f.tell() / total_bytes:.0%} del fichero, "
+                          f"{stats['leidos'] / segundos:.0f} registros/s)")
+            for legado, lote in lotes.items():
+                if lote:
+                    escribir(lote, legado, confirmar=False)
+        resumir()
+    except BaseException:
+        conn.rollback()
+        if warehouses:
+            # Resúmenes de los lotes que ya estaban confirmados
+            resumir()
+        raise
+    finally:
+        db_utils.cerrar_escritura(conn)
+        conn.close()
+
+    segundos = time.perf_counter() - inicio
+    stats["segundos"] = round(segundos, 2)
+    stats["registros_por_segundo"] = round(stats["leidos"] / segundos) if segundos else 0
+    print("Importación: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+    return stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Importa un volcado JSON o JSONL de productos a la base de datos.")
+    parser.add_argument("path", help="Fichero JSON (array) o JSONL")
+    parser.add_argument("--fecha", default=None, help="Fecha de la ingesta (AAAA-MM-DD, por defecto hoy)")
+    parser.add_argument("--lote", type=int, default=LOTE, help=f"Registros por transacción (por defecto {LOTE})")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    db_utils.create_database()
+    try:
+        importar_json(args.path, args.fecha, args.lote)
+    except FechaAnteriorError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,150 @@
+# scripts/parquet_store.py
+"""Instantáneas diarias del catálogo en un dataset Parquet particionado por fecha.
+
+Cada ingesta escribe `data/parquet/fecha=AAAA-MM-DD/productos.parquet`,
+con las columnas de categoría (y otras de pocos valores distintos)
+codificadas como diccionario y compresión zstd. La lectura se hace con
+`pyarrow.dataset` sobre ficheros mapeados en memoria: solo se leen las
+columnas pedidas y los filtros por fecha, categoría o producto se
+aplican sobre las particiones y las estadísticas de cada row group.
+
+    from scripts.parquet_store import leer_productos
+    df = leer_productos(["id", "nombre", "precio_con_descuento"], desde="2025-03-01",
+                        categoria_L1="Aceite, especias y salsas")
+"""
+import os
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from scripts.records import PRODUCT_FIELDS
+
+PARQUET_DIR = "data/parquet"
+PARQUET_FILE = "productos.parquet"
+ROW_GROUP_SIZE = 2000  # Filas por row group: permite descartar grupos por estadísticas
+
+_TEXTO_REPETIDO = pa.dictionary(pa.int32(), pa.string())
+
+# Tipos de cada columna, en el orden de parse_product
+SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("nombre", pa.string()),
+    ("categoria_L1", _TEXTO_REPETIDO),
+    ("categoria_L2", _TEXTO_REPETIDO),
+    ("categoria_L3", _TEXTO_REPETIDO),
+    ("precio_con_descuento", pa.float64()),
+    ("precio_sin_descuento", pa.float64()),
+    ("packaging", _TEXTO_REPETIDO),
+    ("bulk_price", pa.float64()),
+    ("unit_size", pa.float64()),
+    ("size_format", _TEXTO_REPETIDO),
+    ("iva", pa.int64()),
+    ("selling_method", pa.int64()),
+    ("is_pack", pa.bool_()),
+    ("is_new", pa.bool_()),
+    ("price_decreased", pa.bool_()),
+    ("unavailable_from", pa.string()),
+    ("url", pa.string()),
+    ("imagen", pa.string()),
+    ("warehouse", _TEXTO_REPETIDO),
+])
+assert tuple(SCHEMA.names) == PRODUCT_FIELDS
+
+# La fecha no se guarda en los ficheros: sale del nombre del directorio
+PARTITIONING = ds.partitioning(pa.schema([("fecha", pa.string())]), flavor="hive")
+
+
+def _valor(value, tipo):
+    """Normaliza valores de la API que no encajan en el tipo de la columna."""
+    if value is None:
+        return None
+    if pa.types.is_floating(tipo) and isinstance(value, str):
+        return float(value) if value.strip() else None
+    if pa.types.is_integer(tipo) and not isinstance(value, int):
+        return int(value)
+    return value
+
+
+def tabla_productos(productos):
+    """Construye una tabla Arrow (con SCHEMA) a partir de ProductRecord o diccionarios."""
+    columnas = []
+    for campo in SCHEMA:
+        valores = [producto[campo.name] for producto in productos]
+        try:
+            columnas.append(pa.array(valores, type=campo.type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            columnas.append(pa.array([_valor(v, campo.type) for v in valores], type=campo.type))
+    return pa.Table.from_arrays(columnas, schema=SCHEMA)
+
+
+def ruta_particion(fecha, directory=PARQUET_DIR):
+    """Fichero Parquet de la instantánea de una fecha (texto AAAA-MM-DD)."""
+    return os.path.join(directory, f"fecha={fecha}", PARQUET_FILE)
+
+
+def abrir_escritor(path):
+    """ParquetWriter con el esquema y la compresión del dataset."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return pq.ParquetWriter(path, SCHEMA, compression="zstd", use_dictionary=True)
+
+
+def fechas_disponibles(directory=PARQUET_DIR):
+    """Fechas con instantánea, en orden."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        nombre.split("=", 1)[1] for nombre in os.listdir(directory)
+        if nombre.startswith("fecha=") and os.path.exists(os.path.join(directory, nombre, PARQUET_FILE))
+    )
+
+
+def dataset(directory=PARQUET_DIR):
+    """Dataset de todas las instantáneas, leído con ficheros mapeados en memoria."""
+    return ds.dataset(
+        directory, format="parquet", partitioning=PARTITIONING,
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def _filtro(fecha=None, desde=None, hasta=None, categoria_L1=None, categoria_L2=None, categoria_L3=None,
+            ids=None, warehouse=None):
+    condiciones = []
+    if fecha is not None:
+        condiciones.append(ds.field("fecha") == str(fecha))
+    if desde is not None:
+        condiciones.append(ds.field("fecha") >= str(desde))
+    if hasta is not None:
+        condiciones.append(ds.field("fecha") <= str(hasta))
+    for nombre, valor in (("categoria_L1", categoria_L1), ("categoria_L2", categoria_L2),
+                          ("categoria_L3", categoria_L3), ("warehouse", warehouse)):
+        if valor is not None:
+            condiciones.append(ds.field(nombre) == valor)
+    if ids is not None:
+        condiciones.append(ds.field("id").isin([str(i) for i in ids]))
+    filtro = None
+    for condicion in condiciones:
+        filtro = condicion if filtro is None else filtro & condicion
+    return filtro
+
+
+def leer_tabla(columnas=None, directory=PARQUET_DIR, **filtros):
+    """Lee las instantáneas como tabla Arrow.
+
+    `columnas` limita las columnas leídas (puede incluir "fecha"). Los
+    filtros admitidos son `fecha`, `desde`, `hasta` (texto AAAA-MM-DD o
+    date), `categoria_L1`, `categoria_L2`, `categoria_L3`, `warehouse` e
+    `ids` (lista de ids de producto).
+    """
+    if not fechas_disponibles(directory):
+        nombres = list(columnas) if columnas else SCHEMA.names + ["fecha"]
+        return pa.table({nombre: pa.array([], type=_tipo(nombre)) for nombre in nombres})
+    return dataset(directory).to_table(columns=list(columnas) if columnas else None, filter=_filtro(**filtros))
+
+
+def _tipo(nombre):
+    return pa.string() if nombre == "fecha" else SCHEMA.field(nombre).type
+
+
+def leer_productos(columnas=None, directory=PARQUET_DIR, **filtros):
+    """Como leer_tabla, pero devuelve un DataFrame (las columnas diccionario pasan a `category`)."""
+    return leer_tabla(columnas, directory, **filtros).to_pandas()
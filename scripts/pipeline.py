@@ -0,0 +1,463 @@
+# scripts/pipeline.py
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import pandas as pd
+from scripts.db_utils import (
+    get_db_connection, configurar_escritura, cerrar_escritura, guardar_lote, cargar_huellas,
+    guardar_huellas, cargar_intervalos_abiertos, cargar_huellas_detalle, guardar_detalles, preparar_vistos,
+    marcar_vistos, cerrar_desaparecidos, registrar_ingesta, DEFAULT_WAREHOUSE
+)
+from scripts import jobs
+from scripts.image_cache import ImageCache
+from scripts.parquet_store import PARQUET_DIR, ROW_GROUP_SIZE, abrir_escritor, ruta_particion, tabla_productos
+from scripts.records import records_to_dataframe
+from scripts.rollups import preparar_resumenes, actualizar_resumenes
+
+# Lotes que pueden esperar en cola entre la descarga y la escritura
+DEFAULT_QUEUE_SIZE = 16
+
+# Segundos mínimos entre escrituras de progreso de ProgressSink
+INTERVALO_PROGRESO = 1.0
+
+# Campos del listado que no afectan al detalle de un producto
+CAMPOS_PRECIO = ("precio_con_descuento", "precio_sin_descuento", "bulk_price", "price_decreased")
+
+_FIN = object()  # Marca de fin de la cola
+
+
+class Sink:
+    """Destino de los lotes de productos del pipeline.
+
+    `open()` y `close()` se llaman desde el hilo escritor, así que los
+    recursos que no se pueden compartir entre hilos (p. ej. conexiones
+    SQLite) se crean ahí y no en el constructor.
+    """
+
+    def open(self):
+        pass
+
+    def write(self, batch):
+        raise NotImplementedError
+
+    def close(self, ok=True):
+        pass
+
+
+def as_dict(producto):
+    """Diccionario de un producto, sea un ProductRecord o ya un diccionario."""
+    return producto.as_dict() if hasattr(producto, "as_dict") else producto
+
+
+def as_dataframe(productos):
+    """DataFrame de una lista de productos (ProductRecord o diccionarios)."""
+    if productos and hasattr(productos[0], "as_db_params"):
+        return records_to_dataframe(productos)
+    return pd.DataFrame(productos)
+
+
+def product_fingerprint(producto):
+    """Huella del contenido normalizado de un producto (salida de parse_product)."""
+    texto = json.dumps(as_dict(producto), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+def detail_fingerprint(producto):
+    """Huella de un producto sin sus campos de precio.
+
+    El detalle (descripción, ingredientes...) no depende del precio, así que
+    un cambio de precio no obliga a volver a descargarlo.
+    """
+    return product_fingerprint({k: v for k, v in as_dict(producto).items() if k not in CAMPOS_PRECIO})
+
+
+class DatabaseSink(Sink):
+    """Escribe cada lote en `productos` y en el histórico de precios por intervalos.
+
+    Toda la ejecución es una sola transacción en modo WAL: cada lote se
+    escribe con executemany en cuanto llega y se confirma al cerrar, así
+    que una ingesta fallida no deja la base de datos a medias.
+
+    En modo incremental se guarda una huella por categoría L3 y por
+    producto: las categorías sin cambios no se tocan, y dentro de una
+    categoría modificada solo se reescriben los productos cuya huella ha
+    cambiado; los demás conservan su intervalo de precio abierto y siguen
+    teniendo fila diaria en `precios_historicos`. Un producto sin
+    intervalo abierto (p. ej. uno que desapareció y vuelve) cuenta
+    siempre como cambiado, para que el histórico no tenga huecos.
+    """
+
+    def __init__(self, incremental=False):
+        self.incremental = incremental
+
+    def open(self):
+        self.conn = get_db_connection()
+        configurar_escritura(self.conn)
+        preparar_vistos(self.conn)
+        preparar_resumenes(self.conn)
+        self.fecha = datetime.now().strftime("%Y-%m-%d")
+        self.warehouses = set()
+        self.stats = {"categorias_sin_cambios": 0, "productos_escritos": 0, "productos_sin_cambios": 0,
+                      "filas_modificadas": 0, "productos_desaparecidos": 0, "grupos_resumen": 0,
+                      "segundos_escritura": 0.0}
+        if self.incremental:
+            self.huellas_categorias, self.huellas_productos = cargar_huellas(self.conn)
+            self.abiertos = cargar_intervalos_abiertos(self.conn)
+
+    def write(self, batch):
+        inicio = time.perf_counter()
+        if batch:
+            marcar_vistos(self.conn, batch)
+            self.warehouses.add(batch[0].get("warehouse", DEFAULT_WAREHOUSE))
+        if self.incremental:
+            batch = self._filtrar_cambios(batch)
+        if batch:
+            self.stats["filas_modificadas"] += guardar_lote(self.conn, batch, self.fecha)
+            self.stats["productos_escritos"] += len(batch)
+        self.stats["segundos_escritura"] += time.perf_counter() - inicio
+
+    def _filtrar_cambios(self, batch):
+        """Devuelve los productos del lote que han cambiado y actualiza sus huellas."""
+        primero = batch[0]
+        warehouse = primero.get("warehouse", DEFAULT_WAREHOUSE)
+        categoria = (warehouse, primero["categoria_L1"], primero["categoria_L2"], primero["categoria_L3"])
+        huellas = [product_fingerprint(producto) for producto in batch]
+        huella_categoria = hashlib.sha1("".join(huellas).encode("ascii")).hexdigest()
+        claves = [(producto["id"], warehouse) for producto in batch]
+
+        if self.huellas_categorias.get(categoria) == huella_categoria and all(c in self.abiertos for c in claves):
+            self.stats["categorias_sin_cambios"] += 1
+            self.stats["productos_sin_cambios"] += len(batch)
+            return []
+
+        cambiados = []
+        huellas_cambiadas = []
+        for producto, huella, clave in zip(batch, huellas, claves):
+            if self.huellas_productos.get(clave) != huella or clave not in self.abiertos:
+                cambiados.append(producto)
+                huellas_cambiadas.append((*clave, huella))
+                self.huellas_productos[clave] = huella
+                self.abiertos.add(clave)
+        self.stats["productos_sin_cambios"] += len(batch) - len(cambiados)
+
+        self.huellas_categorias[categoria] = huella_categoria
+        guardar_huellas(self.conn, categoria, huella_categoria, huellas_cambiadas)
+        return cambiados
+
+    def close(self, ok=True):
+        if ok:
+            inicio = time.perf_counter()
+            registrar_ingesta(self.conn, self.warehouses, self.fecha)
+            self.stats["productos_desaparecidos"] = cerrar_desaparecidos(self.conn, self.warehouses, self.fecha)
+            self.stats["grupos_resumen"] = actualizar_resumenes(self.conn, self.warehouses, self.fecha)
+            self.conn.commit()
+            cerrar_escritura(self.conn)
+            self.stats["segundos_escritura"] += time.perf_counter() - inicio
+        else:
+            self.conn.rollback()
+        self.conn.close()
+        segundos = self.stats["segundos_escritura"]
+        self.stats["filas_por_segundo"] = round(self.stats["productos_escritos"] / segundos) if segundos else 0
+        self.stats["segundos_escritura"] = round(segundos, 3)
+        print("Escritura SQLite: " + ", ".join(f"{k}={v}" for k, v in self.stats.items()))
+
+
+class EnrichmentSink(Sink):
+    """Descarga el detalle de los productos nuevos o modificados a `productos_detalle`.
+
+    `fetch_detail(producto_id, warehouse)` devuelve un diccionario con las
+    columnas del detalle, o None si el producto ya no existe. Solo se pide
+    el detalle de los productos cuya huella de listado sin precios
+    (detail_fingerprint) difiere de la guardada con su detalle, en un pool de `concurrency` hilos que trabaja
+    en paralelo con el resto del pipeline. Los detalles se guardan al
+    cerrar, cuando DatabaseSink ya ha confirmado su transacción; si esta
+    ha fallado, el sink se cierra con ok=False y no guarda nada.
+    """
+
+    def __init__(self, fetch_detail, concurrency=4):
+        self.fetch_detail = fetch_detail
+        self.concurrency = max(1, concurrency)
+
+    def open(self):
+        conn = get_db_connection()
+        self.huellas = cargar_huellas_detalle(conn)
+        conn.close()
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.pendientes = []
+        self.stats = {"detalles_descargados": 0, "detalles_sin_cambios": 0, "errores": 0}
+
+    def write(self, batch):
+        for producto in batch:
+            clave = (producto["id"], producto.get("warehouse", DEFAULT_WAREHOUSE))
+            huella = detail_fingerprint(producto)
+            if self.huellas.get(clave) == huella:
+                self.stats["detalles_sin_cambios"] += 1
+                continue
+            self.huellas[clave] = huella
+            self.pendientes.append((huella, self.executor.submit(self.fetch_detail, *clave)))
+
+    def _guardar_detalles(self):
+        """Espera a las descargas pendientes y guarda los detalles en una transacción."""
+        fecha = datetime.now().strftime("%Y-%m-%d")
+        detalles = []
+        for huella, future in self.pendientes:
+            try:
+                detalle = future.result()
+            except Exception as e:
+                # El detalle es opcional: se reintentará en la próxima ejecución
+                print(f"Aviso: no se pudo descargar un detalle de producto: {e}")
+                self.stats["errores"] += 1
+                continue
+            if detalle is not None:
+                detalles.append(dict(detalle, huella=huella, fecha_detalle=fecha))
+        if detalles:
+            conn = get_db_connection()
+            guardar_detalles(conn, detalles)
+            conn.commit()
+            conn.close()
+            self.stats["detalles_descargados"] += len(detalles)
+
+    def close(self, ok=True):
+        if ok:
+            self._guardar_detalles()
+        else:
+            for _, future in self.pendientes:
+                future.cancel()
+        self.executor.shutdown(wait=True)
+        print("Enriquecimiento: " + ", ".join(f"{k}={v}" for k, v in self.stats.items()))
+
+
+class ImageSink(Sink):
+    """Descarga a la caché local las miniaturas que todavía no están en ella.
+
+    Las miniaturas ya guardadas que siguen en el catálogo se marcan como
+    usadas al cerrar, así que la expulsión LRU elimina primero las de
+    productos que han dejado de aparecer.
+    """
+
+    def __init__(self, concurrency=4, cache=None):
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+
+    def open(self):
+        self.cache = self.cache or ImageCache()
+        self.conocidas = self.cache.known_urls()
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.pendientes = []
+        self.vistas = set()
+        self.stats = {"imagenes_descargadas": 0, "errores": 0}
+
+    def write(self, batch):
+        for producto in batch:
+            url = producto.get("imagen")
+            if url in self.conocidas:
+                self.vistas.add(url)
+            elif url:
+                self.conocidas.add(url)
+                self.pendientes.append(self.executor.submit(self.cache.download, url))
+        self._registrar_terminadas()
+
+    def _registrar_terminadas(self, esperar=False):
+        listas = [f for f in self.pendientes if esperar or f.done()]
+        self.pendientes = [f for f in self.pendientes if not (esperar or f.done())]
+        descargas = []
+        for future in listas:
+            try:
+                descargas.append(future.result())
+            except Exception as e:
+                print(f"Aviso: no se pudo descargar una imagen: {e}")
+                self.stats["errores"] += 1
+        if descargas:
+            self.cache.register(descargas)
+            self.stats["imagenes_descargadas"] += len(descargas)
+
+    def close(self, ok=True):
+        if ok:
+            self._registrar_terminadas(esperar=True)
+            self.cache.touch(self.vistas)
+        else:
+            for future in self.pendientes:
+                future.cancel()
+        self.executor.shutdown(wait=True)
+        self.stats["expulsadas"] = self.cache.evict()
+        self.cache.close()
+        print("Imágenes: " + ", ".join(f"{k}={v}" for k, v in self.stats.items()))
+
+
+class ProgressSink(Sink):
+    """Anota en un trabajo de scripts/jobs.py las categorías L3 descargadas y los productos escritos.
+
+    Va detrás de DatabaseSink en la lista de sinks, así que cuenta los
+    productos ya guardados. Escribe como mucho cada INTERVALO_PROGRESO
+    segundos.
+    """
+
+    def __init__(self, trabajo_id):
+        self.trabajo_id = trabajo_id
+
+    def open(self):
+        self.conn = jobs.conectar()
+        self.categorias = self.productos = 0
+        self.ultima_escritura = 0.0
+
+    def write(self, batch):
+        self.categorias += 1
+        self.productos += len(batch)
+        if time.monotonic() - self.ultima_escritura >= INTERVALO_PROGRESO:
+            self._guardar()
+
+    def _guardar(self):
+        jobs.actualizar(self.conn, self.trabajo_id, categorias=self.categorias, productos=self.productos)
+        self.ultima_escritura = time.monotonic()
+
+    def close(self, ok=True):
+        self._guardar()
+        self.conn.close()
+
+
+class JSONSink(Sink):
+    """Escribe los productos como un array JSON, lote a lote."""
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def open(self):
+        self.file = open(self.filename, "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, batch):
+        for producto in batch:
+            # Mismo formato que json.dump(lista, indent=4)
+            texto = json.dumps(as_dict(producto), ensure_ascii=False, indent=4).replace("\n", "\n    ")
+            self.file.write(("[\n    " if self.count == 0 else ",\n    ") + texto)
+            self.count += 1
+
+    def close(self, ok=True):
+        self.file.write("[]" if self.count == 0 else "\n]")
+        self.file.close()
+
+
+class ParquetSink(Sink):
+    """Escribe la instantánea del día en el dataset Parquet particionado por fecha.
+
+    Los lotes se agrupan en row groups de ROW_GROUP_SIZE filas. Se escribe
+    en un fichero temporal que sustituye al de la fecha (si ya existía)
+    solo cuando la ingesta termina bien.
+    """
+
+    def __init__(self, directory=PARQUET_DIR, fecha=None):
+        self.directory = directory
+        self.fecha = fecha
+
+    def open(self):
+        self.path = ruta_particion(self.fecha or datetime.now().strftime("%Y-%m-%d"), self.directory)
+        # Los ficheros que empiezan por "_" no forman parte del dataset al leerlo
+        self.tmp_path = os.path.join(os.path.dirname(self.path), "_" + os.path.basename(self.path) + ".tmp")
+        self.writer = abrir_escritor(self.tmp_path)
+        self.pendientes = []
+
+    def write(self, batch):
+        self.pendientes.extend(batch)
+        if len(self.pendientes) >= ROW_GROUP_SIZE:
+            self._volcar()
+
+    def _volcar(self):
+        if self.pendientes:
+            self.writer.write_table(tabla_productos(self.pendientes), row_group_size=ROW_GROUP_SIZE)
+            self.pendientes = []
+
+    def close(self, ok=True):
+        if ok:
+            self._volcar()
+        self.writer.close()
+        if ok:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
+            if not os.listdir(os.path.dirname(self.path)):
+                os.rmdir(os.path.dirname(self.path))
+
+
+class CSVSink(Sink):
+    """Escribe los productos en un CSV, lote a lote."""
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def open(self):
+        self.file = open(self.filename, "w", encoding="utf-8", newline="")
+        self.header = True
+
+    def write(self, batch):
+        as_dataframe(batch).to_csv(self.file, index=False, header=self.header)
+        self.header = False
+
+    def close(self, ok=True):
+        self.file.close()
+
+
+def run_pipeline(batches, sinks, queue_size=DEFAULT_QUEUE_SIZE):
+    """Consume un generador de lotes y los envía a los sinks en un hilo escritor.
+
+    La descarga (en el hilo que llama) y la escritura se solapan. La cola
+    está acotada, así que si la escritura va más lenta la descarga espera
+    y la memoria se mantiene constante. Devuelve el número de productos.
+    """
+    cola = queue.Queue(maxsize=queue_size)
+    errores = []
+    fallo_descarga = []  # Si la descarga falla, los sinks se cierran con ok=False
+
+    def escritor():
+        abiertos = []
+        try:
+            for sink in sinks:
+                sink.open()
+                abiertos.append(sink)
+            while True:
+                batch = cola.get()
+                if batch is _FIN:
+                    break
+                for sink in sinks:
+                    sink.write(batch)
+        except BaseException as e:
+            errores.append(e)
+            # Vaciar la cola para que el productor no se bloquee
+            while cola.get() is not _FIN:
+                pass
+        finally:
+            # Un sink que falla al cerrar no impide cerrar los demás (p. ej.
+            # confirmar la transacción de DatabaseSink); el primer error se
+            # relanza al terminar. Los sinks posteriores a uno que ha fallado
+            # se cierran con ok=False (p. ej. EnrichmentSink no guarda
+            # detalles si la transacción de DatabaseSink no se ha confirmado)
+            for sink in abiertos:
+                try:
+                    sink.close(ok=not errores and not fallo_descarga)
+                except BaseException as e:
+                    errores.append(e)
+
+    hilo = threading.Thread(target=escritor, name="pipeline-writer")
+    hilo.start()
+
+    total = 0
+    try:
+        for batch in batches:
+            if errores:
+                break
+            cola.put(batch)
+            total += len(batch)
+    except BaseException:
+        fallo_descarga.append(True)
+        raise
+    finally:
+        cola.put(_FIN)
+        hilo.join()
+
+    if errores:
+        raise errores[0]
+    return total
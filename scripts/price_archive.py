@@ -0,0 +1,233 @@
+# scripts/price_archive.py
+"""Archivo frío del histórico de precios en bloques mensuales comprimidos.
+
+La compactación saca de `precios_intervalos` los intervalos cerrados
+hace más de HORIZONTE_DIAS y los guarda en un fichero por mes (el mes de
+`valid_to`) en `price_archive/`, junto a la base de datos. Cada mes se
+archiva entero y una sola vez, así que los bloques no cambian después de
+escritos y la base de datos que se sube al repositorio no crece con el
+tiempo.
+
+Formato de un bloque (JSON comprimido con zlib):
+
+- `warehouses` y `productos`: diccionarios de valores; las filas guardan
+  su posición.
+- Filas ordenadas por almacén, producto y `valid_from`, por columnas:
+  `warehouse` (posición), `producto` (diferencia con la posición de la
+  fila anterior), `desde` (días desde 1970, diferencia con la fila
+  anterior), `dias` (duración del intervalo) y `precio` (céntimos,
+  diferencia con el precio anterior del mismo producto).
+- `exactos`: precios que no son un número exacto de céntimos, por fila
+  (su `precio` es None, igual que el de los precios nulos).
+
+    python -m scripts.price_archive --horizonte 365
+"""
+import argparse
+import json
+import os
+import zlib
+from datetime import date, timedelta
+import scripts.db_utils as db_utils
+
+HORIZONTE_DIAS = 365
+FORMATO = 1
+_EPOCH = date(1970, 1, 1)
+
+
+def directorio_archivo():
+    """Directorio de los bloques: `price_archive/` junto a la base de datos."""
+    return os.path.join(os.path.dirname(db_utils.DB_PATH) or ".", "price_archive")
+
+
+def ruta_bloque(mes, directory=None):
+    """Fichero del bloque de un mes (texto AAAA-MM)."""
+    return os.path.join(directory or directorio_archivo(), f"historico-{mes}.json.zlib")
+
+
+def meses_archivados(directory=None):
+    """Meses con bloque, en orden."""
+    directory = directory or directorio_archivo()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        nombre[len("historico-"):-len(".json.zlib")] for nombre in os.listdir(directory)
+        if nombre.startswith("historico-") and nombre.endswith(".json.zlib")
+    )
+
+
+def _dias(fecha):
+    return (date.fromisoformat(fecha) - _EPOCH).days
+
+
+def _fecha(dias):
+    return str(_EPOCH + timedelta(days=dias))
+
+
+def _primer_dia_mes_siguiente(mes):
+    anio, numero = int(mes[:4]), int(mes[5:7])
+    return date(anio + numero // 12, numero % 12 + 1, 1)
+
+
+def codificar_bloque(mes, filas):
+    """Comprime las filas (producto_id, warehouse, precio, valid_from, valid_to) de un mes."""
+    filas = sorted(filas, key=lambda fila: (fila[1], fila[0], fila[3]))
+    warehouses = sorted({fila[1] for fila in filas})
+    productos = sorted({fila[0] for fila in filas})
+    indice_warehouse = {valor: i for i, valor in enumerate(warehouses)}
+    indice_producto = {valor: i for i, valor in enumerate(productos)}
+
+    columnas = {"warehouse": [], "producto": [], "desde": [], "dias": [], "precio": []}
+    exactos = {}
+    producto_anterior = desde_anterior = 0
+    clave_anterior = centimos_anterior = None
+    for n, (producto_id, warehouse, precio, valid_from, valid_to) in enumerate(filas):
+        producto = indice_producto[producto_id]
+        desde = _dias(valid_from)
+        columnas["warehouse"].append(indice_warehouse[warehouse])
+        columnas["producto"].append(producto - producto_anterior)
+        columnas["desde"].append(desde - desde_anterior)
+        columnas["dias"].append(_dias(valid_to) - desde)
+        if (producto_id, warehouse) != clave_anterior:
+            clave_anterior, centimos_anterior = (producto_id, warehouse), 0
+        centimos = round(precio * 100) if precio is not None else None
+        if centimos is None or centimos / 100 != precio:
+            columnas["precio"].append(None)
+            if precio is not None:
+                exactos[n] = precio
+        else:
+            columnas["precio"].append(centimos - centimos_anterior)
+            centimos_anterior = centimos
+        producto_anterior, desde_anterior = producto, desde
+
+    bloque = {"formato": FORMATO, "mes": mes, "warehouses": warehouses, "productos": productos,
+              "filas": columnas, "exactos": exactos}
+    return zlib.compress(json.dumps(bloque, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def decodificar_bloque(datos):
+    """Filas (producto_id, warehouse, precio, valid_from, valid_to) de un bloque comprimido."""
+    bloque = json.loads(zlib.decompress(datos).decode("utf-8"))
+    if bloque["formato"] != FORMATO:
+        raise ValueError(f"Formato de bloque desconocido: {bloque['formato']}")
+    warehouses, productos, columnas = bloque["warehouses"], bloque["productos"], bloque["filas"]
+    exactos = {int(n): precio for n, precio in bloque["exactos"].items()}
+
+    filas = []
+    producto = desde = 0
+    clave_anterior = centimos = None
+    for n, (w, dp, dd, dias, dprecio) in enumerate(zip(
+            columnas["warehouse"], columnas["producto"], columnas["desde"], columnas["dias"], columnas["precio"])):
+        producto += dp
+        desde += dd
+        clave = (producto, w)
+        if clave != clave_anterior:
+            clave_anterior, centimos = clave, 0
+        if dprecio is None:
+            precio = exactos.get(n)
+        else:
+            centimos += dprecio
+            precio = centimos / 100
+        filas.append((productos[producto], warehouses[w], precio, _fecha(desde), _fecha(desde + dias)))
+    return filas
+
+
+def leer_bloque(mes, directory=None):
+    with open(ruta_bloque(mes, directory), "rb") as f:
+        return decodificar_bloque(f.read())
+
+
+def _escribir_bloque(mes, filas, directory):
+    """Escribe (o amplía, si ya existe) el bloque de un mes de forma atómica."""
+    path = ruta_bloque(mes, directory)
+    if os.path.exists(path):
+        # Un mes ya archivado solo recibe filas si una compactación se
+        # interrumpió antes de borrarlas de la base de datos
+        filas = list({fila[:2] + fila[3:4]: fila for fila in leer_bloque(mes, directory) + filas}.values())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(codificar_bloque(mes, filas))
+    os.replace(tmp_path, path)
+
+
+def fecha_corte(horizonte_dias=HORIZONTE_DIAS, hoy=None):
+    """Primer día del mes que contiene `hoy - horizonte_dias`: se archiva lo anterior."""
+    limite = (hoy or date.today()) - timedelta(days=horizonte_dias)
+    return limite.replace(day=1)
+
+
+def compactar(conn, horizonte_dias=HORIZONTE_DIAS, hoy=None, directory=None):
+    """Mueve al archivo los intervalos cerrados antes de fecha_corte().
+
+    Cada mes se escribe en su bloque antes de borrar sus filas de la base
+    de datos (y se confirma mes a mes). Devuelve {mes: filas archivadas}.
+    """
+    directory = directory or directorio_archivo()
+    corte = str(fecha_corte(horizonte_dias, hoy))
+    meses = [row[0] for row in conn.execute(
+        "SELECT DISTINCT substr(valid_to, 1, 7) FROM precios_intervalos WHERE valid_to < ? ORDER BY 1", (corte,)
+    )]
+    archivadas = {}
+    for mes in meses:
+        rango = (f"{mes}-01", str(_primer_dia_mes_siguiente(mes)))
+        filas = [tuple(row) for row in conn.execute("""
+        SELECT producto_id, warehouse, precio_con_descuento, valid_from, valid_to FROM precios_intervalos
+        WHERE valid_to >= ? AND valid_to < ?
+        """, rango)]
+        _escribir_bloque(mes, filas, directory)
+        conn.execute("DELETE FROM precios_intervalos WHERE valid_to >= ? AND valid_to < ?", rango)
+        conn.commit()
+        archivadas[mes] = len(filas)
+    return archivadas
+
+
+def inicio_tabla(directory=None):
+    """Primera fecha para la que `precios_intervalos` está completa (None si no hay archivo).
+
+    Todos los intervalos archivados acaban antes de esta fecha.
+    """
+    meses = meses_archivados(directory)
+    return str(_primer_dia_mes_siguiente(meses[-1])) if meses else None
+
+
+def intervalos_archivados(desde=None, warehouse=None, producto_id=None, directory=None):
+    """Intervalos archivados vigentes en alguna fecha desde `desde` (incluida).
+
+    Como cada bloque es el mes de `valid_to`, solo se leen los meses a
+    partir del de `desde`.
+    """
+    desde = str(desde) if desde is not None else None
+    filas = []
+    for mes in meses_archivados(directory):
+        if desde is not None and mes < desde[:7]:
+            continue
+        for fila in leer_bloque(mes, directory):
+            if ((warehouse is None or fila[1] == warehouse) and (producto_id is None or fila[0] == producto_id)
+                    and (desde is None or fila[4] > desde)):
+                filas.append(fila)
+    return filas
+
+
+def compactar_base_de_datos(horizonte_dias=HORIZONTE_DIAS):
+    """Compacta data/productos.db y reduce el fichero si se ha archivado algo."""
+    conn = db_utils.get_db_connection()
+    try:
+        archivadas = compactar(conn, horizonte_dias)
+        if archivadas:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+    for mes, filas in archivadas.items():
+        print(f"Archivo {mes}: {filas} intervalos")
+    return archivadas
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Archiva el histórico de precios antiguo en bloques mensuales.")
+    parser.add_argument("--horizonte", type=int, default=HORIZONTE_DIAS,
+                        help=f"Días de histórico que se quedan en la base de datos (por defecto {HORIZONTE_DIAS})")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    compactar_base_de_datos(parse_args().horizonte)
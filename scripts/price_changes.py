@@ -0,0 +1,217 @@
+# scripts/price_changes.py
+"""Cálculo vectorizado de cambios de precio en una ventana de fechas.
+
+queries.intervalos_precio() carga una vez los intervalos de precio en
+arrays de NumPy (ordenados por producto y `valid_from`; la app los
+guarda en la caché de app/shared.py hasta la siguiente ingesta) y
+cambios_ventana() calcula sobre ellos, para cualquier ventana y en una
+sola pasada, el precio inicial, final, mínimo y máximo de cada producto
+con el cambio absoluto y porcentual. top_n() devuelve las mayores
+subidas o bajadas con una ordenación parcial (np.argpartition), sin
+ordenar la tabla entera.
+
+    python -m scripts.price_changes --productos 10000 --dias 365
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+COLUMNAS_CAMBIOS = ("producto_id", "precio_inicial", "precio_final", "precio_min", "precio_max",
+                    "cambio", "porcentaje")
+SIN_FIN = np.iinfo(np.int32).max   # valid_to de los intervalos abiertos (en días)
+_EPOCH = date(1970, 1, 1)
+
+
+def _dias(fecha):
+    """Días desde 1970 de una fecha (date, datetime o texto AAAA-MM-DD)."""
+    return (date.fromisoformat(str(fecha)[:10]) - _EPOCH).days
+
+
+def tabla_intervalos(producto_ids, valid_from, valid_to, precios):
+    """DataFrame de intervalos para cambios_ventana() a partir de columnas paralelas.
+
+    `valid_from` y `valid_to` van en días desde 1970 (None en `valid_to`
+    si el intervalo sigue abierto). Las filas se ordenan por producto y
+    `valid_from` con NumPy (más barato que un ORDER BY en SQLite).
+    """
+    productos = pd.Categorical(producto_ids)
+    desde = np.asarray(valid_from, dtype=np.int32)
+    orden = np.lexsort((desde, productos.codes))
+    return pd.DataFrame({
+        "producto_id": productos[orden],
+        "valid_from": desde[orden],
+        "valid_to": np.nan_to_num(np.asarray(valid_to, dtype=np.float64), nan=SIN_FIN).astype(np.int32)[orden],
+        "precio_con_descuento": np.asarray(precios, dtype=np.float64)[orden],
+    })
+
+
+def calcular_cambios(producto_ids, precios):
+    """Resumen por producto de una lista de precios agrupada por producto.
+
+    `producto_ids` y `precios` son secuencias paralelas en las que los
+    precios de cada producto van seguidos y en orden cronológico. Devuelve
+    un DataFrame con COLUMNAS_CAMBIOS y una fila por producto; el
+    porcentaje es 0 si el precio inicial es 0.
+    """
+    producto_ids = np.asarray(producto_ids)
+    precios = np.asarray(precios, dtype=np.float64)
+    if len(precios) == 0:
+        return pd.DataFrame({columna: [] for columna in COLUMNAS_CAMBIOS})
+
+    # Primera posición de cada producto y última (la anterior al siguiente)
+    inicios = np.flatnonzero(np.concatenate(([True], producto_ids[1:] != producto_ids[:-1])))
+    finales = np.append(inicios[1:], len(precios)) - 1
+
+    inicial = precios[inicios]
+    final = precios[finales]
+    cambio = final - inicial
+    porcentaje = np.zeros_like(cambio)
+    np.divide(cambio, inicial, out=porcentaje, where=inicial != 0)
+    return pd.DataFrame({
+        "producto_id": producto_ids[inicios],
+        "precio_inicial": inicial,
+        "precio_final": final,
+        "precio_min": np.minimum.reduceat(precios, inicios),
+        "precio_max": np.maximum.reduceat(precios, inicios),
+        "cambio": cambio,
+        "porcentaje": porcentaje * 100,
+    })
+
+
+def cambios_ventana(intervalos, fecha_inicio, fecha_fin):
+    """Resumen de precios entre dos fechas (incluidas) de los productos que cambian en ellas.
+
+    `intervalos` es el DataFrame de tabla_intervalos(). Se consideran los
+    productos con algún intervalo que empieza en el rango (los mismos
+    candidatos que queries.cambios_entre()); el precio inicial es el
+    vigente en `fecha_inicio` o, si el producto aparece después, el
+    primero. Devuelve un DataFrame con COLUMNAS_CAMBIOS.
+    """
+    inicio, fin = _dias(fecha_inicio), _dias(fecha_fin)
+    productos = intervalos["producto_id"].cat
+    codigos = productos.codes.to_numpy()
+    desde = intervalos["valid_from"].to_numpy()
+    hasta = intervalos["valid_to"].to_numpy()
+
+    candidatos = np.zeros(len(productos.categories), dtype=bool)
+    candidatos[codigos[(desde > inicio) & (desde <= fin)]] = True
+    filas = candidatos[codigos] & (desde <= fin) & (hasta > inicio)
+
+    df = calcular_cambios(codigos[filas], intervalos["precio_con_descuento"].to_numpy()[filas])
+    df["producto_id"] = np.asarray(productos.categories, dtype=object)[df["producto_id"].to_numpy(dtype=np.intp)]
+    return df
+
+
+def top_n(valores, n, mayores=True):
+    """Posiciones de los `n` valores mayores (o menores), de más a menos extremo.
+
+    Usa una ordenación parcial: solo se ordenan los `n` elegidos.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    if mayores:
+        valores = -valores
+    n = min(n, len(valores))
+    if n <= 0:
+        return np.array([], dtype=np.intp)
+    elegidos = np.argpartition(valores, n - 1)[:n] if n < len(valores) else np.arange(len(valores))
+    return elegidos[np.argsort(valores[elegidos], kind="stable")]
+
+
+def subidas_y_bajadas(df_cambios, n=10):
+    """(subidas, bajadas): las `n` filas con mayor subida y mayor bajada de `cambio`."""
+    cambio = df_cambios["cambio"].to_numpy()
+    subidas = df_cambios.iloc[np.flatnonzero(cambio > 0)]
+    bajadas = df_cambios.iloc[np.flatnonzero(cambio < 0)]
+    return (subidas.iloc[top_n(subidas["cambio"], n)],
+            bajadas.iloc[top_n(bajadas["cambio"], n, mayores=False)])
+
+
+def _crear_base_sintetica(path, productos, dias, probabilidad_cambio, semilla=0):
+    """Base de datos con `productos` productos y `dias` ingestas diarias."""
+    import scripts.db_utils as db_utils
+
+    aleatorio = random.Random(semilla)
+    db_utils.DB_PATH = path
+    db_utils.create_database()
+    primer_dia = date.today() - timedelta(days=dias - 1)
+    fechas = [str(primer_dia + timedelta(days=n)) for n in range(dias)]
+    filas = []
+    for producto in range(productos):
+        precio = round(aleatorio.uniform(0.5, 30), 2)
+        desde = fechas[0]
+        for fecha in fechas[1:]:
+            if aleatorio.random() < probabilidad_cambio:
+                filas.append((str(producto), precio, desde, fecha))
+                precio = round(max(0.1, precio * aleatorio.uniform(0.85, 1.2)), 2)
+                desde = fecha
+        filas.append((str(producto), precio, desde, None))
+    conn = db_utils.get_db_connection()
+    conn.executemany("INSERT INTO fechas_ingesta (warehouse, fecha) VALUES (?, ?)",
+                     [(db_utils.DEFAULT_WAREHOUSE, fecha) for fecha in fechas])
+    conn.executemany("""INSERT INTO precios_intervalos (producto_id, warehouse, precio_con_descuento, valid_from, valid_to)
+                     VALUES (?, ?, ?, ?, ?)""",
+                     [(producto_id, db_utils.DEFAULT_WAREHOUSE, precio, desde, hasta)
+                      for producto_id, precio, desde, hasta in filas])
+    conn.commit()
+    conn.close()
+    return fechas, len(filas)
+
+
+def _medir(funcion, repeticiones):
+    """Mediana en milisegundos de varias ejecuciones."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return sorted(tiempos)[len(tiempos) // 2]
+
+
+def benchmark(productos=10000, dias=365, probabilidad_cambio=0.05, repeticiones=5):
+    """Mide la carga de los intervalos y cambios_ventana() + subidas_y_bajadas() por ventana.
+
+    Usa una base de datos sintética temporal. Devuelve {medida: (filas, ms)}
+    e incluye, como referencia, calcular_cambios() sobre la matriz diaria
+    completa (un precio por producto y día).
+    """
+    from scripts import queries
+
+    with tempfile.TemporaryDirectory(prefix="mercadona-cambios-") as tmp_dir:
+        fechas, total = _crear_base_sintetica(
+            os.path.join(tmp_dir, "productos.db"), productos, dias, probabilidad_cambio)
+        conn = queries.get_connection()
+        intervalos = queries.intervalos_precio(conn)
+        resultados = {"carga de intervalos": (total, round(_medir(lambda: queries.intervalos_precio(conn), repeticiones), 1))}
+        conn.close()
+
+    for nombre, dias_ventana in (("día", 1), ("semana", 7), ("mes", 30), ("año", dias - 1)):
+        inicio, fin = fechas[-1 - dias_ventana], fechas[-1]
+        filas = len(cambios_ventana(intervalos, inicio, fin))
+        ms = _medir(lambda: subidas_y_bajadas(cambios_ventana(intervalos, inicio, fin)), repeticiones)
+        resultados[nombre] = (filas, round(ms, 1))
+
+    ids = np.repeat(np.arange(productos), dias)
+    precios = np.random.default_rng(0).uniform(0.5, 30, productos * dias)
+    resultados["matriz diaria"] = (len(precios), round(_medir(lambda: calcular_cambios(ids, precios), repeticiones), 1))
+    return resultados
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark del cálculo de cambios de precio.")
+    parser.add_argument("--productos", type=int, default=10000, help="Productos del catálogo sintético")
+    parser.add_argument("--dias", type=int, default=365, help="Días de histórico")
+    parser.add_argument("--probabilidad", type=float, default=0.05, help="Probabilidad diaria de cambio de precio")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Ejecuciones por medida (se da la mediana)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"{args.productos} productos × {args.dias} días")
+    for medida, (filas, ms) in benchmark(args.productos, args.dias, args.probabilidad, args.repeticiones).items():
+        print(f"{medida}: {filas} filas, {ms} ms")
@@ -0,0 +1,422 @@
+# scripts/queries.py
+"""Consultas de solo lectura que usan las páginas de la app.
+
+Cada función hace el filtrado en SQL (sobre índices) y devuelve un
+DataFrame construido directamente desde las tuplas del cursor, sin
+pasar por `sqlite3.Row`, o una tupla/lista de tuplas para las
+búsquedas puntuales.
+"""
+import json
+import re
+import sqlite3
+import unicodedata
+import pandas as pd
+import scripts.db_utils as db_utils
+from scripts import price_archive, price_changes
+from scripts.db_utils import COLUMNAS_ID_CATEGORIA, COLUMNAS_PRODUCTO, DEFAULT_WAREHOUSE
+
+# Todas las columnas de la vista `productos`
+COLUMNAS_PRODUCTOS = COLUMNAS_PRODUCTO + ("last_updated",) + COLUMNAS_ID_CATEGORIA + ("clave",)
+
+# Explorador de productos: columnas por las que se puede ordenar (con índice)
+ORDEN_PRODUCTOS = ("nombre", "precio_con_descuento", "bulk_price")
+
+# Búsqueda de productos
+COLUMNAS_BUSQUEDA = ("id", "nombre", "unit_size", "size_format")
+PESOS_BUSQUEDA = (10.0, 2.0, 1.0)   # bm25 de nombre, categorías y envase
+CORRECCIONES_POR_TERMINO = 5        # Palabras del índice que se prueban por cada término con erratas
+SIMILITUD_MINIMA = 0.5              # Fracción de trigramas del término presentes en la palabra
+
+
+def get_connection():
+    """Conexión para consultas: devuelve tuplas (sin row_factory)."""
+    return sqlite3.connect(db_utils.DB_PATH)
+
+
+def _dataframe(conn, sql, params=()):
+    """Ejecuta una consulta y construye el DataFrame columna a columna."""
+    cursor = conn.execute(sql, params)
+    columnas = [description[0] for description in cursor.description]
+    return _dataframe_de_filas(columnas, cursor.fetchall())
+
+
+def _dataframe_de_filas(columnas, filas):
+    if not filas:
+        return pd.DataFrame(columns=columnas)
+    return pd.DataFrame(dict(zip(columnas, zip(*filas))), columns=columnas)
+
+
+def _lista_columnas(columnas, alias=None):
+    """Valida los nombres de columna (se interpolan en el SQL) y los une."""
+    columnas = columnas or COLUMNAS_PRODUCTOS
+    desconocidas = set(columnas) - set(COLUMNAS_PRODUCTOS)
+    if desconocidas:
+        raise ValueError(f"Columnas desconocidas: {sorted(desconocidas)}")
+    return ", ".join(f"{alias}.{columna}" if alias else columna for columna in columnas)
+
+
+def _nombres_como_category(df):
+    """Pasa los nombres de categoría a `category` de pandas (cada cadena se guarda una vez)."""
+    for columna in ("categoria_L1", "categoria_L2", "categoria_L3"):
+        if columna in df:
+            df[columna] = df[columna].astype("category")
+    return df
+
+
+def productos(conn, columnas=None, warehouse=DEFAULT_WAREHOUSE):
+    """Último estado de todos los productos de un almacén (solo las columnas pedidas)."""
+    return _nombres_como_category(
+        _dataframe(conn, f"SELECT {_lista_columnas(columnas)} FROM productos WHERE warehouse = ?", (warehouse,))
+    )
+
+
+def productos_por_categoria(conn, categoria_L1, categoria_L2=None, categoria_L3=None, columnas=None,
+                            warehouse=DEFAULT_WAREHOUSE):
+    """Último estado de los productos de una categoría (L1, o L1/L2, o L1/L2/L3).
+
+    Los nombres se traducen a ids de `categorias` y el filtro se hace
+    sobre los ids enteros (índice idx_productos_categoria).
+    """
+    sql = f"SELECT {_lista_columnas(columnas)} FROM productos WHERE warehouse = ?"
+    params = [warehouse]
+    padre_id = 0
+    for columna, nombre in zip(COLUMNAS_ID_CATEGORIA, (categoria_L1, categoria_L2, categoria_L3)):
+        if nombre is None:
+            break
+        fila = conn.execute("SELECT id FROM categorias WHERE padre_id = ? AND nombre = ?", (padre_id, nombre)).fetchone()
+        padre_id = fila[0] if fila else -1
+        sql += f" AND {columna} = ?"
+        params.append(padre_id)
+    return _nombres_como_category(_dataframe(conn, sql, params))
+
+
+def _filtros_productos(filtros):
+    """Condiciones SQL (y sus parámetros) de los filtros del explorador de productos.
+
+    `filtros` admite `categoria_L1_id`, `categoria_L2_id`,
+    `categoria_L3_id`, `iva` (lista de tipos), `precio_min`, `precio_max`,
+    `is_new` y `price_decreased`; los que faltan o valen None no filtran.
+    """
+    filtros = filtros or {}
+    condiciones, params = [], []
+    for columna in COLUMNAS_ID_CATEGORIA + ("is_new", "price_decreased"):
+        if filtros.get(columna) is not None:
+            condiciones.append(f"{columna} = ?")
+            params.append(int(filtros[columna]))
+    if filtros.get("iva"):
+        condiciones.append(f"iva IN ({', '.join('?' * len(filtros['iva']))})")
+        params.extend(int(iva) for iva in filtros["iva"])
+    if filtros.get("precio_min") is not None:
+        condiciones.append("precio_con_descuento >= ?")
+        params.append(float(filtros["precio_min"]))
+    if filtros.get("precio_max") is not None:
+        condiciones.append("precio_con_descuento <= ?")
+        params.append(float(filtros["precio_max"]))
+    return "".join(f" AND {condicion}" for condicion in condiciones), params
+
+
+def contar_productos(conn, filtros=None, warehouse=DEFAULT_WAREHOUSE):
+    """Número de productos de un almacén que cumplen los filtros de _filtros_productos()."""
+    condiciones, params = _filtros_productos(filtros)
+    return conn.execute(
+        f"SELECT COUNT(*) FROM productos_base WHERE warehouse = ?{condiciones}", [warehouse] + params
+    ).fetchone()[0]
+
+
+def pagina_productos(conn, filtros=None, orden="nombre", descendente=False, despues=None, tamano=50,
+                     columnas=None, warehouse=DEFAULT_WAREHOUSE):
+    """Una página del catálogo, filtrada y ordenada en SQL con paginación por clave (keyset).
+
+    `orden` es una de ORDEN_PRODUCTOS y el desempate es `clave`, así que
+    el orden es total y estable. `despues` es el cursor (valor de
+    `orden`, clave) de la última fila de la página anterior (None para la
+    primera): la consulta sigue el índice desde ahí en lugar de saltarse
+    filas con OFFSET, y cuesta lo mismo en cualquier página. Los NULL van
+    al principio en orden ascendente y al final en descendente.
+
+    Devuelve (DataFrame con `columnas`, cursor de la página siguiente o
+    None si es la última).
+    """
+    if orden not in ORDEN_PRODUCTOS:
+        raise ValueError(f"No se puede ordenar por: {orden}")
+    columnas = list(columnas or COLUMNAS_PRODUCTOS)
+    condiciones, params = _filtros_productos(filtros)
+    if despues is not None:
+        valor, clave = despues
+        mayor = "<" if descendente else ">"
+        if valor is None:
+            condiciones += f" AND ({orden} IS NULL AND clave {mayor} ?"
+            condiciones += ")" if descendente else f" OR {orden} IS NOT NULL)"
+            params.append(clave)
+        else:
+            condiciones += f" AND (({orden}, clave) {mayor} (?, ?)"
+            condiciones += f" OR {orden} IS NULL)" if descendente else ")"
+            params.extend((valor, clave))
+    direccion = " DESC" if descendente else ""
+    filas = conn.execute(f"""
+    SELECT {_lista_columnas(columnas)}, {orden}, clave FROM productos
+    WHERE warehouse = ?{condiciones}
+    ORDER BY {orden}{direccion}, clave{direccion}
+    LIMIT ?
+    """, [warehouse] + params + [tamano + 1]).fetchall()
+    siguiente = filas[tamano - 1][-2:] if len(filas) > tamano else None
+    return _dataframe_de_filas(columnas, [fila[:-2] for fila in filas[:tamano]]), siguiente
+
+
+def tipos_iva(conn, warehouse=DEFAULT_WAREHOUSE):
+    """Tipos de IVA distintos del catálogo de un almacén, en orden."""
+    cursor = conn.execute(
+        "SELECT DISTINCT iva FROM productos_base WHERE warehouse = ? AND iva IS NOT NULL ORDER BY iva", (warehouse,)
+    )
+    return [row[0] for row in cursor]
+
+
+def _sin_acentos(texto):
+    return "".join(c for c in unicodedata.normalize("NFD", texto.lower()) if not unicodedata.combining(c))
+
+
+def _trigramas(terminos):
+    """Trigramas de cada término, con dos espacios delante y uno detrás (como pg_trgm)."""
+    return {f"  {termino} "[i:i + 3] for termino in terminos for i in range(len(termino) + 1)}
+
+
+def _correcciones(conn, termino):
+    """Palabras del índice parecidas a `termino` (por trigramas), de más a menos parecida.
+
+    Solo se miran las que empiezan por la misma letra: el índice de
+    palabras se recorre por rango y el coste no depende del catálogo.
+    """
+    trigramas = _trigramas([termino])
+    siguiente = termino[0] + "\U0010ffff"
+    similitudes = {}
+    for (palabra,) in conn.execute(
+            "SELECT term FROM productos_fts_vocab WHERE term >= ? AND term < ?", (termino[0], siguiente)):
+        similitud = len(trigramas & _trigramas([palabra])) / len(trigramas)
+        if similitud >= SIMILITUD_MINIMA:
+            similitudes[palabra] = similitud
+    return sorted(similitudes, key=similitudes.get, reverse=True)[:CORRECCIONES_POR_TERMINO]
+
+
+def _buscar_claves(conn, consulta, warehouse, limite):
+    pesos = ", ".join(str(peso) for peso in PESOS_BUSQUEDA)
+    return [row[0] for row in conn.execute(f"""
+    SELECT f.rowid FROM productos_fts f JOIN productos_base p ON p.clave = f.rowid
+    WHERE productos_fts MATCH ? AND p.warehouse = ?
+    ORDER BY bm25(productos_fts, {pesos})
+    LIMIT ?
+    """, (consulta, warehouse, limite))]
+
+
+def buscar_productos(conn, texto, limite=20, columnas=COLUMNAS_BUSQUEDA, warehouse=DEFAULT_WAREHOUSE):
+    """Productos que coinciden con `texto`, del más al menos relevante.
+
+    Primero busca productos con palabras que empiecen por cada término
+    (sin distinguir mayúsculas ni acentos) en el nombre, las categorías o
+    el envase, con más peso para el nombre. Si no llega a `limite`, completa
+    con una segunda búsqueda en la que cada término puede ser también una
+    palabra parecida del índice (erratas).
+    """
+    terminos = re.findall(r"\w+", _sin_acentos(texto))
+    claves = []
+    if terminos:
+        claves = _buscar_claves(conn, " AND ".join(f'"{termino}"*' for termino in terminos), warehouse, limite)
+        if len(claves) < limite:
+            # Cada término vale como prefijo o como una de sus correcciones
+            alternativas = []
+            for termino in terminos:
+                opciones = [f'"{termino}"*']
+                if len(termino) >= 3:
+                    opciones += [f'"{palabra}"' for palabra in _correcciones(conn, termino)]
+                alternativas.append("(" + " OR ".join(opciones) + ")")
+            encontradas = set(claves)
+            claves += [clave for clave in _buscar_claves(conn, " AND ".join(alternativas), warehouse, limite)
+                       if clave not in encontradas]
+
+    # Una sola consulta para las columnas pedidas, en el orden de relevancia
+    orden = ", ".join("(?, ?)" for _ in claves) or "(NULL, NULL)"
+    return _dataframe(conn, f"""
+    WITH orden(clave, posicion) AS (VALUES {orden})
+    SELECT {_lista_columnas(columnas, "p")} FROM orden o JOIN productos p ON p.clave = o.clave
+    WHERE p.warehouse = ?
+    ORDER BY o.posicion
+    LIMIT ?
+    """, (*(valor for posicion, clave in enumerate(claves) for valor in (clave, posicion)), warehouse, limite))
+
+
+def categorias(conn, nivel=None):
+    """Dimensión de categorías: `id`, `nivel`, `nombre` y `padre_id` (0 para las L1)."""
+    if nivel is None:
+        return _dataframe(conn, "SELECT id, nivel, nombre, padre_id FROM categorias ORDER BY nivel, nombre")
+    return _dataframe(conn, "SELECT id, nivel, nombre, padre_id FROM categorias WHERE nivel = ? ORDER BY nombre",
+                      (nivel,))
+
+
+def producto_por_id(conn, producto_id, warehouse=DEFAULT_WAREHOUSE):
+    """Un producto como diccionario {columna: valor}, o None si no existe."""
+    cursor = conn.execute(
+        f"SELECT {_lista_columnas(None)} FROM productos WHERE id = ? AND warehouse = ?", (producto_id, warehouse)
+    )
+    fila = cursor.fetchone()
+    return dict(zip(COLUMNAS_PRODUCTOS, fila)) if fila else None
+
+
+_COLUMNAS_INTERVALO = "producto_id, warehouse, precio_con_descuento, valid_from, valid_to"
+
+
+def _intervalos(conn, desde=None, warehouse=DEFAULT_WAREHOUSE, producto_id=None):
+    """Origen de los intervalos para una consulta desde `desde` (None: todo el histórico).
+
+    Si la consulta llega a meses ya archivados (scripts/price_archive.py),
+    carga los intervalos archivados necesarios en una tabla temporal,
+    confirma (la conexión no queda con una transacción abierta) y
+    devuelve la unión con `precios_intervalos`. Si no, la tabla sin más.
+    """
+    inicio = price_archive.inicio_tabla()
+    if inicio is None or (desde is not None and str(desde) >= inicio):
+        return "precios_intervalos"
+    conn.execute("""
+    CREATE TEMP TABLE IF NOT EXISTS intervalos_archivados (
+        producto_id TEXT, warehouse TEXT, precio_con_descuento REAL, valid_from TEXT, valid_to TEXT,
+        PRIMARY KEY (producto_id, warehouse, valid_from)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("DELETE FROM temp.intervalos_archivados")
+    conn.executemany(f"INSERT OR IGNORE INTO temp.intervalos_archivados ({_COLUMNAS_INTERVALO}) VALUES (?, ?, ?, ?, ?)",
+                     price_archive.intervalos_archivados(desde, warehouse, producto_id))
+    # Filas que siguen también en la tabla (compactación interrumpida)
+    conn.execute("""
+    DELETE FROM temp.intervalos_archivados WHERE EXISTS (
+        SELECT 1 FROM precios_intervalos i
+        WHERE i.producto_id = intervalos_archivados.producto_id AND i.warehouse = intervalos_archivados.warehouse
+            AND i.valid_from = intervalos_archivados.valid_from
+    )
+    """)
+    conn.commit()
+    return (f"(SELECT {_COLUMNAS_INTERVALO} FROM precios_intervalos"
+            f" UNION ALL SELECT {_COLUMNAS_INTERVALO} FROM temp.intervalos_archivados)")
+
+
+def historico_producto(conn, producto_id, warehouse=DEFAULT_WAREHOUSE):
+    """Histórico diario de un producto: columnas `fecha_actualizacion` y `precio_con_descuento`."""
+    return _dataframe(conn, f"""
+    SELECT f.fecha AS fecha_actualizacion, i.precio_con_descuento
+    FROM {_intervalos(conn, None, warehouse, producto_id)} i
+    JOIN fechas_ingesta f
+        ON f.warehouse = i.warehouse AND f.fecha >= i.valid_from AND (i.valid_to IS NULL OR f.fecha < i.valid_to)
+    WHERE i.producto_id = ? AND i.warehouse = ?
+    ORDER BY f.fecha
+    """, (producto_id, warehouse))
+
+
+def historico_rango(conn, fecha_inicio, fecha_fin, warehouse=DEFAULT_WAREHOUSE):
+    """Histórico diario de todos los productos entre dos fechas (incluidas).
+
+    Solo recorre los intervalos que se solapan con el rango.
+    """
+    return _dataframe(conn, f"""
+    SELECT i.producto_id, f.fecha AS fecha_actualizacion, i.precio_con_descuento
+    FROM {_intervalos(conn, fecha_inicio, warehouse)} i
+    JOIN fechas_ingesta f
+        ON f.warehouse = i.warehouse AND f.fecha >= i.valid_from AND (i.valid_to IS NULL OR f.fecha < i.valid_to)
+    WHERE i.warehouse = :warehouse
+        AND i.valid_from <= :fin AND (i.valid_to IS NULL OR i.valid_to > :inicio)
+        AND f.fecha BETWEEN :inicio AND :fin
+    ORDER BY i.producto_id, f.fecha
+    """, {"warehouse": warehouse, "inicio": str(fecha_inicio), "fin": str(fecha_fin)})
+
+
+def fechas_de_ingesta(conn, warehouse=DEFAULT_WAREHOUSE):
+    """Fechas (texto AAAA-MM-DD) con ingesta de un almacén, en orden."""
+    cursor = conn.execute("SELECT fecha FROM fechas_ingesta WHERE warehouse = ? ORDER BY fecha", (warehouse,))
+    return [row[0] for row in cursor]
+
+
+def precio_en_fecha(conn, fecha, warehouse=DEFAULT_WAREHOUSE, producto_id=None):
+    """Precio vigente en una fecha: lista de (producto_id, precio).
+
+    Con `producto_id` es una búsqueda por clave primaria.
+    """
+    sql = f"""
+    SELECT producto_id, precio_con_descuento FROM {_intervalos(conn, fecha, warehouse, producto_id)}
+    WHERE warehouse = ? AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)
+    """
+    params = [warehouse, str(fecha), str(fecha)]
+    if producto_id is not None:
+        sql += " AND producto_id = ?"
+        params.append(producto_id)
+    return conn.execute(sql, params).fetchall()
+
+
+def cambios_entre(conn, fecha_inicio, fecha_fin, warehouse=DEFAULT_WAREHOUSE):
+    """Productos cuyo precio ha cambiado entre dos fechas (incluidas).
+
+    Devuelve un DataFrame con `producto_id`, `precio_inicial` y
+    `precio_final`. Los candidatos salen de un rango sobre `valid_from` y
+    cada precio se busca por clave primaria. Para un producto que aparece
+    dentro del rango, el precio inicial es el primero que tuvo.
+    """
+    intervalos = _intervalos(conn, fecha_inicio, warehouse)
+    return _dataframe(conn, f"""
+    SELECT producto_id, precio_inicial, precio_final FROM (
+        SELECT c.producto_id,
+            COALESCE(
+                (SELECT i.precio_con_descuento FROM {intervalos} i
+                 WHERE i.producto_id = c.producto_id AND i.warehouse = :warehouse
+                   AND i.valid_from <= :inicio AND (i.valid_to IS NULL OR i.valid_to > :inicio)),
+                (SELECT i.precio_con_descuento FROM {intervalos} i
+                 WHERE i.producto_id = c.producto_id AND i.warehouse = :warehouse AND i.valid_from > :inicio
+                 ORDER BY i.valid_from LIMIT 1)
+            ) AS precio_inicial,
+            (SELECT i.precio_con_descuento FROM {intervalos} i
+             WHERE i.producto_id = c.producto_id AND i.warehouse = :warehouse AND i.valid_from <= :fin
+             ORDER BY i.valid_from DESC LIMIT 1) AS precio_final
+        FROM (SELECT DISTINCT producto_id FROM {intervalos}
+              WHERE warehouse = :warehouse AND valid_from > :inicio AND valid_from <= :fin) c
+    )
+    WHERE precio_inicial IS NOT precio_final
+    """, {"warehouse": warehouse, "inicio": str(fecha_inicio), "fin": str(fecha_fin)})
+
+
+def intervalos_precio(conn, desde=None, warehouse=DEFAULT_WAREHOUSE):
+    """Intervalos de precio vigentes en alguna fecha desde `desde` (None: todos), para price_changes.
+
+    Devuelve el DataFrame de price_changes.tabla_intervalos(), ordenado
+    por producto y `valid_from`, con `producto_id` (category),
+    `valid_from` y `valid_to` en días desde 1970 (int32; los intervalos
+    abiertos acaban en price_changes.SIN_FIN) y `precio_con_descuento`.
+    Los intervalos sin precio se descartan.
+    """
+    sql = f"""
+    SELECT producto_id,
+        CAST(julianday(valid_from) - 2440587.5 AS INTEGER),
+        CAST(julianday(valid_to) - 2440587.5 AS INTEGER),
+        precio_con_descuento
+    FROM {_intervalos(conn, desde, warehouse)}
+    WHERE warehouse = ? AND precio_con_descuento IS NOT NULL
+    """
+    params = [warehouse]
+    if desde is not None:
+        sql += " AND (valid_to IS NULL OR valid_to > ?)"
+        params.append(str(desde))
+    filas = conn.execute(sql, params).fetchall()
+    producto_ids, desde_dias, hasta_dias, precios = zip(*filas) if filas else ((), (), (), ())
+    return price_changes.tabla_intervalos(producto_ids, desde_dias, hasta_dias, precios)
+
+
+def resumen_diario(conn, nivel, fecha=None, warehouse=DEFAULT_WAREHOUSE):
+    """Filas de `resumen_diario` de un nivel ("L1", "L2", "iva" o "L1_iva").
+
+    Sin `fecha`, las del último día con resumen. La columna `histograma`
+    se devuelve ya decodificada (lista de recuentos por cubo de
+    rollups.LIMITES_HISTOGRAMA).
+    """
+    if fecha is None:
+        fecha = conn.execute(
+            "SELECT MAX(fecha) FROM resumen_diario WHERE warehouse = ? AND nivel = ?", (warehouse, nivel)
+        ).fetchone()[0]
+    df = _dataframe(conn, """
+    SELECT * FROM resumen_diario WHERE warehouse = ? AND nivel = ? AND fecha = ?
+    ORDER BY categoria_L1, categoria_L2, iva
+    """, (warehouse, nivel, str(fecha)))
+    df["histograma"] = [json.loads(h) for h in df["histograma"]]
+    return df
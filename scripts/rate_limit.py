@@ -0,0 +1,212 @@
+# scripts/rate_limit.py
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+
+# Constantes
+DEFAULT_RATE = 20.0        # Peticiones por segundo (token bucket)
+DEFAULT_BURST = 10         # Peticiones que se pueden hacer de golpe
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE = 0.5         # Segundos
+BACKOFF_CAP = 30.0         # Segundos
+THROTTLE_STATUS = (429, 503)
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class RequestFailedError(Exception):
+    """Se lanza cuando una petición sigue fallando tras agotar los reintentos."""
+
+    def __init__(self, url, status_code=None, cause=None):
+        self.url = url
+        self.status_code = status_code
+        self.cause = cause
+        detalle = f"HTTP {status_code}" if status_code is not None else repr(cause)
+        super().__init__(f"La petición a {url} ha fallado tras varios reintentos: {detalle}")
+
+
+class TokenBucket:
+    """Limitador de peticiones por segundo con ráfagas acotadas."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloquea hasta que haya un token disponible."""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AIMDController:
+    """Límite de concurrencia adaptativo (aumento aditivo, reducción multiplicativa).
+
+    Sube el límite en 1 tras `window` respuestas correctas seguidas y lo
+    divide a la mitad cuando el servidor pide que se frene (429/503).
+    """
+
+    def __init__(self, max_limit, initial=None, window=10, decrease_factor=0.5):
+        self.max_limit = max(1, max_limit)
+        self.limit = max(1, min(self.max_limit, initial or (self.max_limit + 1) // 2))
+        self.window = window
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self):
+        with self._cond:
+            self.successes += 1
+            if self.successes >= self.window and self.limit < self.max_limit:
+                self.limit += 1
+                self.successes = 0
+                self._cond.notify()
+
+    def on_throttle(self):
+        with self._cond:
+            self.limit = max(1, int(self.limit * self.decrease_factor))
+            self.successes = 0
+
+
+class EndpointStats:
+    """Contadores de latencia y errores por endpoint."""
+
+    def __init__(self):
+        self.data = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def endpoint(url):
+        """Agrupa las URLs por plantilla (los ids numéricos pasan a `{id}`)."""
+        path = re.sub(r"^https?://[^/]+", "", url).split("?")[0]
+        return re.sub(r"/\d+", "/{id}", path)
+
+    def record(self, url, latency, status_code=None, retried=False):
+        key = self.endpoint(url)
+        with self._lock:
+            stats = self.data.setdefault(key, {
+                "requests": 0, "errors": 0, "throttled": 0, "retries": 0,
+                "latency_total": 0.0, "latency_max": 0.0,
+            })
+            stats["requests"] += 1
+            stats["latency_total"] += latency
+            stats["latency_max"] = max(stats["latency_max"], latency)
+            if status_code is None or status_code >= 400:
+                stats["errors"] += 1
+            if status_code in THROTTLE_STATUS:
+                stats["throttled"] += 1
+            if retried:
+                stats["retries"] += 1
+
+    def summary(self):
+        """Resumen legible, una línea por endpoint."""
+        lineas = []
+        with self._lock:
+            for key, stats in sorted(self.data.items()):
+                media = stats["latency_total"] / stats["requests"] * 1000
+                lineas.append(
+                    f"{key}: {stats['requests']} peticiones, {stats['errors']} errores "
+                    f"({stats['throttled']} throttling), {stats['retries']} reintentos, "
+                    f"latencia media {media:.0f} ms, máx {stats['latency_max'] * 1000:.0f} ms"
+                )
+        return "\n".join(lineas)
+
+
+def retry_after_seconds(headers):
+    """Interpreta la cabecera Retry-After (segundos o fecha HTTP)."""
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Espera exponencial con jitter completo para el intento `attempt` (0, 1, ...)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RequestExecutor:
+    """Ejecuta peticiones con límite de ritmo, concurrencia adaptativa y reintentos.
+
+    Los errores transitorios (429, 5xx, errores de conexión) se reintentan
+    con backoff exponencial respetando Retry-After. Si se agotan los
+    reintentos se lanza RequestFailedError en lugar de devolver un
+    resultado vacío.
+    """
+
+    def __init__(self, max_concurrency, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 max_retries=DEFAULT_MAX_RETRIES):
+        self.bucket = TokenBucket(rate, burst)
+        self.controller = AIMDController(max_concurrency)
+        self.stats = EndpointStats()
+        self.max_retries = max_retries
+
+    def execute(self, url, send):
+        """Llama a `send()` (un único intento de GET a `url`) hasta obtener una respuesta válida."""
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self.controller.acquire()
+            start = time.monotonic()
+            response, error = None, None
+            try:
+                response = send()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            finally:
+                self.controller.release()
+            latency = time.monotonic() - start
+
+            status_code = response.status_code if response is not None else None
+            self.stats.record(url, latency, status_code, retried=attempt > 0)
+
+            if response is not None and status_code not in RETRY_STATUS:
+                self.controller.on_success()
+                return response
+
+            if status_code in THROTTLE_STATUS:
+                self.controller.on_throttle()
+
+            if attempt >= self.max_retries:
+                raise RequestFailedError(url, status_code, error)
+
+            delay = backoff_delay(attempt)
+            if response is not None:
+                retry_after = retry_after_seconds(getattr(response, "headers", None))
+                if retry_after is not None:
+                    delay = retry_after + random.uniform(0, BACKOFF_BASE)
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,186 @@
+# scripts/records.py
+import sys
+import pandas as pd
+from scripts.db_utils import DEFAULT_WAREHOUSE
+
+# Campos en el mismo orden que el diccionario de api_utils.parse_product
+PRODUCT_FIELDS = (
+    "id", "nombre", "categoria_L1", "categoria_L2", "categoria_L3",
+    "precio_con_descuento", "precio_sin_descuento", "packaging", "bulk_price",
+    "unit_size", "size_format", "iva", "selling_method", "is_pack", "is_new",
+    "price_decreased", "unavailable_from", "url", "imagen", "warehouse",
+)
+
+# Orden de las columnas de `productos` en db_utils.COLUMNAS_PRODUCTO
+DB_FIELDS = ("id", "warehouse") + tuple(
+    field for field in PRODUCT_FIELDS if field not in ("id", "warehouse")
+)
+
+
+class CategoryRef:
+    """Ruta de categoría L1/L2/L3 compartida por todos los productos de una L3."""
+
+    __slots__ = ("L1", "L2", "L3")
+
+    def __init__(self, L1, L2, L3):
+        self.L1 = L1
+        self.L2 = L2
+        self.L3 = L3
+
+    def __repr__(self):
+        return f"CategoryRef({self.L1!r}, {self.L2!r}, {self.L3!r})"
+
+
+_categorias = {}
+
+def intern_category(L1, L2, L3):
+    """Devuelve la única instancia de CategoryRef para una ruta de categoría."""
+    clave = (L1, L2, L3)
+    categoria = _categorias.get(clave)
+    if categoria is None:
+        categoria = _categorias[clave] = CategoryRef(sys.intern(L1), sys.intern(L2), sys.intern(L3))
+    return categoria
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class ProductRecord:
+    """Producto compacto: atributos en `__slots__` y categoría compartida.
+
+    Admite el acceso de tipo diccionario (`producto["id"]`,
+    `producto.get("imagen")`) para que el código que trabajaba con la
+    salida de parse_product siga funcionando.
+    """
+
+    __slots__ = (
+        "id", "nombre", "categoria", "precio_con_descuento", "precio_sin_descuento",
+        "packaging", "bulk_price", "unit_size", "size_format", "iva", "selling_method",
+        "is_pack", "is_new", "price_decreased", "unavailable_from", "url", "imagen", "warehouse",
+    )
+
+    @classmethod
+    def from_api(cls, product, categoria, warehouse=DEFAULT_WAREHOUSE):
+        """Crea el registro directamente desde el JSON de la API.
+
+        Accede a las claves sin cadenas de `.get()`; si al producto le falta
+        alguna clave opcional, recurre a la ruta lenta y tolerante.
+        """
+        try:
+            pi = product["price_instructions"]
+            previous_price = pi["previous_unit_price"]
+            bulk_price = pi["bulk_price"]
+            record = cls.__new__(cls)
+            record.id = product["id"]
+            record.nombre = product["display_name"]
+            record.categoria = categoria
+            record.precio_con_descuento = float(pi["unit_price"])
+            record.precio_sin_descuento = float(previous_price.strip()) if isinstance(previous_price, str) else None
+            record.packaging = _intern(product["packaging"])
+            record.bulk_price = float(bulk_price) if bulk_price else None
+            record.unit_size = pi["unit_size"]
+            record.size_format = _intern(pi["size_format"])
+            record.iva = pi["iva"]
+            record.selling_method = pi["selling_method"]
+            record.is_pack = pi["is_pack"]
+            record.is_new = pi["is_new"]
+            record.price_decreased = pi["price_decreased"]
+            record.unavailable_from = product["unavailable_from"]
+            record.url = product["share_url"]
+            record.imagen = product["thumbnail"]
+            record.warehouse = warehouse
+            return record
+        except KeyError:
+            return cls._from_api_slow(product, categoria, warehouse)
+
+    @classmethod
+    def _from_api_slow(cls, product, categoria, warehouse):
+        """Igual que from_api pero tolerando claves opcionales ausentes (como parse_product)."""
+        pi = product.get("price_instructions", {})
+        previous_price = pi.get("previous_unit_price")
+        record = cls.__new__(cls)
+        record.id = product["id"]
+        record.nombre = product["display_name"]
+        record.categoria = categoria
+        record.precio_con_descuento = float(pi["unit_price"])
+        record.precio_sin_descuento = float(previous_price.strip()) if isinstance(previous_price, str) else None
+        record.packaging = _intern(product.get("packaging"))
+        record.bulk_price = float(pi["bulk_price"]) if pi.get("bulk_price") else None
+        record.unit_size = pi.get("unit_size")
+        record.size_format = _intern(pi.get("size_format"))
+        record.iva = pi.get("iva")
+        record.selling_method = pi.get("selling_method")
+        record.is_pack = pi.get("is_pack")
+        record.is_new = pi.get("is_new")
+        record.price_decreased = pi.get("price_decreased")
+        record.unavailable_from = product.get("unavailable_from")
+        record.url = product["share_url"]
+        record.imagen = product["thumbnail"]
+        record.warehouse = warehouse
+        return record
+
+    @classmethod
+    def from_dict(cls, producto):
+        """Crea el registro a partir de un diccionario como el de parse_product."""
+        record = cls.__new__(cls)
+        for field in cls.__slots__:
+            if field != "categoria":
+                setattr(record, field, producto.get(field))
+        record.categoria = intern_category(producto["categoria_L1"], producto["categoria_L2"], producto["categoria_L3"])
+        if record.warehouse is None:
+            record.warehouse = DEFAULT_WAREHOUSE
+        return record
+
+    # Acceso de tipo diccionario
+    def __getitem__(self, key):
+        if key == "categoria_L1":
+            return self.categoria.L1
+        if key == "categoria_L2":
+            return self.categoria.L2
+        if key == "categoria_L3":
+            return self.categoria.L3
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def as_dict(self):
+        """Diccionario idéntico al que devuelve parse_product."""
+        return {field: self[field] for field in PRODUCT_FIELDS}
+
+    def as_db_params(self):
+        """Tupla de parámetros en el orden de DB_FIELDS."""
+        categoria = self.categoria
+        return (
+            self.id, self.warehouse, self.nombre, categoria.L1, categoria.L2, categoria.L3,
+            self.precio_con_descuento, self.precio_sin_descuento, self.packaging, self.bulk_price,
+            self.unit_size, self.size_format, self.iva, self.selling_method, self.is_pack,
+            self.is_new, self.price_decreased, self.unavailable_from, self.url, self.imagen,
+        )
+
+    def __repr__(self):
+        return f"ProductRecord(id={self.id!r}, nombre={self.nombre!r}, warehouse={self.warehouse!r})"
+
+
+def records_to_dataframe(records):
+    """Convierte registros en un DataFrame columna a columna, sin pasar por diccionarios.
+
+    Las categorías se guardan como `category` de pandas, que reutiliza los
+    valores internados en lugar de repetir la cadena en cada fila.
+    """
+    categorias = [record.categoria for record in records]
+    columnas = {}
+    for field in PRODUCT_FIELDS:
+        if field.startswith("categoria_"):
+            nivel = field[-2:]
+            columnas[field] = pd.Categorical([getattr(categoria, nivel) for categoria in categorias])
+        else:
+            columnas[field] = [getattr(record, field) for record in records]
+    return pd.DataFrame(columnas, columns=list(PRODUCT_FIELDS))
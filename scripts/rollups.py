@@ -0,0 +1,202 @@
+# scripts/rollups.py
+"""Resúmenes diarios por categoría e IVA mantenidos durante la ingesta.
+
+La tabla `resumen_diario` guarda, por fecha y almacén, una fila por
+grupo de cada nivel:
+
+- `L1`: categoría L1
+- `L2`: categoría L2 (dentro de su L1)
+- `iva`: tipo de IVA
+- `L1_iva`: categoría L1 y tipo de IVA
+
+Cada fila lleva número de productos, precio medio, mediano, mínimo y
+máximo, suma de precios (para combinar medias), histograma de precios
+(recuentos por cubo de LIMITES_HISTOGRAMA, en JSON), subidas/bajadas
+de precio del día y productos de marca blanca (MARCA_BLANCA en el
+nombre). Las columnas que no usa un nivel valen "" (categorías)
+o -1 (IVA), igual que las de los productos sin categoría o sin IVA.
+
+Solo se recalculan los grupos afectados: unos triggers temporales anotan
+el grupo de cada producto insertado o modificado y de cada intervalo de
+precio abierto o cerrado durante la ingesta. El resto de grupos copia la
+fila del día anterior.
+"""
+import json
+import statistics
+from bisect import bisect_right
+
+# Límites inferiores de los cubos del histograma (€); el último no tiene límite superior
+LIMITES_HISTOGRAMA = (0, 1, 2, 3, 4, 5, 7.5, 10, 15, 20, 30, 50)
+
+# Marca blanca de Mercadona: se busca en el nombre, sin distinguir mayúsculas
+MARCA_BLANCA = "hacendado"
+
+NIVELES = ("L1", "L2", "iva", "L1_iva")
+SIN_CATEGORIA = ""
+SIN_IVA = -1
+
+COLUMNAS_RESUMEN = (
+    "fecha", "warehouse", "nivel", "categoria_L1", "categoria_L2", "iva",
+    "productos", "precio_medio", "precio_mediana", "precio_min", "precio_max",
+    "suma_precios", "histograma", "subidas", "bajadas", "marca_blanca",
+)
+
+# Nombres de categoría del estado anterior (OLD) o nuevo (NEW) de una fila de productos_base
+_GRUPO = """{fila}.warehouse,
+            (SELECT nombre FROM categorias WHERE id = {fila}.categoria_L1_id),
+            (SELECT nombre FROM categorias WHERE id = {fila}.categoria_L2_id),
+            {fila}.iva"""
+
+_TRIGGERS = (
+    f"""CREATE TEMP TRIGGER IF NOT EXISTS resumen_producto_nuevo AFTER INSERT ON productos_base
+    BEGIN
+        INSERT INTO grupos_afectados VALUES ({_GRUPO.format(fila="NEW")});
+    END""",
+    # Un producto que cambia de categoría o de IVA afecta a su grupo anterior y al nuevo
+    f"""CREATE TEMP TRIGGER IF NOT EXISTS resumen_producto_modificado AFTER UPDATE ON productos_base
+    BEGIN
+        INSERT INTO grupos_afectados VALUES ({_GRUPO.format(fila="OLD")});
+        INSERT INTO grupos_afectados VALUES ({_GRUPO.format(fila="NEW")});
+    END""",
+    # Intervalo nuevo: cambio de precio o producto que vuelve a aparecer
+    """CREATE TEMP TRIGGER IF NOT EXISTS resumen_intervalo_nuevo AFTER INSERT ON precios_intervalos
+    BEGIN
+        INSERT INTO grupos_afectados
+        SELECT warehouse, categoria_L1, categoria_L2, iva FROM productos
+        WHERE id = NEW.producto_id AND warehouse = NEW.warehouse;
+    END""",
+    # Intervalo cerrado: producto que desaparece
+    """CREATE TEMP TRIGGER IF NOT EXISTS resumen_intervalo_cerrado AFTER UPDATE OF valid_to ON precios_intervalos
+    WHEN OLD.valid_to IS NULL
+    BEGIN
+        INSERT INTO grupos_afectados
+        SELECT warehouse, categoria_L1, categoria_L2, iva FROM productos
+        WHERE id = NEW.producto_id AND warehouse = NEW.warehouse;
+    END""",
+)
+
+
+def preparar_resumenes(conn):
+    """Crea la tabla temporal de grupos afectados y los triggers que la rellenan."""
+    conn.execute("DROP TABLE IF EXISTS temp.grupos_afectados")
+    conn.execute("CREATE TEMP TABLE grupos_afectados (warehouse TEXT, categoria_L1 TEXT, categoria_L2 TEXT, iva INTEGER)")
+    for trigger in _TRIGGERS:
+        conn.execute(trigger)
+
+
+# Clave (categoria_L1, categoria_L2, iva) de cada nivel, sobre las columnas de `{t}`.
+# Un producto sin categoría o sin IVA cuenta en el grupo SIN_CATEGORIA o SIN_IVA.
+_L1 = f"COALESCE({{t}}categoria_L1, '{SIN_CATEGORIA}')"
+_L2 = f"COALESCE({{t}}categoria_L2, '{SIN_CATEGORIA}')"
+_IVA = f"COALESCE({{t}}iva, {SIN_IVA})"
+_CLAVES = {
+    "L1": f"{_L1}, '{SIN_CATEGORIA}', {SIN_IVA}",
+    "L2": f"{_L1}, {_L2}, {SIN_IVA}",
+    "iva": f"'{SIN_CATEGORIA}', '{SIN_CATEGORIA}', {_IVA}",
+    "L1_iva": f"{_L1}, '{SIN_CATEGORIA}', {_IVA}",
+}
+
+
+def histograma(precios):
+    """Recuento de precios por cubo de LIMITES_HISTOGRAMA."""
+    cubos = [0] * len(LIMITES_HISTOGRAMA)
+    for precio in precios:
+        cubos[max(bisect_right(LIMITES_HISTOGRAMA, precio) - 1, 0)] += 1
+    return cubos
+
+
+def _fila(fecha, warehouse, nivel, clave, precios, subidas, bajadas, marca_blanca):
+    return (
+        fecha, warehouse, nivel, *clave,
+        len(precios), sum(precios) / len(precios), statistics.median(precios), min(precios), max(precios),
+        sum(precios), json.dumps(histograma(precios)), subidas, bajadas, marca_blanca,
+    )
+
+
+def _copiar_dia_anterior(conn, warehouse, fecha):
+    """Crea las filas del día copiando las del último día anterior (sin subidas ni bajadas).
+
+    Devuelve False si no hay ningún día anterior.
+    """
+    anterior = conn.execute(
+        "SELECT MAX(fecha) FROM resumen_diario WHERE warehouse = ? AND fecha < ?", (warehouse, fecha)
+    ).fetchone()[0]
+    if anterior is None:
+        return False
+    columnas = ", ".join(COLUMNAS_RESUMEN)
+    copia = ", ".join(
+        "?" if c == "fecha" else "0" if c in ("subidas", "bajadas") else c for c in COLUMNAS_RESUMEN
+    )
+    conn.execute(
+        f"INSERT INTO resumen_diario ({columnas}) SELECT {copia} FROM resumen_diario WHERE warehouse = ? AND fecha = ?",
+        (fecha, warehouse, anterior)
+    )
+    return True
+
+
+def actualizar_resumenes(conn, warehouses, fecha):
+    """Recalcula los grupos afectados del día dentro de la transacción en curso.
+
+    Cada nivel se consulta por separado y solo lee los productos de sus
+    propios grupos afectados: un cambio en una L2 recalcula esa L2, su L1,
+    su IVA y su par L1 × IVA, no todas las categorías con el mismo IVA.
+    Devuelve el número de grupos recalculados.
+    """
+    recalculados = 0
+    for warehouse in warehouses:
+        hay_filas = conn.execute(
+            "SELECT 1 FROM resumen_diario WHERE warehouse = ? AND fecha = ? LIMIT 1", (warehouse, fecha)
+        ).fetchone()
+        completo = not hay_filas and not _copiar_dia_anterior(conn, warehouse, fecha)
+        parametros = {"fecha": fecha, "warehouse": warehouse, "marca": MARCA_BLANCA}
+
+        for nivel in NIVELES:
+            clave_producto = _CLAVES[nivel].format(t="p.")
+            clave_afectado = _CLAVES[nivel].format(t="")
+            # Productos vigentes de los grupos afectados del nivel (o todos, en el
+            # primer cálculo) y, si su precio ha cambiado hoy, el precio anterior
+            sql = f"""
+            SELECT {clave_producto}, i.precio_con_descuento, anterior.precio_con_descuento,
+                instr(lower(p.nombre), :marca) > 0
+            FROM precios_intervalos i
+            JOIN productos p ON p.id = i.producto_id AND p.warehouse = i.warehouse
+            LEFT JOIN precios_intervalos anterior
+                ON anterior.producto_id = i.producto_id AND anterior.warehouse = i.warehouse
+                AND anterior.valid_to = i.valid_from AND i.valid_from = :fecha
+            WHERE i.warehouse = :warehouse AND i.valid_to IS NULL AND i.precio_con_descuento IS NOT NULL
+            """
+            if not completo:
+                sql += f"""
+                AND ({clave_producto}) IN (
+                    SELECT {clave_afectado} FROM temp.grupos_afectados WHERE warehouse = :warehouse
+                )
+                """
+                claves = {tuple(fila) for fila in conn.execute(
+                    f"SELECT DISTINCT {clave_afectado} FROM temp.grupos_afectados WHERE warehouse = ?", (warehouse,)
+                )}
+                if not claves:
+                    break  # Ningún grupo afectado en este almacén
+
+            grupos = {}
+            for categoria_L1, categoria_L2, iva, precio, precio_anterior, marca_blanca in conn.execute(sql, parametros):
+                grupo = grupos.setdefault((categoria_L1, categoria_L2, iva), [[], 0, 0, 0])
+                grupo[0].append(precio)
+                if precio_anterior is not None:
+                    grupo[1] += precio > precio_anterior
+                    grupo[2] += precio < precio_anterior
+                grupo[3] += bool(marca_blanca)
+            if completo:
+                claves = set(grupos)
+
+            conn.executemany(
+                """DELETE FROM resumen_diario WHERE fecha = ? AND warehouse = ? AND nivel = ?
+                AND categoria_L1 = ? AND categoria_L2 = ? AND iva = ?""",
+                [(fecha, warehouse, nivel, *clave) for clave in claves]
+            )
+            conn.executemany(
+                f"INSERT INTO resumen_diario ({', '.join(COLUMNAS_RESUMEN)}) VALUES ({', '.join('?' * len(COLUMNAS_RESUMEN))})",
+                [_fila(fecha, warehouse, nivel, clave, *grupo) for clave, grupo in grupos.items()]
+            )
+            recalculados += len(claves)
+    conn.execute("DELETE FROM temp.grupos_afectados")
+    return recalculados
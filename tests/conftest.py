@@ -0,0 +1,30 @@
+# tests/conftest.py
+import pytest
+import scripts.db_utils as db_utils
+
+
+@pytest.fixture
+def base_de_datos(tmp_path, monkeypatch):
+    """Base de datos vacía, con todas las migraciones, en un directorio temporal."""
+    monkeypatch.setattr(db_utils, "DB_PATH", str(tmp_path / "productos.db"))
+    db_utils.create_database()
+    return db_utils.DB_PATH
+
+
+@pytest.fixture
+def producto():
+    """Construye diccionarios de producto como los de parse_product."""
+
+    def construir(producto_id, precio, **campos):
+        datos = {
+            "id": producto_id, "warehouse": db_utils.DEFAULT_WAREHOUSE, "nombre": f"Producto {producto_id}",
+            "categoria_L1": "Despensa", "categoria_L2": "Aceite", "categoria_L3": "Oliva",
+            "precio_con_descuento": precio, "precio_sin_descuento": None, "packaging": "Botella",
+            "bulk_price": precio, "unit_size": 1.0, "size_format": "l", "iva": 10, "selling_method": 0,
+            "is_pack": False, "is_new": False, "price_decreased": False, "unavailable_from": None,
+            "url": None, "imagen": None,
+        }
+        datos.update(campos)
+        return datos
+
+    return construir
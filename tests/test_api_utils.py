@@ -0,0 +1,18 @@
+# tests/test_api_utils.py
+import scripts.api_utils as api_utils
+
+
+def test_arbol_de_categorias_por_almacen(monkeypatch):
+    arboles = {
+        "mad1": [{"name": "Despensa", "categories": [{"name": "Aceite", "id": 112}]}],
+        "bcn1": [{"name": "Bebidas", "categories": [{"name": "Agua", "id": 156}, {"name": "Zumo", "id": 158}]}],
+    }
+    monkeypatch.setattr(api_utils, "fetch_categories", lambda session, warehouse: arboles[warehouse])
+    monkeypatch.setattr(api_utils, "fetch_products",
+                        lambda subcategory_id, session, warehouse: [f"{warehouse}/{subcategory_id}"])
+
+    assert list(api_utils.iter_subcategories(2, ["mad1", "bcn1"])) == [
+        ("mad1", "Despensa", "Aceite", ["mad1/112"]),
+        ("bcn1", "Bebidas", "Agua", ["bcn1/156"]),
+        ("bcn1", "Bebidas", "Zumo", ["bcn1/158"]),
+    ]
@@ -0,0 +1,99 @@
+# tests/test_db_utils.py
+import sqlite3
+import scripts.db_utils as db_utils
+
+# Esquema de data/productos.db antes de las migraciones (versión 0)
+ESQUEMA_ORIGINAL = """
+CREATE TABLE productos (
+    id TEXT PRIMARY KEY,
+    nombre TEXT,
+    categoria_L1 TEXT,
+    categoria_L2 TEXT,
+    categoria_L3 TEXT,
+    precio_con_descuento REAL,
+    precio_sin_descuento REAL,
+    packaging TEXT,
+    bulk_price REAL,
+    unit_size REAL,
+    size_format TEXT,
+    iva INTEGER,
+    selling_method INTEGER,
+    is_pack INTEGER,
+    is_new INTEGER,
+    price_decreased INTEGER,
+    unavailable_from TEXT,
+    url TEXT,
+    imagen TEXT,
+    last_updated TEXT
+);
+CREATE TABLE precios_historicos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    producto_id TEXT,
+    precio_con_descuento REAL,
+    fecha_actualizacion TEXT,
+    UNIQUE(producto_id, fecha_actualizacion)
+);
+"""
+
+PRODUCTOS = [
+    ("1", "Aceite de oliva Hacendado", "Despensa", "Aceite", "Oliva", 5.5, None, "Botella", 5.5, 1.0, "l", 10,
+     0, 0, 0, 0, None, "https://tienda.mercadona.es/product/1/", None, "2024-01-02"),
+    ("2", "Agua mineral", "Bebidas", "Agua", None, 0.5, None, "Garrafa", 0.1, 5.0, "l", 10,
+     0, 0, 0, 0, None, None, None, "2024-01-01"),
+]
+
+HISTORICO = [
+    ("1", 5.0, "2024-01-01"), ("1", 5.5, "2024-01-02"), ("1", 5.5, "2024-01-03"),
+    ("2", 0.5, "2024-01-01"), ("2", 0.5, "2024-01-03"),
+]
+
+
+def _filas(conn, sql):
+    return [tuple(fila) for fila in conn.execute(sql)]
+
+
+def test_migrar_base_de_datos_original(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_utils, "DB_PATH", str(tmp_path / "productos.db"))
+    conn = sqlite3.connect(db_utils.DB_PATH)
+    conn.executescript(ESQUEMA_ORIGINAL)
+    conn.executemany(f"INSERT INTO productos VALUES ({', '.join('?' * 20)})", PRODUCTOS)
+    conn.executemany(
+        "INSERT INTO precios_historicos (producto_id, precio_con_descuento, fecha_actualizacion) VALUES (?, ?, ?)",
+        HISTORICO
+    )
+    conn.commit()
+    conn.close()
+
+    db_utils.create_database()
+
+    conn = db_utils.get_db_connection()
+    assert db_utils.version_esquema(conn) == db_utils.MIGRACIONES[-1][0]
+    columnas = ", ".join(db_utils.COLUMNAS_PRODUCTO[2:]) + ", last_updated"
+    assert _filas(conn, f"SELECT id, warehouse, {columnas} FROM productos ORDER BY id") == [
+        (fila[0], db_utils.DEFAULT_WAREHOUSE, *fila[1:]) for fila in PRODUCTOS
+    ]
+    assert _filas(conn, "SELECT nivel, nombre FROM categorias ORDER BY nivel, nombre") == [
+        (1, "Bebidas"), (1, "Despensa"), (2, "Aceite"), (2, "Agua"), (3, "Oliva"),
+    ]
+    # El histórico diario pasa a intervalos; el producto 2 falta el día 2
+    assert _filas(conn, "SELECT * FROM precios_intervalos ORDER BY producto_id, valid_from") == [
+        ("1", "default", 5.0, "2024-01-01", "2024-01-02"),
+        ("1", "default", 5.5, "2024-01-02", None),
+        ("2", "default", 0.5, "2024-01-01", "2024-01-02"),
+        ("2", "default", 0.5, "2024-01-03", None),
+    ]
+    assert _filas(conn, """
+        SELECT producto_id, precio_con_descuento, fecha_actualizacion FROM precios_historicos
+        ORDER BY producto_id, fecha_actualizacion
+    """) == sorted(HISTORICO)
+    # Índice de búsqueda (migración 3) sobre nombre y categorías
+    assert _filas(conn, """
+        SELECT p.id FROM productos_fts f JOIN productos p ON p.clave = f.rowid
+        WHERE productos_fts MATCH 'oliva'
+    """) == [("1",)]
+    conn.close()
+
+    # Volver a crear la base de datos no aplica ninguna migración más
+    conn = sqlite3.connect(db_utils.DB_PATH)
+    assert db_utils.migrar(conn) == []
+    conn.close()
@@ -0,0 +1,72 @@
+# tests/test_http_cache.py
+import pytest
+from scripts.http_cache import CacheMissError, ResponseCache
+
+URL = "https://api.example/categories/112/"
+
+
+class _Respuesta:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class _Sesion:
+    """Sesión falsa que devuelve respuestas preparadas y anota las cabeceras enviadas."""
+
+    def __init__(self, *respuestas):
+        self.respuestas = list(respuestas)
+        self.peticiones = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.peticiones.append(dict(headers or {}))
+        return self.respuestas.pop(0)
+
+
+def test_revalidacion_con_etag(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    sesion = _Sesion(
+        _Respuesta(200, b'{"v": 1}', {"ETag": '"a"'}),
+        _Respuesta(304, headers={"ETag": '"b"'}),
+        _Respuesta(304),
+    )
+
+    assert cache.get(sesion, URL).json() == {"v": 1}
+    segunda = cache.get(sesion, URL)
+    assert (segunda.status_code, segunda.json()) == (200, {"v": 1})
+    cache.get(sesion, URL)
+
+    # La segunda petición es condicional y la tercera usa el validador renovado por el 304
+    assert sesion.peticiones == [{}, {"If-None-Match": '"a"'}, {"If-None-Match": '"b"'}]
+    assert cache.stats == {"hits": 0, "not_modified": 2, "unchanged": 0, "downloaded": 1}
+
+
+def test_sin_validadores_compara_el_hash(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    sesion = _Sesion(_Respuesta(200, b"[1]"), _Respuesta(200, b"[1]"), _Respuesta(200, b"[2]"))
+
+    assert [cache.get(sesion, URL).json() for _ in range(3)] == [[1], [1], [2]]
+    assert sesion.peticiones == [{}, {}, {}]
+    assert cache.stats["unchanged"] == 1 and cache.stats["downloaded"] == 2
+
+
+def test_error_no_se_guarda(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    sesion = _Sesion(_Respuesta(500, b"error"), _Respuesta(200, b"[1]"))
+
+    assert cache.get(sesion, URL).status_code == 500
+    assert cache.get(sesion, URL).json() == [1]
+    assert sesion.peticiones == [{}, {}]
+
+
+def test_replay_sirve_de_disco_sin_red(tmp_path):
+    ResponseCache(str(tmp_path)).get(_Sesion(_Respuesta(200, b"[1]", {"ETag": '"a"'})), URL)
+    replay = ResponseCache(str(tmp_path), mode="replay")
+    sin_red = _Sesion()
+
+    assert replay.get(sin_red, URL).json() == [1]
+    with pytest.raises(CacheMissError):
+        replay.get(sin_red, URL + "otra/")
+    assert sin_red.peticiones == []
+    assert replay.stats["hits"] == 1
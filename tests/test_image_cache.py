@@ -0,0 +1,47 @@
+# tests/test_image_cache.py
+import os
+import pytest
+import scripts.image_cache as image_cache
+from scripts.image_cache import ImageCache, imagen_local
+
+URL = "https://prod-mercadona.imgix.net/images/1.jpg"
+
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    ruta = tmp_path / "img_cache"
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_DIR", str(ruta))
+    monkeypatch.setattr(image_cache, "_indice", None)
+    return ruta
+
+
+def test_sin_cache_devuelve_la_url_y_no_la_crea(directorio):
+    assert imagen_local(URL) == URL
+    assert not directorio.exists()
+
+
+def test_imagen_en_cache_se_lee_sin_escribir(directorio):
+    cache = ImageCache(str(directorio))
+    (directorio / "abc.jpg").write_bytes(b"jpeg")
+    cache.register([(URL, "abc", "abc.jpg", 4)])
+    cache.close()
+    indice = directorio / "index.db"
+    os.utime(indice, (0, 0))
+
+    assert imagen_local(URL) == os.path.join(str(directorio), "abc.jpg")
+    assert imagen_local(URL + "?otra") == URL + "?otra"
+    assert os.stat(indice).st_mtime == 0
+    assert sorted(os.listdir(directorio)) == ["abc.jpg", "index.db"]
+
+
+def test_touch_protege_de_la_expulsion(directorio):
+    cache = ImageCache(str(directorio), max_size_mb=0)
+    for nombre in ("a", "b"):
+        (directorio / f"{nombre}.jpg").write_bytes(b"jpeg")
+    cache.register([(URL, "a", "a.jpg", 4)])
+    cache.register([(URL + "b", "b", "b.jpg", 4)])
+    cache.max_size = 4
+    cache.touch([URL])
+
+    assert cache.evict() == 1
+    assert cache.known_urls() == {URL}
@@ -0,0 +1,80 @@
+# tests/test_incremental.py
+import scripts.db_utils as db_utils
+from scripts.pipeline import DatabaseSink, run_pipeline
+
+
+class _SinkConFecha(DatabaseSink):
+    """DatabaseSink que escribe como la ingesta de una fecha fija."""
+
+    def __init__(self, fecha, incremental=True):
+        super().__init__(incremental)
+        self._fecha = fecha
+
+    def open(self):
+        super().open()
+        self.fecha = self._fecha
+
+
+def _ingestas(*dias):
+    for fecha, lote in dias:
+        run_pipeline(iter([lote]), [_SinkConFecha(fecha)])
+
+
+def _consulta(sql):
+    conn = db_utils.get_db_connection()
+    try:
+        return [tuple(fila) for fila in conn.execute(sql)]
+    finally:
+        conn.close()
+
+
+def test_incremental_producto_que_desaparece_y_vuelve(base_de_datos, producto):
+    _ingestas(
+        ("2024-01-01", [producto("1", 1.0), producto("2", 2.0)]),
+        ("2024-01-02", [producto("1", 1.0)]),
+        ("2024-01-03", [producto("1", 1.0), producto("2", 2.0)]),
+        ("2024-01-04", [producto("1", 1.0), producto("2", 2.0)]),
+    )
+    assert _consulta("SELECT * FROM precios_intervalos WHERE producto_id = '2' ORDER BY valid_from") == [
+        ("2", "default", 2.0, "2024-01-01", "2024-01-02"),
+        ("2", "default", 2.0, "2024-01-03", None),
+    ]
+    assert _consulta("SELECT fecha_actualizacion FROM precios_historicos WHERE producto_id = '2' ORDER BY 1") == [
+        ("2024-01-01",), ("2024-01-03",), ("2024-01-04",),
+    ]
+    assert _consulta("SELECT fecha, productos FROM resumen_diario WHERE nivel = 'L1' ORDER BY fecha") == [
+        ("2024-01-01", 2), ("2024-01-02", 1), ("2024-01-03", 2), ("2024-01-04", 2),
+    ]
+
+
+def test_desaparecidos_pierden_sus_huellas(base_de_datos, producto):
+    _ingestas(
+        ("2024-01-01", [producto("1", 1.0), producto("2", 2.0, categoria_L3="Girasol")]),
+        ("2024-01-02", [producto("1", 1.0)]),
+    )
+    assert _consulta("SELECT producto_id FROM huellas_productos") == [("1",)]
+    assert _consulta("SELECT categoria_L3 FROM huellas_categorias") == [("Oliva",)]
+
+
+def test_incremental_sin_cambios_mantiene_el_historico_diario(base_de_datos, producto):
+    _ingestas(*((f"2024-01-0{dia}", [producto("1", 1.0)]) for dia in range(1, 4)))
+    assert _consulta("SELECT fecha_actualizacion FROM precios_historicos ORDER BY 1") == [
+        ("2024-01-01",), ("2024-01-02",), ("2024-01-03",),
+    ]
+
+
+def test_solo_se_escriben_las_categorias_y_productos_cambiados(base_de_datos, producto):
+    def dia(fecha, precio_girasol):
+        sink = _SinkConFecha(fecha)
+        run_pipeline(iter([
+            [producto("1", 1.0), producto("2", 2.0)],
+            [producto("3", 3.0, categoria_L3="Girasol"), producto("4", precio_girasol, categoria_L3="Girasol")],
+        ]), [sink])
+        return {k: sink.stats[k] for k in ("categorias_sin_cambios", "productos_escritos", "productos_sin_cambios")}
+
+    assert dia("2024-01-01", 4.0) == {"categorias_sin_cambios": 0, "productos_escritos": 4, "productos_sin_cambios": 0}
+    assert dia("2024-01-02", 4.0) == {"categorias_sin_cambios": 2, "productos_escritos": 0, "productos_sin_cambios": 4}
+    assert dia("2024-01-03", 4.5) == {"categorias_sin_cambios": 1, "productos_escritos": 1, "productos_sin_cambios": 3}
+    assert _consulta("SELECT producto_id, valid_from FROM precios_intervalos WHERE valid_from > '2024-01-01'") == [
+        ("4", "2024-01-03"),
+    ]
@@ -0,0 +1,154 @@
+# tests/test_json_import.py
+import io
+import json
+import pytest
+import scripts.db_utils as db_utils
+from scripts.json_import import FechaAnteriorError, importar_json, iterar_registros
+
+REGISTROS = [
+    {"id": "1", "nombre": "Jamón ibérico", "precio_con_descuento": 22.95},
+    {"id": "2", "nombre": "Café €", "precio_con_descuento": "3,10 €", "is_new": True},
+    12345,
+    -0.5,
+    "texto con \"comillas\" y , ] separadores",
+    None,
+    [1, [2, {"a": "ñ"}]],
+    {},
+]
+
+
+def _registros(texto, bloque_bytes):
+    return list(iterar_registros(io.BytesIO(texto.encode("utf-8")), bloque_bytes))
+
+
+@pytest.mark.parametrize("bloque_bytes", [1, 2, 3, 7, 64, 1 << 20])
+def test_array_por_bloques_pequenos(bloque_bytes):
+    texto = json.dumps(REGISTROS, ensure_ascii=False, indent=1)
+    assert _registros(texto, bloque_bytes) == REGISTROS
+
+
+@pytest.mark.parametrize("bloque_bytes", [1, 2, 5])
+def test_jsonl_por_bloques_pequenos(bloque_bytes):
+    texto = "\n".join(json.dumps(r, ensure_ascii=False) for r in REGISTROS) + "\n\n"
+    assert _registros(texto, bloque_bytes) == REGISTROS
+
+
+@pytest.mark.parametrize("texto", ["[]", "  [ ]\n", "﻿[\n]"])
+@pytest.mark.parametrize("bloque_bytes", [1, 4])
+def test_array_vacio(texto, bloque_bytes):
+    assert _registros(texto, bloque_bytes) == []
+
+
+def test_numero_partido_entre_bloques():
+    # El número 123456 llega en varios trozos y no debe cortarse en "1", "12"...
+    assert _registros("[123456, 7.25]", 2) == [123456, 7.25]
+
+
+@pytest.mark.parametrize("texto", ["[1, 2", "[1 2]", '[{"a": 1}'])
+def test_array_mal_formado(texto):
+    with pytest.raises(ValueError):
+        _registros(texto, 1)
+
+
+def _volcado(tmp_path, nombre, precio):
+    path = tmp_path / nombre
+    path.write_text(json.dumps({
+        "id": "1", "nombre": "Aceite", "categoria_L1": "Despensa", "categoria_L2": "Aceite",
+        "categoria_L3": "Oliva", "precio_con_descuento": precio,
+    }) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def _estado(conn):
+    intervalos = [tuple(fila) for fila in conn.execute(
+        "SELECT producto_id, precio_con_descuento, valid_from, valid_to FROM precios_intervalos ORDER BY valid_from"
+    )]
+    precio = conn.execute("SELECT precio_con_descuento FROM productos WHERE id = '1'").fetchone()[0]
+    return intervalos, precio
+
+
+def test_importar_fecha_anterior_se_rechaza(base_de_datos, tmp_path):
+    importar_json(_volcado(tmp_path, "marzo.jsonl", 2.0), "2024-03-01")
+    conn = db_utils.get_db_connection()
+    antes = _estado(conn)
+
+    with pytest.raises(FechaAnteriorError):
+        importar_json(_volcado(tmp_path, "enero.jsonl", 1.0), "2024-01-01")
+
+    assert _estado(conn) == antes == ([("1", 2.0, "2024-03-01", None)], 2.0)
+    conn.close()
+
+
+def test_importar_misma_fecha_y_posterior(base_de_datos, tmp_path):
+    importar_json(_volcado(tmp_path, "a.jsonl", 2.0), "2024-03-01")
+    importar_json(_volcado(tmp_path, "b.jsonl", 2.5), "2024-03-01")  # Corrección del mismo día
+    importar_json(_volcado(tmp_path, "c.jsonl", 3.0), "2024-03-05")
+    conn = db_utils.get_db_connection()
+    assert _estado(conn) == ([("1", 2.5, "2024-03-01", "2024-03-05"), ("1", 3.0, "2024-03-05", None)], 3.0)
+    conn.close()
+
+
+def _legado(producto_id, precio, **campos):
+    registro = {
+        "description": f"Producto {producto_id}", "price": precio, "technical_attributes": "Botella | 1 l",
+        "ProductURL": f"https://tienda.mercadona.es/product/{producto_id}/producto",
+    }
+    registro.update(campos)
+    return registro
+
+
+def _escribir(tmp_path, nombre, registros):
+    path = tmp_path / nombre
+    path.write_text("\n".join(json.dumps(r) for r in registros) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def _filas(conn, sql):
+    return [tuple(fila) for fila in conn.execute(sql)]
+
+
+def test_legado_solo_actualiza_sus_columnas(base_de_datos, tmp_path, producto):
+    api = [producto("1", 2.0, iva=21, imagen="https://img/1.jpg"), producto("2", 3.0, iva=4)]
+    importar_json(_escribir(tmp_path, "api.jsonl", api), "2024-03-01")
+    importar_json(_escribir(tmp_path, "legado.jsonl", [
+        _legado("1", 2.2, categoryL1="Despensa", categoryL2="Aceite"),
+        _legado("2", 3.0, categoryL1="Bebidas", categoryL2="Agua"),  # Cambia de categoría
+    ]), "2024-03-02")
+
+    conn = db_utils.get_db_connection()
+    assert _filas(conn, """
+        SELECT id, nombre, categoria_L1, categoria_L2, categoria_L3, precio_con_descuento, iva, imagen, url
+        FROM productos ORDER BY id
+    """) == [
+        ("1", "Producto 1", "Despensa", "Aceite", "Oliva", 2.2, 21, "https://img/1.jpg",
+         "https://tienda.mercadona.es/product/1/producto"),
+        ("2", "Producto 2", "Bebidas", "Agua", None, 3.0, 4, None, "https://tienda.mercadona.es/product/2/producto"),
+    ]
+    conn.close()
+
+
+def test_legado_sin_categoria(base_de_datos, tmp_path, producto):
+    importar_json(_escribir(tmp_path, "api.jsonl", [producto("1", 2.0)]), "2024-03-01")
+    importar_json(_escribir(tmp_path, "legado.jsonl", [_legado("1", 2.5), _legado("2", 1.0)]), "2024-03-02")
+
+    conn = db_utils.get_db_connection()
+    # El producto 1 conserva su categoría; el 2 cuenta en el grupo sin categoría
+    assert _filas(conn, "SELECT id, categoria_L1 FROM productos ORDER BY id") == [("1", "Despensa"), ("2", None)]
+    assert _filas(conn, """
+        SELECT categoria_L1, productos, precio_medio FROM resumen_diario
+        WHERE fecha = '2024-03-02' AND nivel = 'L1' ORDER BY categoria_L1
+    """) == [("", 1, 1.0), ("Despensa", 1, 2.5)]
+    conn.close()
+
+
+def test_error_a_mitad_resume_los_lotes_confirmados(base_de_datos, tmp_path, producto):
+    path = tmp_path / "roto.json"
+    path.write_text("[" + json.dumps(producto("1", 2.0)) + ", " + json.dumps(producto("2", 3.0)) + ", {", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        importar_json(str(path), "2024-03-01", tamano_lote=1)
+
+    conn = db_utils.get_db_connection()
+    assert _filas(conn, "SELECT id FROM productos ORDER BY id") == [("1",), ("2",)]
+    assert _filas(conn, "SELECT productos FROM resumen_diario WHERE nivel = 'L1'") == [(2,)]
+    conn.close()
@@ -0,0 +1,88 @@
+# tests/test_pipeline.py
+import pytest
+import scripts.db_utils as db_utils
+from scripts.pipeline import DatabaseSink, EnrichmentSink, Sink, run_pipeline
+
+
+def _consulta(sql):
+    conn = db_utils.get_db_connection()
+    try:
+        return [tuple(fila) for fila in conn.execute(sql)]
+    finally:
+        conn.close()
+
+
+class _Anotado(Sink):
+    """Sink que guarda los lotes recibidos y el `ok` con el que se cierra."""
+
+    def __init__(self):
+        self.lotes = []
+        self.cerrado = None
+
+    def write(self, batch):
+        self.lotes.append(batch)
+
+    def close(self, ok=True):
+        self.cerrado = ok
+
+
+def test_lotes_en_orden_y_total():
+    sinks = [_Anotado(), _Anotado()]
+    assert run_pipeline(iter([[1, 2], [3], [4, 5, 6]]), sinks, queue_size=1) == 6
+    assert [sink.lotes for sink in sinks] == [[[1, 2], [3], [4, 5, 6]]] * 2
+    assert [sink.cerrado for sink in sinks] == [True, True]
+
+
+def test_fallo_de_descarga_cierra_sin_confirmar():
+    def lotes():
+        yield [1]
+        raise ConnectionError("sin red")
+
+    sink = _Anotado()
+    with pytest.raises(ConnectionError):
+        run_pipeline(lotes(), [sink])
+    assert (sink.lotes, sink.cerrado) == ([[1]], False)
+
+
+def test_un_sink_que_falla_al_cerrar_no_impide_cerrar_los_demas():
+    class Roto(_Anotado):
+        def close(self, ok=True):
+            raise OSError("disco lleno")
+
+    sink = _Anotado()
+    with pytest.raises(OSError):
+        run_pipeline(iter([[1], [2]]), [Roto(), sink])
+    # Se cierra, pero sabiendo que un sink anterior ha fallado
+    assert sink.cerrado is False
+
+
+def _detalle(producto_id, warehouse):
+    return {"producto_id": producto_id, "warehouse": warehouse, "descripcion": f"Detalle {producto_id}"}
+
+
+def test_enriquecimiento_ignora_los_cambios_de_precio(base_de_datos, producto):
+    pedidos = []
+
+    def fetch_detail(producto_id, warehouse):
+        pedidos.append(producto_id)
+        return _detalle(producto_id, warehouse)
+
+    run_pipeline(iter([[producto("1", 1.0), producto("2", 2.0)]]), [EnrichmentSink(fetch_detail)])
+    run_pipeline(iter([[producto("1", 1.5, price_decreased=True), producto("2", 2.0, nombre="Nuevo")]]),
+                 [EnrichmentSink(fetch_detail)])
+
+    assert pedidos == ["1", "2", "2"]
+    assert _consulta("SELECT producto_id, descripcion FROM productos_detalle ORDER BY 1") == [
+        ("1", "Detalle 1"), ("2", "Detalle 2"),
+    ]
+
+
+def test_enriquecimiento_no_guarda_si_falla_la_base_de_datos(base_de_datos, producto):
+    class BaseDeDatosRota(DatabaseSink):
+        def close(self, ok=True):
+            super().close(ok=False)
+            raise OSError("disco lleno")
+
+    with pytest.raises(OSError):
+        run_pipeline(iter([[producto("1", 1.0)]]), [BaseDeDatosRota(False), EnrichmentSink(_detalle)])
+    assert _consulta("SELECT * FROM productos_detalle") == []
@@ -0,0 +1,49 @@
+# tests/test_price_archive.py
+from datetime import date
+import scripts.db_utils as db_utils
+from scripts.price_archive import (
+    codificar_bloque, compactar, decodificar_bloque, intervalos_archivados, meses_archivados,
+)
+
+FILAS = [
+    ("10", "mad1", 2.35, "2023-12-20", "2024-01-03"),
+    ("10", "mad1", 1.99, "2024-01-03", "2024-01-31"),
+    ("9", "mad1", 0.30000000000000004, "2024-01-01", "2024-01-02"),  # No es un número exacto de céntimos
+    ("9", "mad1", None, "2024-01-02", "2024-01-05"),
+    ("9", "mad1", 1.234, "2024-01-05", "2024-01-06"),
+    ("9", "mad1", 120.0, "2024-01-06", "2024-01-20"),
+    ("10", "bcn1", 2.35, "2024-01-10", "2024-01-11"),
+    ("1", "bcn1", 0.0, "2023-01-01", "2024-01-15"),
+]
+
+
+def _ordenadas(filas):
+    """Orden de las filas de un bloque: almacén, producto y valid_from."""
+    return sorted(filas, key=lambda fila: (fila[1], fila[0], fila[3]))
+
+
+def test_bloque_ida_y_vuelta():
+    filas = decodificar_bloque(codificar_bloque("2024-01", FILAS))
+    assert filas == _ordenadas(FILAS)
+    assert decodificar_bloque(codificar_bloque("2024-01", [])) == []
+
+
+def test_compactar_mueve_los_meses_cerrados(base_de_datos, tmp_path):
+    conn = db_utils.get_db_connection()
+    conn.executemany("INSERT INTO precios_intervalos VALUES (?, ?, ?, ?, ?)", FILAS + [
+        ("10", "mad1", 1.89, "2024-01-31", "2024-02-10"),
+        ("10", "mad1", 1.79, "2024-02-10", None),
+    ])
+    conn.commit()
+    directorio = str(tmp_path / "archivo")
+
+    # Con 20 días de horizonte el corte es el 1 de febrero: se archiva enero y lo anterior
+    assert compactar(conn, 20, hoy=date(2024, 2, 21), directory=directorio) == {"2024-01": len(FILAS)}
+    assert compactar(conn, 20, hoy=date(2024, 2, 21), directory=directorio) == {}
+    assert meses_archivados(directorio) == ["2024-01"]
+    assert intervalos_archivados(directory=directorio) == _ordenadas(FILAS)
+    assert intervalos_archivados("2024-01-20", "mad1", "10", directorio) == [FILAS[1]]
+    assert [tuple(fila) for fila in conn.execute(
+        "SELECT precio_con_descuento FROM precios_intervalos ORDER BY valid_from"
+    )] == [(1.89,), (1.79,)]
+    conn.close()
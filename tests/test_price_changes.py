@@ -0,0 +1,59 @@
+# tests/test_price_changes.py
+import numpy as np
+import pytest
+import scripts.db_utils as db_utils
+from scripts import price_changes, queries
+
+# Referencia en SQL: intervalos de los productos con algún cambio en (inicio, fin]
+# que se solapan con [inicio, fin], resumidos por producto
+REFERENCIA = """
+WITH ventana AS (
+    SELECT producto_id, precio_con_descuento AS precio, valid_from FROM precios_intervalos
+    WHERE valid_from <= :fin AND (valid_to IS NULL OR valid_to > :inicio) AND precio_con_descuento IS NOT NULL
+        AND producto_id IN (SELECT producto_id FROM precios_intervalos WHERE valid_from > :inicio AND valid_from <= :fin)
+)
+SELECT producto_id,
+    (SELECT precio FROM ventana v WHERE v.producto_id = w.producto_id ORDER BY valid_from LIMIT 1),
+    (SELECT precio FROM ventana v WHERE v.producto_id = w.producto_id ORDER BY valid_from DESC LIMIT 1),
+    MIN(precio), MAX(precio)
+FROM ventana w GROUP BY producto_id ORDER BY producto_id
+"""
+
+
+@pytest.fixture(scope="module")
+def historico(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("cambios") / "productos.db")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(db_utils, "DB_PATH", path)
+        fechas, _ = price_changes._crear_base_sintetica(path, 300, 60, 0.1, semilla=7)
+        conn = db_utils.get_db_connection()
+        yield conn, fechas, queries.intervalos_precio(conn)
+        conn.close()
+
+
+@pytest.mark.parametrize("inicio, fin", [(-2, -1), (-8, -1), (-31, -10), (0, -1), (5, 5)])
+def test_ventana_igual_que_sql(historico, inicio, fin):
+    conn, fechas, intervalos = historico
+    fecha_inicio, fecha_fin = fechas[inicio], fechas[fin]
+
+    df = price_changes.cambios_ventana(intervalos, fecha_inicio, fecha_fin).sort_values("producto_id")
+    referencia = conn.execute(REFERENCIA, {"inicio": fecha_inicio, "fin": fecha_fin}).fetchall()
+    assert [tuple(fila) for fila in df[list(price_changes.COLUMNAS_CAMBIOS[:5])].itertuples(index=False)] == \
+        [tuple(fila) for fila in referencia]
+
+    # Los que cambian coinciden con queries.cambios_entre()
+    cambiados = df[df["precio_inicial"] != df["precio_final"]]
+    entre = queries.cambios_entre(conn, fecha_inicio, fecha_fin).sort_values("producto_id")
+    assert cambiados[["producto_id", "precio_inicial", "precio_final"]].values.tolist() == entre.values.tolist()
+
+
+def test_porcentaje_y_top_n():
+    df = price_changes.calcular_cambios(["a", "a", "b", "b", "c", "d", "d"], [2.0, 3.0, 4.0, 1.0, 5.0, 0.0, 1.0])
+    assert df["porcentaje"].tolist() == [50.0, -75.0, 0.0, 0.0]
+    subidas, bajadas = price_changes.subidas_y_bajadas(df, n=1)
+    assert subidas["producto_id"].tolist() == ["a"] and bajadas["producto_id"].tolist() == ["b"]
+
+    valores = np.random.default_rng(0).normal(size=500)
+    for n in (0, 1, 10, 500, 600):
+        assert price_changes.top_n(valores, n).tolist() == np.argsort(-valores, kind="stable")[:n].tolist()
+        assert price_changes.top_n(valores, n, mayores=False).tolist() == np.argsort(valores, kind="stable")[:n].tolist()
@@ -0,0 +1,157 @@
+# tests/test_queries.py
+import pytest
+import scripts.db_utils as db_utils
+from scripts import queries
+
+# (id, precio, bulk_price): precios repetidos y precios por unidad NULL
+CATALOGO = [
+    ("1", 2.0, None), ("2", 1.0, 5.0), ("3", 2.0, None), ("4", 3.0, 1.0), ("5", 1.0, None),
+    ("6", 2.0, 5.0), ("7", 0.5, None), ("8", 3.0, 2.0), ("9", 2.0, 1.0),
+]
+
+
+@pytest.fixture
+def conn(base_de_datos, producto):
+    conn = db_utils.get_db_connection()
+    db_utils.guardar_lote(conn, [producto(i, precio, bulk_price=bulk, nombre=f"Producto {i}")
+                                 for i, precio, bulk in CATALOGO], "2024-01-01")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _esperado(conn, orden, descendente):
+    """Orden de referencia en Python: NULL primero en ascendente y último en descendente; desempate por clave."""
+    filas = conn.execute(f"SELECT id, {orden}, clave FROM productos").fetchall()
+    nulos = sorted((f for f in filas if f[1] is None), key=lambda f: f[2], reverse=descendente)
+    valores = sorted((f for f in filas if f[1] is not None), key=lambda f: (f[1], f[2]), reverse=descendente)
+    return [f[0] for f in (valores + nulos if descendente else nulos + valores)]
+
+
+@pytest.mark.parametrize("orden", queries.ORDEN_PRODUCTOS)
+@pytest.mark.parametrize("descendente", [False, True])
+@pytest.mark.parametrize("tamano", [1, 2, 4, 20])
+def test_pagina_productos_recorre_todo_con_nulos(conn, orden, descendente, tamano):
+    vistos, cursor = [], None
+    for _ in range(len(CATALOGO) + 1):
+        df, cursor = queries.pagina_productos(conn, orden=orden, descendente=descendente, despues=cursor,
+                                              tamano=tamano, columnas=["id"])
+        vistos += df["id"].tolist()
+        if cursor is None:
+            break
+    assert vistos == _esperado(conn, orden, descendente)
+    assert queries.contar_productos(conn) == len(CATALOGO)
+
+
+def test_pagina_productos_con_filtro(conn):
+    df, cursor = queries.pagina_productos(conn, {"precio_min": 2.0}, orden="bulk_price", tamano=3, columnas=["id"])
+    assert df["id"].tolist() == ["1", "3", "4"]
+    df, cursor = queries.pagina_productos(conn, {"precio_min": 2.0}, orden="bulk_price", despues=cursor,
+                                          tamano=3, columnas=["id"])
+    assert df["id"].tolist() == ["9", "8", "6"]
+    assert cursor is None
+
+
+@pytest.fixture
+def catalogo_busqueda(base_de_datos, producto):
+    conn = db_utils.get_db_connection()
+    db_utils.guardar_lote(conn, [
+        producto("10", 4.5, nombre="Aceite de oliva virgen extra Hacendado"),
+        producto("11", 1.2, nombre="Aceitunas verdes sin hueso", categoria_L2="Aperitivos", categoria_L3="Aceitunas"),
+        producto("12", 0.9, nombre="Leche entera", categoria_L1="Lácteos", categoria_L2="Leche", categoria_L3="Entera"),
+        producto("13", 3.4, nombre="Café molido natural", categoria_L1="Desayuno", categoria_L2="Café",
+                 categoria_L3="Molido"),
+        producto("14", 5.0, nombre="Aceite de girasol", warehouse="bcn1"),
+        producto("15", 1.5, nombre="Vinagre de Jerez", categoria_L3="Vinagre"),
+    ], "2024-01-01")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _buscar(conn, texto, **kwargs):
+    return queries.buscar_productos(conn, texto, **kwargs)["id"].tolist()
+
+
+def test_busqueda_por_prefijo_acentos_y_categorias(catalogo_busqueda):
+    conn = catalogo_busqueda
+    assert sorted(_buscar(conn, "acei")) == ["10", "11", "15"]  # Prefijo, solo el almacén pedido
+    # El nombre pesa más que la categoría; las erratas ("aceitunas") van detrás
+    assert _buscar(conn, "aceite") == ["10", "15", "11"]
+    assert _buscar(conn, "aceite", limite=2) == ["10", "15"]
+    assert _buscar(conn, "ACEITE hacen") == ["10"]          # Todos los términos
+    assert _buscar(conn, "cafe") == ["13"]                  # Sin acentos
+    assert _buscar(conn, "lacteos") == ["12"]               # Por categoría
+    assert _buscar(conn, "acei", warehouse="bcn1") == ["14"]
+    assert _buscar(conn, "") == []
+
+
+def test_busqueda_tolera_erratas(catalogo_busqueda):
+    assert _buscar(catalogo_busqueda, "lechr") == ["12"]
+    assert _buscar(catalogo_busqueda, "xyzzy") == []
+
+
+def test_busqueda_sigue_las_escrituras(catalogo_busqueda, producto):
+    conn = catalogo_busqueda
+    db_utils.guardar_lote(conn, [producto("12", 0.9, nombre="Bebida de avena", categoria_L1="Lácteos",
+                                          categoria_L2="Leche", categoria_L3="Vegetal")], "2024-01-02")
+    conn.commit()
+    assert _buscar(conn, "avena") == ["12"]
+    assert _buscar(conn, "entera") == []
+    conn.execute("DELETE FROM productos_base WHERE id = '12'")
+    assert _buscar(conn, "avena") == []
+
+
+@pytest.mark.parametrize("filtros", [
+    {},
+    {"iva": [4, 21]},
+    {"is_new": True, "precio_max": 3.0},
+    {"price_decreased": False, "categoria": ("Bebidas", None)},
+    {"categoria": ("Despensa", "Aceite"), "precio_min": 1.5},
+])
+def test_pagina_productos_filtros_en_sql(base_de_datos, producto, filtros):
+    conn = db_utils.get_db_connection()
+    catalogo = [
+        producto(str(n), round(0.5 + (n * 7 % 11) / 2, 2), iva=(4, 10, 21)[n % 3], is_new=n % 4 == 0,
+                 price_decreased=n % 5 == 0, categoria_L1=("Despensa", "Bebidas")[n % 2],
+                 categoria_L2=("Aceite", "Vinagre")[n // 2 % 2])
+        for n in range(30)
+    ]
+    db_utils.guardar_lote(conn, catalogo + [producto("30", 1.0, warehouse="bcn1")], "2024-01-01")
+    conn.commit()
+
+    filtros = dict(filtros)
+    L1, L2 = filtros.pop("categoria", (None, None))
+    ids = dict(conn.execute("SELECT nombre, id FROM categorias").fetchall())
+    if L1:
+        filtros["categoria_L1_id"] = ids[L1]
+    if L2:
+        filtros["categoria_L2_id"] = conn.execute(
+            "SELECT id FROM categorias WHERE nombre = ? AND padre_id = ?", (L2, ids[L1])).fetchone()[0]
+
+    def cumple(p):
+        return ((L1 is None or p["categoria_L1"] == L1) and (L2 is None or p["categoria_L2"] == L2)
+                and p["iva"] in filtros.get("iva", [p["iva"]])
+                and filtros.get("is_new", p["is_new"]) == p["is_new"]
+                and filtros.get("price_decreased", p["price_decreased"]) == p["price_decreased"]
+                and filtros.get("precio_min", 0) <= p["precio_con_descuento"] <= filtros.get("precio_max", 99))
+
+    claves = dict(conn.execute("SELECT id, clave FROM productos WHERE warehouse = 'default'").fetchall())
+    esperado = [p["id"] for p in sorted(filter(cumple, catalogo),
+                                        key=lambda p: (p["precio_con_descuento"], claves[p["id"]]), reverse=True)]
+    assert esperado
+    vistos, cursor = [], None
+    while True:
+        df, cursor = queries.pagina_productos(conn, filtros, orden="precio_con_descuento", descendente=True,
+                                              despues=cursor, tamano=4, columnas=["id"])
+        vistos += df["id"].tolist()
+        if cursor is None:
+            break
+    assert vistos == esperado
+    assert queries.contar_productos(conn, filtros) == len(esperado)
+    conn.close()
+
+
+def test_pagina_productos_orden_no_valido(conn):
+    with pytest.raises(ValueError):
+        queries.pagina_productos(conn, orden="id; DROP TABLE productos_base")
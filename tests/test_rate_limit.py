@@ -0,0 +1,94 @@
+# tests/test_rate_limit.py
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+import scripts.rate_limit as rate_limit
+from scripts.rate_limit import RequestExecutor, RequestFailedError
+
+
+@pytest.fixture
+def servidor():
+    """Servidor HTTP local que responde con la secuencia de (estado, cabeceras) indicada."""
+    guion, recibidas = [], []
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            recibidas.append(self.path)
+            estado, cabeceras = guion.pop(0) if guion else (200, {})
+            cuerpo = b'{"ok": true}' if estado == 200 else b""
+            self.send_response(estado)
+            for nombre, valor in cabeceras.items():
+                self.send_header(nombre, valor)
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+    hilo = threading.Thread(target=httpd.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{httpd.server_port}", guion, recibidas
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    """Anota las esperas entre reintentos en lugar de dormir."""
+    anotadas = []
+    monkeypatch.setattr(rate_limit.time, "sleep", anotadas.append)
+    return anotadas
+
+
+def _get(executor, url):
+    with requests.Session() as session:
+        return executor.execute(url, lambda: session.get(url, timeout=5))
+
+
+def test_reintenta_429_y_5xx_respetando_retry_after(servidor, esperas):
+    base, guion, recibidas = servidor
+    guion += [(429, {"Retry-After": "2"}), (503, {}), (200, {})]
+    executor = RequestExecutor(4, rate=0, max_retries=3)
+
+    response = _get(executor, f"{base}/categories/112/")
+
+    assert response.json() == {"ok": True}
+    assert len(recibidas) == 3
+    assert 2 <= esperas[0] <= 2 + rate_limit.BACKOFF_BASE
+    assert 0 <= esperas[1] <= rate_limit.BACKOFF_BASE * 2
+    stats = executor.stats.data["/categories/{id}/"]
+    assert (stats["requests"], stats["errors"], stats["throttled"], stats["retries"]) == (3, 2, 2, 2)
+    # Dos respuestas de throttling reducen el límite de concurrencia a la mitad dos veces
+    assert executor.controller.limit == 1
+
+
+def test_agotar_los_reintentos_lanza_error(servidor, esperas):
+    base, guion, recibidas = servidor
+    guion += [(500, {})] * 3
+    executor = RequestExecutor(2, rate=0, max_retries=2)
+
+    with pytest.raises(RequestFailedError) as info:
+        _get(executor, f"{base}/products/1/")
+
+    assert info.value.status_code == 500
+    assert len(recibidas) == 3 and len(esperas) == 2
+
+
+def test_un_404_no_se_reintenta(servidor, esperas):
+    base, guion, recibidas = servidor
+    guion.append((404, {}))
+
+    assert _get(RequestExecutor(2, rate=0), f"{base}/products/1/").status_code == 404
+    assert len(recibidas) == 1 and esperas == []
+
+
+def test_error_de_conexion_se_reintenta(esperas):
+    with pytest.raises(RequestFailedError) as info:
+        _get(RequestExecutor(1, rate=0, max_retries=1), "http://127.0.0.1:9/")
+
+    assert info.value.status_code is None
+    assert isinstance(info.value.cause, requests.ConnectionError)
+    assert len(esperas) == 1
@@ -0,0 +1,57 @@
+# tests/test_rollups.py
+import scripts.db_utils as db_utils
+from scripts.rollups import actualizar_resumenes, preparar_resumenes
+
+
+def _ingesta(conn, fecha, productos):
+    """Escribe un día completo y recalcula sus resúmenes; devuelve los grupos recalculados."""
+    preparar_resumenes(conn)
+    db_utils.guardar_lote(conn, productos, fecha)
+    db_utils.registrar_ingesta(conn, [db_utils.DEFAULT_WAREHOUSE], fecha)
+    recalculados = actualizar_resumenes(conn, [db_utils.DEFAULT_WAREHOUSE], fecha)
+    conn.commit()
+    return recalculados
+
+
+def _resumen(conn, fecha):
+    return sorted(tuple(fila) for fila in conn.execute("SELECT * FROM resumen_diario WHERE fecha = ?", (fecha,)))
+
+
+def _catalogo(producto, **cambios):
+    productos = {
+        "1": producto("1", 1.0),
+        "2": producto("2", 2.5, categoria_L2="Vinagre", nombre="Vinagre Hacendado"),
+        "3": producto("3", 4.0, categoria_L1="Bebidas", categoria_L2="Agua", iva=21),
+        "4": producto("4", 12.0, categoria_L1="Bebidas", categoria_L2="Vino", iva=21),
+        "5": producto("5", 0.8, categoria_L1="Frutas", categoria_L2="Fruta", iva=4),
+    }
+    for producto_id, campos in cambios.items():
+        productos[producto_id].update(campos)
+    return list(productos.values())
+
+
+def test_solo_se_recalculan_los_grupos_del_producto(base_de_datos, producto):
+    conn = db_utils.get_db_connection()
+    assert _ingesta(conn, "2024-01-01", _catalogo(producto)) == 3 + 5 + 3 + 3
+    assert _ingesta(conn, "2024-01-02", _catalogo(producto)) == 0
+    # Un cambio de precio en Bebidas/Vino (IVA 21): solo esa L2, su L1, su IVA y su par L1 × IVA
+    assert _ingesta(conn, "2024-01-03", _catalogo(producto, **{"4": {"precio_con_descuento": 11.0}})) == 4
+    conn.close()
+
+
+def test_incremental_igual_que_recalculo_completo(base_de_datos, producto):
+    conn = db_utils.get_db_connection()
+    _ingesta(conn, "2024-01-01", _catalogo(producto))
+    _ingesta(conn, "2024-01-02", _catalogo(producto, **{"1": {"precio_con_descuento": 1.2}, "5": {"iva": 10}}))
+    # Cambio de categoría: Bebidas/Vino se queda vacía y Despensa/Aceite gana un producto
+    _ingesta(conn, "2024-01-03", _catalogo(
+        producto, **{"4": {"categoria_L1": "Despensa", "categoria_L2": "Aceite", "precio_con_descuento": 9.0}}
+    ))
+    incremental = _resumen(conn, "2024-01-03")
+
+    conn.execute("DELETE FROM resumen_diario")
+    preparar_resumenes(conn)
+    actualizar_resumenes(conn, [db_utils.DEFAULT_WAREHOUSE], "2024-01-03")
+    assert _resumen(conn, "2024-01-03") == incremental
+    assert ("L2", "Bebidas", "Vino") not in {fila[2:5] for fila in incremental}
+    conn.close()